@@ -4,3 +4,10 @@ from django.apps import AppConfig
 class AccountsConfig(AppConfig):
     default_auto_field = 'django.db.models.AutoField'
     name = 'accounts'
+
+    def ready(self):
+        from config import images
+
+        Profile = self.get_model("Profile")
+        images.register(Profile, "profile_picture", "profile_picture_variants")
+        images.register(Profile, "cover_picture", "cover_picture_variants")
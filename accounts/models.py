@@ -76,6 +76,9 @@ class Profile(models.Model):
     about = models.CharField(max_length=200)
     profile_picture = models.ImageField(upload_to="user/profile_pictures/", null=True, blank=True)
     cover_picture = models.ImageField(upload_to="user/cover_picutres/", null=True, blank=True)
+    # resized copies of the pictures, see config.images
+    profile_picture_variants = models.JSONField(default=dict, blank=True)
+    cover_picture_variants = models.JSONField(default=dict, blank=True)
 
     date_created = models.DateTimeField(auto_now_add=True)
 
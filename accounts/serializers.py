@@ -3,6 +3,8 @@ from typing import Dict
 from django.http import HttpRequest
 from rest_framework import serializers
 from config.sms import send_sms
+from config.fieldsets import SparseFieldsetsMixin
+from config.images import ImageVariantsField
 from .models import CustomUser, Profile, UserFollowship
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
@@ -14,10 +16,19 @@ from django.conf import settings
 from post.models import Post
 
 
-class UserAccountSerializer(serializers.ModelSerializer):
+class AccountProfileSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    """ the profile in ```UserAccountSerializer``` """
+
+    class Meta:
+        model = Profile
+        fields = "__all__"
+
+
+class UserAccountSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     total_posts = serializers.SerializerMethodField(read_only=True)
     total_followers = serializers.SerializerMethodField(read_only=True)
     total_following = serializers.SerializerMethodField(read_only=True)
+    profile = AccountProfileSerializer(read_only=True)
 
     def to_representation(self, instance: CustomUser):
         data = super().to_representation(instance)
@@ -30,11 +41,9 @@ class UserAccountSerializer(serializers.ModelSerializer):
                 and request.user != instance
                 and not request.user.is_superuser
             ):
-                data.pop("first_name")
-                data.pop("last_name")
-                data.pop("email")
-                data.pop("phone_number")
-                data.pop("total_following")
+                # fields left out with ```?fields=``` are missing already
+                for name in ("first_name", "last_name", "email", "phone_number", "total_following"):
+                    data.pop(name, None)
         return data
 
     def get_total_followers(self, instance: CustomUser):
@@ -64,8 +73,6 @@ class UserAccountSerializer(serializers.ModelSerializer):
             "profile",
             "date_joined",
         ]
-        depth = 1
-        read_only_fields = ("profile",)
 
 
 class MyTokenObtainPairSerializer(TokenObtainPairSerializer, UserAccountSerializer):
@@ -279,9 +286,10 @@ class UpdateProfileSerializer(serializers.ModelSerializer):
 
 
 
-class UserInfoSerializer(serializers.ModelSerializer):
+class UserInfoSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     fullname = serializers.SerializerMethodField(read_only=True)
     profile_picture = serializers.SerializerMethodField(read_only=True) 
+    profile_picture_variants = ImageVariantsField(source="profile.profile_picture_variants")
 
     def get_fullname(self, instance: CustomUser):
         return str(f"{instance.first_name}  {instance.last_name}")
@@ -305,6 +313,7 @@ class UserInfoSerializer(serializers.ModelSerializer):
             "phone_number",
             "email",
             "profile_picture",
+            "profile_picture_variants",
         )
 
 
@@ -334,19 +343,24 @@ class UserFollowshipSerializer(serializers.ModelSerializer):
             "follower",
         )
 
-class ProfileSerializer(serializers.ModelSerializer):
+class ProfileSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    profile_picture_variants = ImageVariantsField()
+    cover_picture_variants = ImageVariantsField()
+
     class Meta:
         model = Profile
         fields = (
             "id",
             "about",
             "profile_picture",
+            "profile_picture_variants",
             "cover_picture",
+            "cover_picture_variants",
             
         )
     
 
-class UserFullProfileSerializer(serializers.ModelSerializer):
+class UserFullProfileSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     full_name = serializers.SerializerMethodField(read_only=True)
     total_posts = serializers.SerializerMethodField(read_only=True)
     total_followers = serializers.SerializerMethodField(read_only=True)
@@ -365,10 +379,8 @@ class UserFullProfileSerializer(serializers.ModelSerializer):
                 and request.user != instance
                 and not request.user.is_superuser
             ):
-                data.pop("full_name")
-                data.pop("username")
-                data.pop("email")
-                data.pop("total_following")
+                for name in ("full_name", "username", "email", "total_following"):
+                    data.pop(name, None)
         return data
 
     def get_total_followers(self, instance: CustomUser):
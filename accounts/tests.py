@@ -1,3 +1,60 @@
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from post.models import Post
+
+from .models import CustomUser, Profile, UserFollowship
+
+
+class UserConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = []
+        for i in range(3):
+            user = CustomUser.objects.create(username=f"user{i}", phone_number=f"02000000{i:02d}")
+            Profile.objects.create(user=user, about="")
+            cls.users.append(user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+        self.url = reverse("accounts:users-list")
+
+    def revalidate(self, url, etag, **params):
+        return self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_page_is_not_rendered_again(self):
+        first = self.client.get(self.url)
+        # the count, the page and the versions of the users
+        with self.assertNumQueries(3):
+            second = self.revalidate(self.url, first["ETag"])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_changes_give_a_new_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        changes = (
+            lambda: UserFollowship.objects.create(user=self.users[1], follower=self.users[2]),
+            lambda: Post.objects.create(user=self.users[1], text="post"),
+            lambda: Profile.objects.filter(user=self.users[1]).update(about="about"),
+            lambda: CustomUser.objects.filter(pk=self.users[2].pk).update(first_name="name"),
+        )
+        for change in changes:
+            change()
+            response = self.revalidate(self.url, etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+            etag = response["ETag"]
+
+    def test_detail_and_fields(self):
+        url = reverse("accounts:users-detail", args=[self.users[1].pk])
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.revalidate(url, etag).status_code, 304)
+        self.assertEqual(self.revalidate(url, etag, fields="id").status_code, 200)
+
+        etag = self.client.get(url, {"fields": "id,username"})["ETag"]
+        Profile.objects.filter(user=self.users[1]).update(about="about")
+        self.assertEqual(self.revalidate(url, etag, fields="id,username").status_code, 304)
+        self.client.force_authenticate(self.users[2])
+        self.assertEqual(self.revalidate(url, etag, fields="id,username").status_code, 200)
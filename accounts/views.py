@@ -17,6 +17,30 @@ from rest_framework.parsers import MultiPartParser, FormParser
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
+from config import fieldsets
+from config.conditional import ConditionalGetMixin
+from config.pagination import KeysetPagination
+from post.counters import count_of
+from post.models import Post
+
+# the columns ```UserAccountSerializer``` renders, see ```UserViewSet.versions```
+USER_VERSION_FIELDS = (
+    "first_name",
+    "last_name",
+    "username",
+    "email",
+    "phone_number",
+    "privacy",
+    "date_joined",
+)
+PROFILE_VERSION_FIELDS = (
+    "about",
+    "profile_picture",
+    "cover_picture",
+    "profile_picture_variants",
+    "cover_picture_variants",
+    "date_created",
+)
 
 
 def get_tokens_for_user(user):
@@ -28,7 +52,7 @@ def get_tokens_for_user(user):
     }
 
 
-class UserViewSet(ModelViewSet):
+class UserViewSet(ConditionalGetMixin, ModelViewSet):
     """ 
     Userviewset, allowed request: get, post and patch
     this endpoint allows you get all users.
@@ -41,6 +65,56 @@ class UserViewSet(ModelViewSet):
     filter_backends = (filters.SearchFilter, DjangoFilterBackend)
     http_method_names = ["get", "patch", "post"]
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if fieldsets.selected(self.request, "profile"):
+            queryset = queryset.select_related("profile")
+        return queryset
+
+    def versions(self, users: list[CustomUser]) -> list:
+        """
+        What the payloads of ```users``` are made of, read in one query: the
+        rendered columns of each user and of their profile, and the post and
+        follow counts.
+        """
+        columns = ["pk", *USER_VERSION_FIELDS]
+        if fieldsets.selected(self.request, "profile"):
+            columns += [f"profile__{field}" for field in PROFILE_VERSION_FIELDS]
+        rows = (
+            CustomUser.objects.filter(pk__in=[user.pk for user in users])
+            .annotate(
+                posts_count=count_of(Post.objects.all(), "user"),
+                followers_count=count_of(UserFollowship.objects.all(), "user"),
+                following_count=count_of(UserFollowship.objects.all(), "follower"),
+            )
+            .order_by()
+            .values_list(*columns, "posts_count", "followers_count", "following_count")
+        )
+        rows = {row[0]: row for row in rows}
+        return [
+            self.request.build_absolute_uri("/"),
+            fieldsets.signature(self.request),
+            [rows.get(user.pk) for user in users],
+        ]
+
+    def list(self, request: HttpRequest, *args, **kwargs):
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        if page is None:
+            return super().list(request, *args, **kwargs)
+        not_modified = self.not_modified(
+            self.versions(page), self.paginator.get_next_link(), self.paginator.get_previous_link()
+        )
+        if not_modified:
+            return not_modified
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    def retrieve(self, request: HttpRequest, *args, **kwargs):
+        user = self.get_object()
+        not_modified = self.not_modified(self.versions([user]))
+        if not_modified:
+            return not_modified
+        return Response(self.get_serializer(user).data)
+
     def perform_create(self, serializer: serializers.UserAccountSerializer):
         return serializer.save(instance=self.request.user)
 
@@ -320,6 +394,7 @@ class UserFollowshipViewset(ModelViewSet):
     permission_classes = [rest_permissions.IsAuthenticated,]
     http_method_names = ("get",)
     filterset_fields = ("user",)
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -339,11 +414,14 @@ class UserFollowshipViewset(ModelViewSet):
         This endpoint gets you all of your ```followers```.
         Authententication is required to perform such action.
         """
-        followers = UserFollowship.objects.filter(user=self.request.user, deleted=False)
+        followers = UserFollowship.objects.filter(
+            user=self.request.user, deleted=False
+        ).select_related("user__profile", "follower__profile")
+        page = self.paginate_queryset(followers)
         serializer = serializers.UserFollowshipSerializer(
-            instance=followers, many=True, context=self.get_serializer_context()
+            instance=page, many=True, context=self.get_serializer_context()
         )
-        return Response(data=serializer.data)
+        return self.get_paginated_response(serializer.data)
     
     @action(
         methods=["get"],
@@ -357,11 +435,14 @@ class UserFollowshipViewset(ModelViewSet):
         This endpoint gets you users you are```following```.
         Authententication is required to perform such action.
         """
-        following = UserFollowship.objects.filter(follower=self.request.user, deleted=False)
+        following = UserFollowship.objects.filter(
+            follower=self.request.user, deleted=False
+        ).select_related("user__profile", "follower__profile")
+        page = self.paginate_queryset(following)
         serializer = serializers.UserFollowshipSerializer(
-            instance=following, many=True, context=self.get_serializer_context()
+            instance=page, many=True, context=self.get_serializer_context()
         )
-        return Response(data=serializer.data)
+        return self.get_paginated_response(serializer.data)
 
 
 class UpdateUserPrivacyViewset(ModelViewSet):
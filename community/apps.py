@@ -4,3 +4,11 @@ from django.apps import AppConfig
 class CommunityConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'community'
+
+    def ready(self):
+        from config import images
+
+        for name in ("Group", "Community"):
+            images.register(
+                self.get_model(name), "profile_picture", "profile_picture_variants"
+            )
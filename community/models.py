@@ -7,6 +7,7 @@ class Group(models.Model):
     admin = models.ForeignKey(CustomUser, related_name="admin_groups", on_delete=models.CASCADE)
     members = models.ManyToManyField(CustomUser, related_name="group",)
     profile_picture = models.ImageField(upload_to='groups_profile/', null=True, blank=True)
+    profile_picture_variants = models.JSONField(default=dict, blank=True)
     date_created = models.DateTimeField(auto_now_add=True)
 
     def __str__(self) -> str:
@@ -19,6 +20,7 @@ class Community(models.Model):
     admin = models.ForeignKey(CustomUser, related_name="admin_communities", on_delete=models.CASCADE)
     groups = models.ManyToManyField(Group, related_name="community")
     profile_picture = models.ImageField(upload_to='community_profile/', null=True, blank=True)
+    profile_picture_variants = models.JSONField(default=dict, blank=True)
     date_created = models.DateTimeField(auto_now_add=True)
 
     def __str__(self) -> str:
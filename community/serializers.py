@@ -5,10 +5,16 @@ from .models import (
     Group,
     Community,
 )
+from functools import partial
+
 from accounts.models import CustomUser
+from accounts.serializers import UserInfoSerializer
+from config.fieldsets import SparseFieldsetsMixin
+from config.images import ImageVariantsField
 
-class GroupSerializer(serializers.ModelSerializer):
+class GroupSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     total_members = serializers.SerializerMethodField()
+    profile_picture_variants = ImageVariantsField()
 
     def get_total_members(self, instance: Group):
         return instance.members.count()
@@ -22,8 +28,14 @@ class GroupSerializer(serializers.ModelSerializer):
             "members",
             "total_members",
             "profile_picture",
+            "profile_picture_variants",
             "date_created",
         )
+        # ids unless asked for with ```?expand=```
+        expandable_fields = {
+            "admin": partial(UserInfoSerializer, read_only=True),
+            "members": partial(UserInfoSerializer, many=True, read_only=True),
+        }
 
 
 class GroupCreateSerializer(serializers.ModelSerializer):
@@ -43,9 +55,10 @@ class AddGroupMemberSerializer(serializers.ModelSerializer):
  
 
 
-class CommunitySerializer(serializers.ModelSerializer):
+class CommunitySerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     total_groups = serializers.SerializerMethodField()
     total_members = serializers.SerializerMethodField()
+    profile_picture_variants = ImageVariantsField()
 
     def get_total_groups(self, instance: Community):
         return instance.groups.count()
@@ -64,8 +77,13 @@ class CommunitySerializer(serializers.ModelSerializer):
             "total_groups",
             "total_members",
             "profile_picture",
+            "profile_picture_variants",
             "date_created",
         )
+        expandable_fields = {
+            "admin": partial(UserInfoSerializer, read_only=True),
+            "groups": partial(GroupSerializer, many=True, read_only=True),
+        }
 
 
 class CommunityCreateSerializer(serializers.ModelSerializer):
@@ -1,3 +1,132 @@
+from django.core.cache import cache
 from django.test import TestCase
+from django.urls import reverse
+from rest_framework.test import APIClient
 
-# Create your tests here.
+from accounts.models import CustomUser, Profile
+from post.models import Post
+
+from .models import Announcement, Community, Group
+
+
+class GroupFeedTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = []
+        for i in range(3):
+            user = CustomUser.objects.create(
+                username=f"user{i}", phone_number=f"02000000{i:02d}"
+            )
+            Profile.objects.create(user=user, about="")
+            cls.users.append(user)
+        cls.group = Group.objects.create(name="group", admin=cls.users[0])
+        cls.group.members.add(cls.users[0], cls.users[1])
+        cls.other_group = Group.objects.create(name="other", admin=cls.users[2])
+        community = Community.objects.create(name="community", admin=cls.users[0])
+        community.groups.add(cls.group)
+        cls.announcement = Announcement.objects.create(name="Announcements", community=community)
+
+        cls.announced = Post.objects.create(
+            user=cls.users[0], announcement=cls.announcement, text="announced"
+        )
+        cls.posts = [
+            Post.objects.create(user=cls.users[i % 2], group=cls.group, text=f"post {i}")
+            for i in range(25)
+        ]
+        Post.objects.create(user=cls.users[2], group=cls.other_group, text="elsewhere")
+        cls.posts[-1].likes.add(cls.users[1])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[1])
+
+    def feed(self, group, **params):
+        return self.client.get(reverse("community:groups-feed", args=[group.pk]), params)
+
+    def test_members_scroll_the_group_posts(self):
+        first = self.feed(self.group, page_size=10).json()
+        self.assertEqual([post["id"] for post in first["announcements"]], [self.announced.pk])
+        self.assertEqual(first["results"][0]["id"], self.posts[-1].pk)
+        self.assertTrue(first["results"][0]["liked"])
+
+        seen = [post["id"] for post in first["results"]]
+        next_url = first["next"]
+        while next_url:
+            page = self.client.get(next_url).json()
+            self.assertEqual(page["announcements"], [])
+            seen += [post["id"] for post in page["results"]]
+            next_url = page["next"]
+        self.assertEqual(seen, [post.pk for post in reversed(self.posts)])
+
+    def test_outsiders_are_refused(self):
+        self.assertEqual(self.feed(self.other_group).status_code, 403)
+        self.assertEqual(self.feed(Group(pk=999)).status_code, 404)
+
+    def test_page_query_count(self):
+        # membership, posts, announcements, their pictures and videos and the
+        # viewer's likes, shares and followed authors
+        with self.assertNumQueries(8):
+            small = self.feed(self.group, page_size=2)
+        cache.clear()
+        with self.assertNumQueries(8):
+            large = self.feed(self.group, page_size=25)
+        self.assertEqual(len(small.json()["results"]), 2)
+        self.assertEqual(len(large.json()["results"]), 25)
+
+    def test_feed_and_group_revalidation(self):
+        for url in (
+            reverse("community:groups-feed", args=[self.group.pk]),
+            reverse("community:groups-detail", args=[self.group.pk]),
+        ):
+            etag = self.client.get(url)["ETag"]
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.group.members.add(self.users[2])
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_communities_are_not_rendered_again(self):
+        url = reverse("community:community-list")
+        for params in ({}, {"expand": "admin,groups"}):
+            etag = self.client.get(url, params)["ETag"]
+            # the page, its count and the versions of the communities and groups
+            with self.assertNumQueries(5 if params else 4):
+                response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 304)
+
+            self.group.members.add(self.users[2])
+            response = self.client.get(url, params, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+            self.group.members.remove(self.users[2])
+
+        detail = reverse("community:community-detail", args=[self.announcement.community_id])
+        etag = self.client.get(detail)["ETag"]
+        self.assertEqual(self.client.get(detail, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        Profile.objects.filter(user=self.users[0]).update(profile_picture="me.jpg")
+        self.assertEqual(self.client.get(detail, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        etag = self.client.get(detail, {"expand": "admin"})["ETag"]
+        Profile.objects.filter(user=self.users[0]).update(profile_picture="other.jpg")
+        response = self.client.get(detail, {"expand": "admin"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_etag_follows_the_media_type(self):
+        url = reverse("community:groups-detail", args=[self.group.pk])
+        plain = self.client.get(url, HTTP_ACCEPT="application/json")
+        indented = "application/json; indent=4"
+        self.assertIn("Accept", plain["Vary"])
+        self.assertNotEqual(plain["ETag"], self.client.get(url, HTTP_ACCEPT=indented)["ETag"])
+        response = self.client.get(url, HTTP_ACCEPT=indented, HTTP_IF_NONE_MATCH=plain["ETag"])
+        self.assertEqual(response.status_code, 200)
+
+    def test_fields_and_expand(self):
+        url = reverse("community:groups-detail", args=[self.group.pk])
+        self.assertEqual(
+            self.client.get(url, {"fields": "id,name"}).json(),
+            {"id": self.group.pk, "name": "group"},
+        )
+        group = self.client.get(url, {"fields": "members,admin", "expand": "members"}).json()
+        self.assertEqual(group["admin"], self.users[0].pk)
+        self.assertEqual(
+            sorted(member["username"] for member in group["members"]), ["user0", "user1"]
+        )
+        self.assertEqual(sorted(self.client.get(url).json()["members"]), [self.users[0].pk, self.users[1].pk])
@@ -18,19 +18,68 @@ from rest_framework import permissions as rest_permissions
 from rest_framework.decorators import action
 from django.shortcuts import get_object_or_404
 from rest_framework.response import Response
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Prefetch, Q
+from django.conf import settings
 import logging
 from drf_spectacular.utils import extend_schema
+from django.utils.translation import gettext_lazy as _
 from accounts.models import CustomUser
 from accounts.serializers import UserInfoSerializer
-from rest_framework.exceptions import ValidationError
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from django_filters.rest_framework import DjangoFilterBackend
 from rest_framework import filters
+from config import fieldsets
+from config.conditional import ConditionalGetMixin
+from config.pagination import KeysetPagination
+from post import render_cache
+from post.counters import count_of
+from post.models import Post
+from post.serializers import PostSerializer
 
 logger = logging.getLogger(__name__)
 
+# announcement posts of the group's communities on top of the first feed page
+GROUP_FEED_ANNOUNCEMENTS = getattr(settings, "GROUP_FEED_ANNOUNCEMENTS", 3)
 
-class GroupViewSet(ModelViewSet):
+# the columns ```CommunitySerializer``` renders, see ```CommunityViewSet.versions```
+COMMUNITY_VERSION_FIELDS = (
+    "pk",
+    "name",
+    "admin",
+    "announcement",
+    "profile_picture",
+    "profile_picture_variants",
+    "date_created",
+)
+# the card of the admin, with ```?expand=admin```
+ADMIN_VERSION_FIELDS = (
+    "admin__first_name",
+    "admin__last_name",
+    "admin__username",
+    "admin__phone_number",
+    "admin__email",
+    "admin__profile__profile_picture",
+    "admin__profile__profile_picture_variants",
+)
+
+
+def group_lookups(request, path=(), prefix="") -> list:
+    """
+    Prefetches of the relations ```GroupSerializer``` renders for the
+    ```?fields=``` / ```?expand=``` of ```request```, for groups at ```path```
+    """
+    lookups = []
+    if fieldsets.selected(request, "admin", path) and fieldsets.expanded(request, "admin", path):
+        lookups.append(f"{prefix}admin__profile")
+    if fieldsets.selected(request, "members", path):
+        members = CustomUser.objects.all()
+        if fieldsets.expanded(request, "members", path):
+            members = members.select_related("profile")
+        lookups.append(Prefetch(f"{prefix}members", queryset=members))
+    return lookups
+
+
+class GroupViewSet(ConditionalGetMixin, ModelViewSet):
     """
     Groups views, this allows uses to join and leave groups.
     add multiple uses to groups you have created. 
@@ -52,14 +101,30 @@ class GroupViewSet(ModelViewSet):
         if not self.request.user.is_authenticated:
             return queryset.none()
         if not self.request.user.is_superuser:
-            return queryset.filter(Q(admin=self.request.user) | Q(members = self.request.user)).distinct()
-        return queryset
+            queryset = queryset.filter(Q(admin=self.request.user) | Q(members = self.request.user)).distinct()
+        return queryset.prefetch_related(*group_lookups(self.request))
 
     def perform_create(self, serializer):
         instance = serializer.save(admin=self.request.user)
         instance.members.add(self.request.user)
         instance.save()
 
+    def get_member_group(self, pk) -> Group:
+        """
+        The group ```pk``` if the user may read it, the membership is
+        looked up in the same query on the unique (group, user) index
+        """
+        user = self.request.user
+        membership = Group.members.through.objects.filter(
+            group=OuterRef("pk"), customuser=user.pk
+        )
+        group = get_object_or_404(
+            Group.objects.annotate(is_member=Exists(membership)), pk=pk
+        )
+        if not (group.is_member or group.admin_id == user.pk or user.is_superuser):
+            raise PermissionDenied(_("You are not a member of this group."))
+        return group
+
     @action(
         methods=["get"],
         detail=True,
@@ -166,6 +231,54 @@ class GroupViewSet(ModelViewSet):
         return Response(data=serializer.data)
     
 
+    @extend_schema(responses={"200": PostSerializer(many=True)})
+    @action(
+        methods=["get"],
+        detail=True,
+        url_path="feed",
+        url_name="feed",
+        permission_classes=[rest_permissions.IsAuthenticated,],
+    )
+    def feed(self, request: HttpRequest, pk):
+        """
+        ```Group Feed```
+
+        posts of the group, newest first, for its ```members``` and admin.
+        Follow the ```next``` link to keep scrolling. The first page also
+        lists the latest ```announcements``` of the communities the group is in.
+        Pages come with an ```ETag``` for ```If-None-Match```.
+        """
+        group = self.get_member_group(pk)
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(
+            Post.objects.for_rendering().filter(group=group), request, view=self
+        )
+        announcements = []
+        if not request.query_params.get(paginator.cursor_query_param):
+            announcements = list(
+                Post.objects.for_rendering()
+                .filter(announcement__community__groups=group)
+                .order_by("-date_created", "-id")[:GROUP_FEED_ANNOUNCEMENTS]
+            )
+        # the viewer state of both sections is read at once
+        posts = announcements + page
+        versions, viewer_state = render_cache.versions(
+            posts, PostSerializer(context=self.get_serializer_context())
+        )
+        not_modified = self.not_modified(
+            versions, len(announcements), paginator.get_next_link(), paginator.get_previous_link()
+        )
+        if not_modified:
+            return not_modified
+        data = PostSerializer(
+            instance=posts,
+            many=True,
+            context={**self.get_serializer_context(), "viewer_state": viewer_state},
+        ).data
+        response = paginator.get_paginated_response(data[len(announcements):])
+        response.data["announcements"] = data[: len(announcements)]
+        return response
+
     @action(
         methods=["get"],
         detail=True,
@@ -178,19 +291,105 @@ class GroupViewSet(ModelViewSet):
         this endpoint allows us to see all members of a particular group.
         """
         group = get_object_or_404(Group, pk=pk)
-        users = CustomUser.objects.filter(id__in=[group.members.values_list("id", flat=True)])
+        users = group.members.select_related("profile")
+        paginator = KeysetPagination(ordering=("-date_joined", "-id"))
+        page = paginator.paginate_queryset(users, request, view=self)
         serializer = UserInfoSerializer(
-            instance=users, many=True, context=self.get_serializer_context()
+            instance=page, many=True, context=self.get_serializer_context()
         )
-        return Response(data=serializer.data)
+        return paginator.get_paginated_response(serializer.data)
     
 
-class CommunityViewSet(ModelViewSet):
+class CommunityViewSet(ConditionalGetMixin, ModelViewSet):
     model = Community
     queryset = Community.objects.all()
     serializer_class = CommunitySerializer
     permission_classes = [rest_permissions.IsAuthenticated,]
 
+    def versions(self, communities: list[Community]):
+        """
+        What the payloads of ```communities``` are made of: the columns of
+        each community and of its admin's card with the counts in one query,
+        the groups and the members of expanded groups as loaded with the
+        page. ```None``` when users are expanded inside the groups, those
+        payloads are compared once rendered.
+        """
+        request = self.request
+        if fieldsets.expanded(request, "admin", ("groups",)) or fieldsets.expanded(
+            request, "members", ("groups",)
+        ):
+            return None
+        pks = [community.pk for community in communities]
+        columns = list(COMMUNITY_VERSION_FIELDS)
+        if fieldsets.expanded(request, "admin"):
+            columns += ADMIN_VERSION_FIELDS
+        rows = (
+            Community.objects.filter(pk__in=pks)
+            .annotate(
+                groups_count=count_of(Community.groups.through.objects.all(), "community"),
+                members_count=count_of(Group.members.through.objects.all(), "group__community"),
+            )
+            .order_by()
+            .values_list(*columns, "groups_count", "members_count")
+        )
+        versions = {row[0]: [row] for row in rows}
+        memberships = None
+        if fieldsets.selected(request, "groups"):
+            # the groups, and the members of expanded ones, come with the page
+            members = fieldsets.expanded(request, "groups") and fieldsets.selected(
+                request, "members", ("groups",)
+            )
+            for community in communities:
+                versions[community.pk].append(
+                    [
+                        (
+                            group.pk,
+                            group.name,
+                            group.admin_id,
+                            group.profile_picture.name,
+                            group.profile_picture_variants,
+                            group.date_created,
+                            [user.pk for user in group.members.all()] if members else None,
+                        )
+                        for group in community.groups.all()
+                    ]
+                )
+            if fieldsets.expanded(request, "groups") and not members:
+                # for the member counts of the groups
+                memberships = list(
+                    Group.members.through.objects.filter(group__community__in=pks)
+                    .order_by("group_id", "customuser_id")
+                    .values_list("group_id", "customuser_id")
+                )
+        return [
+            request.build_absolute_uri("/"),
+            fieldsets.signature(request),
+            [versions.get(pk) for pk in pks],
+            memberships,
+        ]
+
+    def list(self, request: HttpRequest, *args, **kwargs):
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        if page is None:
+            return super().list(request, *args, **kwargs)
+        versions = self.versions(page)
+        if versions is not None:
+            not_modified = self.not_modified(
+                versions, self.paginator.get_next_link(), self.paginator.get_previous_link()
+            )
+            if not_modified:
+                return not_modified
+        return self.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    def retrieve(self, request: HttpRequest, *args, **kwargs):
+        community = self.get_object()
+        versions = self.versions([community])
+        if versions is not None:
+            not_modified = self.not_modified(versions)
+            if not_modified:
+                return not_modified
+        return Response(self.get_serializer(community).data)
+
     def get_serializer_class(self) -> CommunityCreateSerializer | CommunitySerializer:
         if not self.request.method == "GET":
             return CommunityCreateSerializer
@@ -201,8 +400,18 @@ class CommunityViewSet(ModelViewSet):
         if not self.request.user.is_authenticated:
             return queryset.none()
         if not self.request.user.is_superuser:
-            return queryset.filter(Q(admin=self.request.user) | Q(groups__id__in = self.request.user.group.all())).distinct()
-        
+            queryset = queryset.filter(Q(admin=self.request.user) | Q(groups__id__in = self.request.user.group.all())).distinct()
+        request = self.request
+        if fieldsets.selected(request, "announcement"):
+            queryset = queryset.select_related("announcement")
+        if fieldsets.selected(request, "admin") and fieldsets.expanded(request, "admin"):
+            queryset = queryset.select_related("admin__profile")
+        if fieldsets.selected(request, "groups"):
+            queryset = queryset.prefetch_related("groups")
+            if fieldsets.expanded(request, "groups"):
+                queryset = queryset.prefetch_related(
+                    *group_lookups(request, ("groups",), "groups__")
+                )
         return queryset
 
     def perform_create(self, serializer):
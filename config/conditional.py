@@ -0,0 +1,67 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+
+SAFE_METHODS = ("GET", "HEAD")
+
+
+class CachePolicyMixin:
+    """
+    ```Cache-Control``` of the successful GET responses of a view, set
+    ```cache_policy``` to the directives (```patch_cache_control``` keywords)
+    or to ```None``` to keep the ```no-store``` default of
+    ```config.middleware.CustomNoCacheMiddleware```.
+
+    The default lets clients keep a copy they revalidate on every use, the
+    ```ETag``` comes from the view or from ```ConditionalGetMiddleware```.
+    """
+
+    cache_policy = {"private": True, "no_cache": True}
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if (
+            self.cache_policy is not None
+            and request.method in SAFE_METHODS
+            and response.status_code in (200, 304)
+        ):
+            patch_cache_control(response, **self.cache_policy)
+            # payloads differ between viewers
+            patch_vary_headers(response, ("Authorization", "Cookie"))
+        return response
+
+
+class ConditionalGetMixin(CachePolicyMixin):
+    """
+    ETags computed from what a payload is made of, before it is serialized.
+
+    A view passes the versions of the rows it is about to render to
+    ```not_modified```, a request whose ```If-None-Match``` matches is then
+    answered with a 304 right away and the rows are never serialized.
+    The negotiated media type is part of the ETag, the browsable API and
+    JSON of the same rows get different ones.
+    """
+
+    etag = None
+
+    def make_etag(self, parts) -> str:
+        user = getattr(self.request, "user", None)
+        media_type = getattr(self.request, "accepted_media_type", None)
+        digest = hashlib.sha1(
+            repr((getattr(user, "pk", None), media_type, parts)).encode()
+        ).hexdigest()
+        return f'W/"{digest}"'
+
+    def not_modified(self, *parts):
+        """ the 304 to send when the client has the payload ```parts``` stand for """
+        if self.request.method not in SAFE_METHODS:
+            return None
+        self.etag = self.make_etag(parts)
+        return get_conditional_response(self.request, etag=self.etag)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.etag and response.status_code in (200, 304):
+            response["ETag"] = self.etag
+            patch_vary_headers(response, ("Accept",))
+        return response
@@ -0,0 +1,81 @@
+"""
+Video probing with the ```ffprobe``` / ```ffmpeg``` binaries.
+
+Only the standard library is used here, ```analyse``` runs in worker
+processes that never touch Django.
+"""
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+
+# seconds a single ffprobe / ffmpeg run may take
+TIMEOUT = 120
+
+
+def binaries(ffprobe="ffprobe", ffmpeg="ffmpeg"):
+    """ paths of ```(ffprobe, ffmpeg)```, either is ```None``` when not installed """
+    return shutil.which(ffprobe), shutil.which(ffmpeg)
+
+
+def probe(ffprobe: str, path: str) -> dict:
+    """ ```{"duration", "width", "height", "codec"}``` of the first video stream of ```path``` """
+    output = subprocess.run(
+        [
+            ffprobe,
+            "-v", "error",
+            "-select_streams", "v:0",
+            "-show_entries", "stream=codec_name,width,height:format=duration",
+            "-of", "json",
+            path,
+        ],
+        capture_output=True,
+        check=True,
+        timeout=TIMEOUT,
+    ).stdout
+    data = json.loads(output or b"{}")
+    stream = (data.get("streams") or [{}])[0]
+    duration = (data.get("format") or {}).get("duration")
+    return {
+        "duration": float(duration) if duration not in (None, "N/A") else None,
+        "width": stream.get("width"),
+        "height": stream.get("height"),
+        "codec": stream.get("codec_name") or "",
+    }
+
+
+def poster_frame(ffmpeg: str, path: str, at: float, max_width: int = 1280) -> bytes:
+    """ a JPEG of the frame at ```at``` seconds, at most ```max_width``` pixels wide """
+    with tempfile.TemporaryDirectory() as directory:
+        target = os.path.join(directory, "poster.jpg")
+        subprocess.run(
+            [
+                ffmpeg,
+                "-v", "error",
+                "-ss", f"{at:.3f}",
+                "-i", path,
+                "-frames:v", "1",
+                "-vf", f"scale='min({max_width},iw)':-2",
+                "-q:v", "3",
+                "-map_metadata", "-1",
+                "-y", target,
+            ],
+            capture_output=True,
+            check=True,
+            timeout=TIMEOUT,
+        )
+        with open(target, "rb") as poster:
+            return poster.read()
+
+
+def analyse(path: str, ffprobe: str, ffmpeg=None, poster=True) -> dict:
+    """
+    Probe ```path``` and, with ```ffmpeg``` and ```poster```, grab a poster
+    frame a tenth into the video (at most 3 seconds in) as ```"poster"```.
+    """
+    info = probe(ffprobe, path)
+    if ffmpeg and poster:
+        at = min((info["duration"] or 0) / 10, 3.0)
+        info["poster"] = poster_frame(ffmpeg, path, at)
+    return info
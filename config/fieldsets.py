@@ -0,0 +1,112 @@
+"""
+Sparse fieldsets for GET responses.
+
+```?fields=``` picks the fields rendered and ```?expand=``` renders related
+objects in full where a serializer would give their ids. Both take comma
+separated names, fields of nested objects are reached with dots:
+```?fields=id,text,user_account.username&expand=members```.
+
+Fields left out are dropped from the serializers before anything is
+rendered, so their queries are never run either.
+"""
+from functools import lru_cache
+
+FIELDS_PARAM = "fields"
+EXPAND_PARAM = "expand"
+SAFE_METHODS = ("GET", "HEAD")
+
+
+@lru_cache(maxsize=256)
+def parse(value: str):
+    """
+    ```"id,user.name"``` is ```{"id": None, "user": {"name": None}}```, where
+    ```None``` stands for the whole field
+    """
+    tree = {}
+    for path in value.split(","):
+        names = [name.strip() for name in path.split(".") if name.strip()]
+        node = tree
+        for depth, name in enumerate(names):
+            if depth == len(names) - 1:
+                node[name] = None
+            elif name in node and node[name] is None:
+                # the whole field is asked for already
+                break
+            else:
+                node = node.setdefault(name, {})
+    return tree
+
+
+def _param(request, name: str):
+    if request is None or request.method not in SAFE_METHODS:
+        return None
+    value = request.GET.get(name)
+    return parse(value) if value else None
+
+
+def _walk(tree, path):
+    for name in path:
+        if tree is None:
+            return None
+        tree = tree.get(name)
+    return tree
+
+
+def selected(request, name: str, path=()) -> bool:
+    """ whether the field ```name``` of the object at ```path``` is rendered """
+    node = _walk(_param(request, FIELDS_PARAM), path)
+    return node is None or name in node
+
+
+def expanded(request, name: str, path=()) -> bool:
+    """ whether the field ```name``` of the object at ```path``` is expanded """
+    node = _walk(_param(request, EXPAND_PARAM) or {}, path)
+    return isinstance(node, dict) and name in node
+
+
+def signature(request) -> str:
+    """ the field selection of ```request```, for cache keys """
+    return repr((_param(request, FIELDS_PARAM), _param(request, EXPAND_PARAM)))
+
+
+class SparseFieldsetsMixin:
+    """
+    Serializers rendering only the fields asked for with ```?fields=```.
+
+    ```Meta.expandable_fields``` maps field names to a callable building the
+    field that renders them in full, used with ```?expand=```.
+
+    Nested serializers follow the request through their parents; set
+    ```fieldset_path``` on one built by hand for a field of another serializer.
+    """
+
+    fieldset_path = None
+
+    def get_fieldset_path(self) -> tuple:
+        names, node = [], self
+        while node is not None:
+            if isinstance(node, SparseFieldsetsMixin) and node.fieldset_path is not None:
+                return tuple(node.fieldset_path) + tuple(reversed(names))
+            if getattr(node, "field_name", None):
+                names.append(node.field_name)
+            node = getattr(node, "parent", None)
+        return tuple(reversed(names))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get("request")
+        if request is None or request.method not in SAFE_METHODS:
+            return fields
+        path = self.get_fieldset_path()
+        for name, build in getattr(self.Meta, "expandable_fields", {}).items():
+            if name in fields and expanded(request, name, path):
+                fields[name] = build()
+        return {
+            name: field
+            for name, field in fields.items()
+            if selected(request, name, path)
+        }
+
+    def is_selected(self, name: str) -> bool:
+        return selected(self.context.get("request"), name, self.get_fieldset_path())
+
@@ -0,0 +1,208 @@
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models.signals import post_delete, post_save
+from PIL import Image, ImageOps
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+# longest edge in pixels of each variant, images are never upscaled
+IMAGE_VARIANTS = getattr(
+    settings, "IMAGE_VARIANTS", {"thumbnail": 160, "feed": 720, "full": 1600}
+)
+# threads rendering variants, Pillow releases the GIL while resizing and encoding
+IMAGE_WORKERS = getattr(settings, "IMAGE_WORKERS", 2)
+
+IMAGE_FORMATS = (
+    ("webp", "WEBP", {"quality": 80, "method": 4}),
+    ("jpeg", "JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+)
+
+# ```(model, field, variants_field)``` of every registered image field
+REGISTRY = []
+
+_executor = None
+
+
+def executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=IMAGE_WORKERS, thread_name_prefix="image-variants"
+        )
+    return _executor
+
+
+def _has_alpha(image: Image.Image) -> bool:
+    return image.mode in ("RGBA", "LA") or (
+        image.mode == "P" and "transparency" in image.info
+    )
+
+
+def _encode(image: Image.Image, fmt: str, options: dict) -> bytes:
+    if fmt == "JPEG" and image.mode == "RGBA":
+        flat = Image.new("RGB", image.size, "white")
+        flat.paste(image, mask=image.getchannel("A"))
+        image = flat
+    buffer = BytesIO()
+    # nothing but the pixels is written, EXIF, XMP and ICC data are dropped
+    image.save(buffer, fmt, **options)
+    return buffer.getvalue()
+
+
+def derive(name: str, storage=None) -> dict:
+    """
+    Render the ```IMAGE_VARIANTS``` of the image stored as ```name```, in
+    WebP and JPEG, next to it under ```variants/```. Returns
+
+    ```{"source": name, "width", "height", "variants": {variant: {"width", "height", "webp": path, "jpeg": path}}}```
+    """
+    storage = storage or default_storage
+    with storage.open(name, "rb") as source, Image.open(source) as original:
+        # applies the EXIF orientation, the variants carry no EXIF
+        image = ImageOps.exif_transpose(original)
+    image = image.convert("RGBA" if _has_alpha(image) else "RGB")
+
+    directory, base = posixpath.split(posixpath.splitext(name)[0])
+    variants = {}
+    for variant, edge in IMAGE_VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail((edge, edge), Image.LANCZOS)
+        entry = {"width": resized.width, "height": resized.height}
+        for extension, fmt, options in IMAGE_FORMATS:
+            path = posixpath.join(directory, "variants", f"{base}_{variant}.{extension}")
+            if storage.exists(path):
+                storage.delete(path)
+            entry[extension] = storage.save(
+                path, ContentFile(_encode(resized, fmt, options))
+            )
+        variants[variant] = entry
+    return {
+        "source": name,
+        "width": image.width,
+        "height": image.height,
+        "variants": variants,
+    }
+
+
+def discard(info: dict, storage=None):
+    """ delete the variant files of ```info``` """
+    storage = storage or default_storage
+    for entry in (info or {}).get("variants", {}).values():
+        for extension, _, _ in IMAGE_FORMATS:
+            if entry.get(extension):
+                storage.delete(entry[extension])
+
+
+def build(model, pk, field: str, variants_field: str, on_ready=None):
+    """
+    (Re)build the variants of ```field``` of one row and store them in
+    ```variants_field```, the variants of a replaced image are deleted.
+    """
+    instance = model.objects.filter(pk=pk).first()
+    if instance is None:
+        return
+    file = getattr(instance, field)
+    previous = getattr(instance, variants_field) or {}
+    info = derive(file.name, file.storage) if file else {}
+    if not model.objects.filter(pk=pk).update(**{variants_field: info}):
+        # deleted while the variants were rendered
+        discard(info, file.storage)
+        return
+    # the variants of a replaced image go with it
+    if previous.get("source") != info.get("source"):
+        discard(previous, file.storage)
+    if on_ready is not None:
+        on_ready(instance)
+
+
+def _build_in_worker(*args):
+    try:
+        build(*args)
+    except Exception:
+        logger.exception("could not build the image variants of %r", args[:3])
+    finally:
+        connections.close_all()
+
+
+def schedule(model, pk, field: str, variants_field: str, on_ready=None):
+    """ build the variants in the worker pool once the current transaction commits """
+    transaction.on_commit(
+        lambda: executor().submit(
+            _build_in_worker, model, pk, field, variants_field, on_ready
+        )
+    )
+
+
+def register(model, field: str, variants_field: str, on_ready=None):
+    """
+    Keep ```variants_field``` (a ```JSONField```) of ```model``` in step with
+    its image ```field```, ```on_ready(instance)``` is called once the
+    variants of a new image are stored. The variant files are deleted with
+    the row.
+    """
+    REGISTRY.append((model, field, variants_field, on_ready))
+
+    def image_saved(sender, instance, raw=False, **kwargs):
+        if raw:
+            return
+        name = getattr(instance, field).name or ""
+        info = getattr(instance, variants_field) or {}
+        if name != info.get("source", ""):
+            schedule(model, instance.pk, field, variants_field, on_ready)
+
+    def image_deleted(sender, instance, **kwargs):
+        info = getattr(instance, variants_field) or {}
+        if info.get("variants"):
+            storage = getattr(instance, field).storage
+            transaction.on_commit(lambda: discard(info, storage))
+
+    post_save.connect(
+        image_saved,
+        sender=model,
+        weak=False,
+        dispatch_uid=f"image-variants:{model._meta.label}.{field}",
+    )
+    post_delete.connect(
+        image_deleted,
+        sender=model,
+        weak=False,
+        dispatch_uid=f"image-variants-delete:{model._meta.label}.{field}",
+    )
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """
+    Renders the stored variants of an image as urls, ```None``` until they are built:
+
+    ```{"width", "height", "thumbnail": {"width", "height", "webp": url, "jpeg": url}, "feed": ..., "full": ...}```
+    """
+
+    def to_representation(self, info):
+        if not info or not info.get("variants"):
+            return None
+        request = self.context.get("request")
+
+        def url(path):
+            url = default_storage.url(path)
+            return request.build_absolute_uri(url) if request else url
+
+        data = {"width": info["width"], "height": info["height"]}
+        for variant, entry in info["variants"].items():
+            data[variant] = {
+                "width": entry["width"],
+                "height": entry["height"],
+                **{
+                    extension: url(entry[extension])
+                    for extension, _, _ in IMAGE_FORMATS
+                    if entry.get(extension)
+                },
+            }
+        return data
@@ -0,0 +1,151 @@
+import mimetypes
+import os
+import re
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+
+# how long clients may reuse a media file before revalidating it
+MEDIA_CACHE_MAX_AGE = getattr(settings, "MEDIA_CACHE_MAX_AGE", 60 * 60)
+# hand the transfer over to the front proxy: None, "x-accel-redirect" (nginx)
+# or "x-sendfile" (apache, lighttpd)
+MEDIA_SENDFILE = getattr(settings, "MEDIA_SENDFILE", None)
+# internal location nginx maps to MEDIA_ROOT in "x-accel-redirect" mode
+MEDIA_ACCEL_PREFIX = getattr(settings, "MEDIA_ACCEL_PREFIX", "/protected-media/")
+
+# directories of MEDIA_ROOT never served, e.g. unfinished uploads
+MEDIA_PRIVATE_DIRS = getattr(
+    settings, "MEDIA_PRIVATE_DIRS", ("video_uploads", "blobs")
+)
+
+RANGE_RE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+class RangeFile:
+    """ a file object reading ```length``` bytes from ```start``` """
+
+    def __init__(self, file, start: int, length: int):
+        self.file = file
+        self.remaining = length
+        file.seek(start)
+
+    def read(self, size=-1):
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header: str, size: int):
+    """
+    The ```(start, end)``` (inclusive) of a single ```bytes=``` range, ```None```
+    to serve the whole file (no range, several ranges, garbage) or ```()``` if
+    the range cannot be satisfied
+    """
+    match = RANGE_RE.match(header.strip()) if header else None
+    if match is None:
+        return None
+    first, last = match.groups()
+    if not first:
+        if not last:
+            return None
+        # suffix range, the last ```last``` bytes
+        length = min(int(last), size)
+        return (size - length, size - 1) if length else ()
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or end < start:
+        return ()
+    return start, end
+
+
+def _range_applies(request, etag: str, mtime: float) -> bool:
+    """ ```If-Range``` asks for the whole file if it changed since """
+    if_range = request.headers.get("If-Range")
+    if not if_range:
+        return True
+    if if_range.startswith(('"', "W/")):
+        return if_range == etag
+    since = parse_http_date_safe(if_range)
+    return since is not None and int(mtime) <= since
+
+
+def serve_media(request, path: str):
+    """
+    Serve a file of ```MEDIA_ROOT```: single byte ranges (```206```) so video
+    players can seek, ```ETag``` / ```Last-Modified``` revalidation (```304```)
+    and, with ```MEDIA_SENDFILE```, a hand over to the front proxy.
+
+    Whole files go through ```FileResponse```, which the WSGI server streams
+    with ```sendfile()``` when it provides ```wsgi.file_wrapper```.
+    """
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+    except (ValueError, SuspiciousFileOperation):
+        raise Http404()
+    top = os.path.relpath(fullpath, settings.MEDIA_ROOT).split(os.sep)[0]
+    if top in MEDIA_PRIVATE_DIRS:
+        raise Http404()
+    try:
+        stat = os.stat(fullpath)
+    except (FileNotFoundError, NotADirectoryError):
+        raise Http404()
+    if not os.path.isfile(fullpath):
+        raise Http404()
+
+    size, mtime = stat.st_size, stat.st_mtime
+    etag = f'"{stat.st_mtime_ns:x}-{size:x}"'
+    response = get_conditional_response(
+        request, etag=etag, last_modified=int(mtime)
+    )
+    if response is None:
+        response = _file_response(request, fullpath, path, size, etag, mtime)
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(mtime)
+    response["Accept-Ranges"] = "bytes"
+    patch_cache_control(response, public=True, max_age=MEDIA_CACHE_MAX_AGE)
+    return response
+
+
+def _file_response(request, fullpath: str, path: str, size: int, etag: str, mtime: float):
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    content_type = content_type or "application/octet-stream"
+
+    if MEDIA_SENDFILE:
+        # the proxy reads the file, and answers ranges, itself
+        response = HttpResponse(content_type=content_type)
+        if MEDIA_SENDFILE == "x-accel-redirect":
+            response["X-Accel-Redirect"] = MEDIA_ACCEL_PREFIX + path.lstrip("/")
+        else:
+            response["X-Sendfile"] = fullpath
+        return response
+
+    byte_range = None
+    if request.method in ("GET", "HEAD") and _range_applies(request, etag, mtime):
+        byte_range = parse_range(request.headers.get("Range"), size)
+    if byte_range == ():
+        response = HttpResponse(status=416)
+        response["Content-Range"] = f"bytes */{size}"
+        return response
+
+    file = open(fullpath, "rb")
+    if byte_range is None:
+        response = FileResponse(file, content_type=content_type)
+    else:
+        start, end = byte_range
+        response = FileResponse(
+            RangeFile(file, start, end - start + 1), status=206, content_type=content_type
+        )
+        response["Content-Length"] = str(end - start + 1)
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+    if encoding:
+        response["Content-Encoding"] = encoding
+    return response
@@ -1,12 +1,19 @@
 from django.http import HttpRequest, HttpResponse
 class CustomNoCacheMiddleware:
+    """
+    Responses are not cached unless their view sets its own policy, see
+    ```config.conditional.CachePolicyMixin```
+    """
+
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request: HttpRequest):
         response: HttpResponse = self.get_response(request)
+        if response.has_header("Cache-Control"):
+            return response
         if not (request.path.startswith("/static") or request.path.startswith("/media")):
             response["Cache-Control"] = "no-cache, no-store, must-revalidate"
             response["Pragma"] = "no-cache"
             response["Expires"] = "0"
-        return response
\ No newline at end of file
+        return response
@@ -0,0 +1,167 @@
+from base64 import b64decode, b64encode
+from copy import copy
+from urllib import parse
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.filters import OrderingFilter
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination on a ```(date, id)``` key.
+
+    Pages are fetched with ```WHERE (date, id) < (last_date, last_id)```
+    instead of an ```OFFSET```, and no total ```COUNT(*)``` is run, so the
+    last page of a deep scroll costs the same as the first one and rows
+    inserted while scrolling neither repeat nor get skipped.
+
+    The key may also be an annotation of the queryset, e.g. a search rank.
+
+    The response is ```{"next": url, "previous": url, "results": [...]}```,
+    the cursors in ```next``` / ```previous``` are opaque.
+    """
+
+    ordering = ("-date_created", "-id")
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    invalid_cursor_message = _("Invalid cursor")
+
+    def __init__(self, ordering=None, page_size=None):
+        if ordering is not None:
+            self.ordering = ordering
+        if page_size is not None:
+            self.page_size = page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.limit = self.get_page_size(request)
+
+        (key, id_field), descending = self.get_ordering(request, queryset, view)
+        self.key, self.id_field = key, id_field
+        self.key_field = self.get_key_field(queryset, key)
+
+        cursor = self.decode_cursor(request)
+        backwards = cursor is not None and cursor["reverse"]
+        # walking backwards flips the direction of the index scan
+        scan_descending = descending != backwards
+        prefix = "-" if scan_descending else ""
+        queryset = queryset.order_by(f"{prefix}{key}", f"{prefix}{id_field}")
+
+        if cursor is not None:
+            op = "lt" if scan_descending else "gt"
+            queryset = queryset.filter(
+                Q(**{f"{key}__{op}": cursor["key"]})
+                | Q(**{key: cursor["key"], f"{id_field}__{op}": cursor["id"]})
+            )
+
+        rows = list(queryset[: self.limit + 1])
+        has_more = len(rows) > self.limit
+        rows = rows[: self.limit]
+        if backwards:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, cursor is not None
+
+        self.page = rows
+        return rows
+
+    def get_key_field(self, queryset, key: str):
+        annotation = queryset.query.annotations.get(key)
+        if annotation is None:
+            return queryset.model._meta.get_field(key)
+        # reads and writes the cursor value like a field of the model would
+        field = copy(annotation.output_field)
+        field.set_attributes_from_name(key)
+        return field
+
+    def get_page_size(self, request):
+        if self.page_size_query_param:
+            try:
+                size = int(request.query_params[self.page_size_query_param])
+                if size > 0:
+                    return min(size, self.max_page_size)
+            except (KeyError, ValueError):
+                pass
+        return self.page_size
+
+    def get_ordering(self, request, queryset, view):
+        """
+        Returns ```((key, id_field), descending)```, a view using ```OrderingFilter```
+        may flip the direction with ```?ordering=key``` / ```?ordering=-key```.
+        """
+        key, id_field = (field.lstrip("-") for field in self.ordering)
+        descending = self.ordering[0].startswith("-")
+        for backend in getattr(view, "filter_backends", ()):
+            if isinstance(backend, type) and issubclass(backend, OrderingFilter):
+                requested = backend().get_ordering(request, queryset, view) or ()
+                if requested and requested[0].lstrip("-") == key:
+                    descending = requested[0].startswith("-")
+        return (key, id_field), descending
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            querystring = b64decode(encoded.encode("ascii")).decode("ascii")
+            tokens = parse.parse_qs(querystring, keep_blank_values=True)
+            return {
+                "key": self.key_field.to_python(tokens["k"][0]),
+                "id": int(tokens["i"][0]),
+                "reverse": bool(int(tokens.get("r", ["0"])[0])),
+            }
+        except (TypeError, ValueError, KeyError, UnicodeError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, row, reverse: bool):
+        tokens = {
+            "k": self.key_field.value_to_string(row),
+            "i": getattr(row, self.id_field),
+        }
+        if reverse:
+            tokens["r"] = "1"
+        encoded = b64encode(parse.urlencode(tokens).encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
@@ -0,0 +1,41 @@
+"""
+JSON rendering with ```orjson``` when it is installed.
+
+orjson encodes a page of posts several times faster than the standard
+library. Without it, or for output it can't produce (indented JSON,
+integers over 64 bits), DRF's stock renderer is used.
+"""
+from rest_framework import renderers
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+_encoder = JSONEncoder()
+
+
+def default(obj):
+    """
+    Types orjson does not know (```Decimal```, lazy translation strings,
+    querysets, ...) are converted the way DRF's ```JSONEncoder``` does
+    """
+    return _encoder.default(obj)
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    # responses are always UTF-8
+    charset = "utf-8"
+    # datetimes in UTC end in "Z" like with DRF's encoder
+    orjson_options = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        if orjson is None or self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            return orjson.dumps(data, default=default, option=self.orjson_options)
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
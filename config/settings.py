@@ -57,6 +57,8 @@ MIDDLEWARE = [
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.common.CommonMiddleware",
+    # ETags for cacheable responses whose view did not set one
+    "django.middleware.http.ConditionalGetMiddleware",
     "debug_toolbar.middleware.DebugToolbarMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -153,6 +155,14 @@ STATICFILES_DIRS = [BASE_DIR / "static"]
 STATICFILES_STORAGE = "whitenoise.storage.CompressedManifestStaticFilesStorage"
 MEDIA_ROOT = os.path.join(BASE_DIR, "media")
 MEDIA_URL = "/media/"
+# identical uploads are stored once, see config.storage
+DEFAULT_FILE_STORAGE = "config.storage.ContentAddressedStorage"
+# media is served by config.media.serve_media, set MEDIA_SENDFILE to
+# "x-accel-redirect" (nginx, internal location MEDIA_ACCEL_PREFIX) or
+# "x-sendfile" to let the front proxy send the files
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_PREFIX = "/protected-media/"
+MEDIA_CACHE_MAX_AGE = 60 * 60
 
 # django-crispy-forms
 # https://django-crispy-forms.readthedocs.io/en/latest/install.html#template-packs
@@ -205,8 +215,57 @@ REST_FRAMEWORK = {
         "rest_framework.authentication.BasicAuthentication",
     ),
     "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
+    # orjson when installed, see config.renderers
+    "DEFAULT_RENDERER_CLASSES": (
+        "config.renderers.JSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "config.parsers.JSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
 }
 
+# random video feed, see post.discovery
+VIDEO_POOL_SIZE = 5000  # most recent video posts sampled from
+VIDEO_POOL_TTL = 300  # seconds before the pool is rebuilt
+
+# home timeline, see post.timeline
+FEED_FANOUT_LIMIT = 10000  # followers above which an author is fanned out on read
+FEED_BACKFILL_SIZE = 100  # posts copied into a timeline on follow
+
+# announcement posts shown above the first page of a group feed, see community.views
+GROUP_FEED_ANNOUNCEMENTS = 3
+
+# like and share counters of posts, see post.counters; above 0 increments are
+# spread over that many rows per post and folded in by `flush_post_counters`
+POST_COUNTER_SHARDS = 0
+POST_COUNTER_FLUSH_INTERVAL = 60  # seconds, shards are flushed in the background
+
+# threads writing the pictures of a new post, see post.attachments
+PICTURE_UPLOAD_WORKERS = 4
+
+# resumable video uploads, see post.uploads
+VIDEO_UPLOAD_CHUNK_SIZE = 5 * 1024 * 1024
+VIDEO_UPLOAD_MAX_SIZE = 2 * 1024 ** 3
+VIDEO_UPLOAD_EXPIRY = 24 * 60 * 60  # seconds, see the purge_video_uploads command
+
+# video duration, resolution, codec and poster frames, see post.video_metadata;
+# skipped when ffprobe is not installed
+VIDEO_PROBE_WORKERS = 2
+FFPROBE_BINARY = "ffprobe"
+FFMPEG_BINARY = "ffmpeg"
+
+# cached post payloads, see post.render_cache
+POST_RENDER_CACHE = "default"
+POST_RENDER_CACHE_TIMEOUT = 60 * 60
+# levels of a repost chain rendered in full, deeper ones are id-only stubs
+SHARED_FROM_DEPTH = 2
+
+# PostgreSQL text search configuration of the post search index, see post.search
+POST_SEARCH_CONFIG = "simple"
+
 DEFAULT_PARSER_CLASSES = (
     "rest_framework.parsers.MultiPartParser",
     "rest_framework.parsers.FileUploadParser",
@@ -0,0 +1,161 @@
+import hashlib
+import os
+import uuid
+
+from django.core.files.storage import FileSystemStorage
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    A ```FileSystemStorage``` keeping a single copy of identical files.
+
+    Every upload is hashed (SHA-256), its bytes are kept once as
+    ```blobs/<aa>/<bb>/<digest><ext>``` and the name the field asked for
+    (```post_pictures/cat.jpg```) becomes a hard link to that blob. Seekable
+    uploads are hashed before anything is written, so the bytes of one
+    already stored are never copied, and new ones sitting in a file on the
+    same file system are linked rather than copied. Streams are hashed
+    while they are staged. The link count of a blob is its reference count: deleting a
+    name drops one reference and the blob goes with the last one.
+
+    The digest is kept in an extended attribute of the file, shared by all
+    its links, so a blob is found without reading the file again. Files
+    without it (stored before, or on a file system without extended
+    attributes) are hashed when needed.
+
+    Hard links need ```MEDIA_ROOT``` to sit on a single file system.
+    """
+
+    blob_dir = "blobs"
+    hash_block_size = 64 * 1024
+    digest_attribute = "user.content_sha256"
+
+    def blob_name(self, digest: str, extension: str = "") -> str:
+        return "/".join(
+            (self.blob_dir, digest[:2], digest[2:4], f"{digest}{extension.lower()}")
+        )
+
+    def _digest(self, content) -> str:
+        digest = hashlib.sha256()
+        for chunk in content.chunks(self.hash_block_size):
+            digest.update(chunk.encode() if isinstance(chunk, str) else chunk)
+        return digest.hexdigest()
+
+    def _seekable(self, content) -> bool:
+        try:
+            return content.seekable()
+        except (AttributeError, ValueError):
+            return False
+
+    def _stored_digest(self, path: str):
+        try:
+            return os.getxattr(path, self.digest_attribute).decode("ascii")
+        except (AttributeError, OSError):
+            return None
+
+    def _store_digest(self, path: str, digest: str):
+        try:
+            os.setxattr(path, self.digest_attribute, digest.encode("ascii"))
+        except (AttributeError, OSError):
+            pass
+
+    def _blob_of(self, name: str) -> str:
+        path = self.path(name)
+        digest = self._stored_digest(path)
+        if digest is None:
+            with self.open(name, "rb") as file:
+                digest = self._digest(file)
+            self._store_digest(path, digest)
+        return self.blob_name(digest, os.path.splitext(name)[1])
+
+    def _stage(self, content, digest: str = None) -> tuple[str, str]:
+        """
+        Put ```content``` in a staging file and return its path and digest.
+        A file on disk (```temporary_file_path()```, like Django's temporary
+        uploads) is hard linked when it is on the same file system, anything
+        else is written in one pass, hashed on the way.
+        """
+        directory = self.path(f"{self.blob_dir}/staging")
+        os.makedirs(directory, exist_ok=True)
+        staged = os.path.join(directory, uuid.uuid4().hex)
+        linked = False
+        if digest is not None and hasattr(content, "temporary_file_path"):
+            try:
+                os.link(content.temporary_file_path(), staged)
+                linked = True
+            except OSError:
+                # another file system, copied below
+                pass
+        try:
+            if not linked:
+                hashed = hashlib.sha256()
+                with open(staged, "xb") as file:
+                    for chunk in content.chunks(self.hash_block_size):
+                        if isinstance(chunk, str):
+                            chunk = chunk.encode()
+                        hashed.update(chunk)
+                        file.write(chunk)
+                digest = hashed.hexdigest()
+            if self.file_permissions_mode is not None:
+                os.chmod(staged, self.file_permissions_mode)
+            self._store_digest(staged, digest)
+        except BaseException:
+            os.remove(staged)
+            raise
+        return staged, digest
+
+    def _link(self, source: str, name: str) -> str:
+        """ link ```name```, or the next free name, to ```source``` """
+        while True:
+            full_path = self.path(name)
+            os.makedirs(os.path.dirname(full_path), exist_ok=True)
+            try:
+                os.link(source, full_path)
+                return str(name).replace("\\", "/")
+            except FileExistsError:
+                name = self.get_available_name(name)
+
+    def _save(self, name, content):
+        extension = os.path.splitext(name)[1]
+        staged = None
+        if self._seekable(content):
+            digest = self._digest(content)
+        else:
+            staged, digest = self._stage(content)
+        try:
+            while True:
+                blob_path = self.path(self.blob_name(digest, extension))
+                try:
+                    return self._link(blob_path, name)
+                except FileNotFoundError:
+                    # new bytes, or the blob went with its last name meanwhile
+                    if staged is None:
+                        staged, digest = self._stage(content, digest)
+                        continue
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                try:
+                    # the staged file becomes the blob
+                    os.link(staged, blob_path)
+                except FileExistsError:
+                    # stored meanwhile, the staged copy is dropped
+                    pass
+        finally:
+            if staged is not None:
+                os.remove(staged)
+
+    def delete(self, name):
+        if not name or not self.exists(name):
+            return
+        blob = self._blob_of(name) if not name.startswith(f"{self.blob_dir}/") else None
+        super().delete(name)
+        if blob and self.exists(blob) and self.references(blob) <= 0:
+            super().delete(blob)
+
+    def references(self, name: str) -> int:
+        """ names linked to the bytes of ```name```, the blob itself aside """
+        try:
+            links = os.stat(self.path(name)).st_nlink
+        except FileNotFoundError:
+            return 0
+        blob = name if name.startswith(f"{self.blob_dir}/") else self._blob_of(name)
+        return links - 1 if self.exists(blob) else links
@@ -0,0 +1,210 @@
+import io
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from decimal import Decimal
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ParseError
+
+from . import renderers
+from .media import serve_media
+from .parsers import JSONParser
+from .storage import ContentAddressedStorage
+
+
+class MediaServingTest(SimpleTestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        self.settings = override_settings(MEDIA_ROOT=self.media)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        os.makedirs(os.path.join(self.media, "post_videos"))
+        with open(os.path.join(self.media, "post_videos", "clip.mp4"), "wb") as clip:
+            clip.write(bytes(range(100)))
+        self.url = "/media/post_videos/clip.mp4"
+
+    def body(self, response):
+        return b"".join(response.streaming_content)
+
+    def test_whole_file_and_revalidation(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["Content-Type"], "video/mp4")
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertEqual(self.body(response), bytes(range(100)))
+
+        cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(cached.status_code, 304)
+        cached = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(cached.status_code, 304)
+
+    def test_byte_ranges(self):
+        response = self.client.get(self.url, HTTP_RANGE="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], "bytes 10-19/100")
+        self.assertEqual(response["Content-Length"], "10")
+        self.assertEqual(self.body(response), bytes(range(10, 20)))
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=-5")
+        self.assertEqual(self.body(response), bytes(range(95, 100)))
+        response = self.client.get(self.url, HTTP_RANGE="bytes=90-")
+        self.assertEqual(response["Content-Range"], "bytes 90-99/100")
+
+        response = self.client.get(self.url, HTTP_RANGE="bytes=200-")
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], "bytes */100")
+
+        stale = self.client.get(self.url, HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE='"stale"')
+        self.assertEqual(stale.status_code, 200)
+
+    def test_missing_and_outside_files(self):
+        request = RequestFactory().get("/media/")
+        os.makedirs(os.path.join(self.media, "video_uploads"))
+        open(os.path.join(self.media, "video_uploads", "upload.part"), "wb").close()
+        for path in (
+            "post_videos/nope.mp4",
+            "../config/settings.py",
+            "post_videos",
+            "video_uploads/upload.part",
+        ):
+            with self.assertRaises(Http404):
+                serve_media(request, path)
+
+    @mock.patch("config.media.MEDIA_SENDFILE", "x-accel-redirect")
+    def test_proxy_hand_over(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response["X-Accel-Redirect"], "/protected-media/post_videos/clip.mp4")
+        self.assertEqual(response.content, b"")
+
+
+class ContentAddressedStorageTest(SimpleTestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        self.storage = ContentAddressedStorage(location=self.media)
+
+    def blobs(self):
+        return [
+            name
+            for _, _, names in os.walk(os.path.join(self.media, "blobs"))
+            for name in names
+        ]
+
+    def test_identical_uploads_share_one_blob(self):
+        first = self.storage.save("post_pictures/meme.jpg", ContentFile(b"meme"))
+        again = self.storage.save("post_pictures/meme.jpg", ContentFile(b"meme"))
+        other = self.storage.save("user/profile_pictures/me.jpg", ContentFile(b"meme"))
+        self.storage.save("post_pictures/cat.jpg", ContentFile(b"cat"))
+
+        self.assertNotEqual(first, again)
+        self.assertEqual(len(self.blobs()), 2)
+        self.assertEqual(
+            os.stat(self.storage.path(first)).st_ino, os.stat(self.storage.path(other)).st_ino
+        )
+        with self.storage.open(other) as stored:
+            self.assertEqual(stored.read(), b"meme")
+        self.assertEqual(self.storage.references(first), 3)
+
+        self.storage.delete(first)
+        self.storage.delete(again)
+        self.assertEqual(self.storage.references(other), 1)
+        self.assertEqual(len(self.blobs()), 2)
+        self.storage.delete(other)
+        self.assertEqual(len(self.blobs()), 1)
+
+    def test_streams_are_read_once(self):
+        content = ContentFile(b"video" * 1000)
+        stream = mock.patch.object(ContentFile, "seekable", return_value=False)
+        with stream, mock.patch.object(
+            ContentFile, "chunks", autospec=True, side_effect=ContentFile.chunks
+        ) as chunks:
+            name = self.storage.save("post_videos/clip.mp4", content)
+        chunks.assert_called_once()
+        with mock.patch.object(self.storage, "_digest") as digest:
+            self.assertEqual(self.storage.references(name), 1)
+            self.storage.delete(name)
+        digest.assert_not_called()
+        self.assertEqual(self.blobs(), [])
+
+    def test_stored_bytes_are_not_written_again(self):
+        first = self.storage.save("post_videos/clip.mp4", ContentFile(b"video" * 1000))
+        staging = os.path.join(self.media, "blobs", "staging")
+        with mock.patch.object(self.storage, "_stage", wraps=self.storage._stage) as stage:
+            again = self.storage.save("post_videos/clip.mp4", ContentFile(b"video" * 1000))
+        stage.assert_not_called()
+        self.assertEqual(os.listdir(staging), [])
+        self.assertEqual(
+            os.stat(self.storage.path(first)).st_ino, os.stat(self.storage.path(again)).st_ino
+        )
+
+    def test_blob_deleted_while_saving_is_stored_again(self):
+        link = os.link
+        first = self.storage.save("post_pictures/a.jpg", ContentFile(b"same"))
+        blob = self.storage._blob_of(first)
+        calls = []
+
+        def racing_link(source, target):
+            # the other name and the blob go right before the name is linked
+            if source == self.storage.path(blob) and not calls:
+                calls.append(target)
+                self.storage.delete(first)
+            return link(source, target)
+
+        with mock.patch("config.storage.os.link", side_effect=racing_link):
+            second = self.storage.save("post_pictures/b.jpg", ContentFile(b"same"))
+        self.assertTrue(calls)
+        with self.storage.open(second) as stored:
+            self.assertEqual(stored.read(), b"same")
+        self.assertEqual(self.storage.references(second), 1)
+        self.assertEqual(len(self.blobs()), 1)
+
+
+class JSONRenderingTest(SimpleTestCase):
+    data = {
+        "when": datetime(2024, 1, 2, 3, 4, 5, 600000, tzinfo=timezone.utc),
+        "duration": Decimal("12.50"),
+        "message": _("Invalid cursor"),
+        "text": "caf\u00e9",
+        1: None,
+    }
+    expected = {
+        "when": "2024-01-02T03:04:05.600000Z",
+        "duration": 12.5,
+        "message": "Invalid cursor",
+        "text": "caf\u00e9",
+        "1": None,
+    }
+
+    def round_trip(self, data, **kwargs):
+        body = renderers.JSONRenderer().render(data, **kwargs)
+        return body, JSONParser().parse(io.BytesIO(body))
+
+    def test_types_match_the_stock_renderer(self):
+        body, parsed = self.round_trip(self.data)
+        self.assertEqual(parsed, self.expected)
+        self.assertIn("caf\u00e9".encode(), body)
+
+    def test_without_orjson(self):
+        with mock.patch.object(renderers, "orjson", None), mock.patch(
+            "config.parsers.orjson", None
+        ):
+            self.assertEqual(self.round_trip(self.data)[1], self.expected)
+
+    def test_indent_and_big_integers_fall_back(self):
+        body, parsed = self.round_trip(
+            {"n": 2 ** 70}, accepted_media_type="application/json; indent=2"
+        )
+        self.assertEqual(parsed, {"n": 2 ** 70})
+        self.assertIn(b'\n  "n"', body)
+        self.assertEqual(self.round_trip({"n": 2 ** 70})[1], {"n": 2 ** 70})
+
+    def test_parse_error(self):
+        with self.assertRaises(ParseError):
+            JSONParser().parse(io.BytesIO(b"{nope"))
@@ -1,8 +1,9 @@
 from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.conf import settings
 from django.conf.urls.static import static
+from config.media import serve_media
 from drf_spectacular.views import (
     SpectacularAPIView,
     SpectacularRedocView,
@@ -38,7 +39,7 @@ urlpatterns = [
 ]
 urlpatterns = (
     urlpatterns
-    + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    + [re_path(rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>.*)$", serve_media)]
     + static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 )
 
@@ -5,6 +5,10 @@ from .models import (
     PostComment,
     PostPicture, 
     PostVideo, 
+    FanoutOnReadAuthor,
+    HiddenComment,
+    MutedCommenter,
+    AnnouncementDelivery,
 )
 
 
@@ -34,3 +38,7 @@ admin.site.register(Post)
 admin.site.register(PostPicture)
 admin.site.register(PostComment) 
 admin.site.register(PostVideo) 
+admin.site.register(FanoutOnReadAuthor)
+admin.site.register(HiddenComment)
+admin.site.register(MutedCommenter)
+admin.site.register(AnnouncementDelivery)
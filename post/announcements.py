@@ -0,0 +1,53 @@
+from itertools import islice
+
+from community.models import Group
+
+from .models import AnnouncementDelivery, Post
+
+ANNOUNCEMENT_BATCH_SIZE = 1000
+
+
+def recipients(post: Post):
+    """
+    Ids of the members of the groups of the post's community, each once and
+    the author aside, read with a single query
+    """
+    return (
+        Group.members.through.objects.filter(
+            group__community__announcement=post.announcement_id
+        )
+        .exclude(customuser_id=post.user_id)
+        .values_list("customuser_id", flat=True)
+        .distinct()
+        .order_by()
+        .iterator(chunk_size=ANNOUNCEMENT_BATCH_SIZE)
+    )
+
+
+def deliver(post: Post):
+    """ put a new announcement post in the inbox of every community member """
+    if not post.announcement_id:
+        return
+    owner_ids = recipients(post)
+    while batch := list(islice(owner_ids, ANNOUNCEMENT_BATCH_SIZE)):
+        AnnouncementDelivery.objects.bulk_create(
+            [
+                AnnouncementDelivery(
+                    owner_id=owner_id, post_id=post.pk, date_created=post.date_created
+                )
+                for owner_id in batch
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def unread(user):
+    return AnnouncementDelivery.objects.filter(owner=user, read=False)
+
+
+def mark_read(user, post_ids=None) -> int:
+    """ mark the announcements ```post_ids```, or all of them, read """
+    deliveries = unread(user)
+    if post_ids is not None:
+        deliveries = deliveries.filter(post_id__in=post_ids)
+    return deliveries.update(read=True)
@@ -1,6 +1,26 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
+
+
+def ensure_search_index(sender, using, **kwargs):
+    """
+    SQLite drops triggers when a migration rebuilds ```post_post```,
+    put them back after every ```migrate```.
+    """
+    from django.db import connections
+
+    from . import search
+
+    connection = connections[using]
+    if "post_post" in connection.introspection.table_names():
+        search.install(connection)
 
 
 class PostConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'post'
+
+    def ready(self):
+        from . import signals  # noqa: F401
+
+        post_migrate.connect(ensure_search_index, sender=self)
@@ -0,0 +1,103 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import ValidationError
+
+from config import images
+
+from .models import Post, PostPicture, PostVideo
+from .signals import picture_variants_ready
+
+# threads writing the pictures of a post to the storage
+PICTURE_UPLOAD_WORKERS = getattr(settings, "PICTURE_UPLOAD_WORKERS", 4)
+
+
+def requested_video_ids(data) -> list[int]:
+    """ the ```videos``` of a request, a JSON list or repeated form fields """
+    if hasattr(data, "getlist"):
+        ids = data.getlist("videos")
+    else:
+        ids = data.get("videos") or []
+        if not isinstance(ids, (list, tuple)):
+            ids = [ids]
+    try:
+        return sorted({int(pk) for pk in ids if pk not in ("", None)})
+    except (TypeError, ValueError):
+        raise ValidationError({"videos": _("Videos must be a list of video ids.")})
+
+
+def owned_videos(user, ids):
+    """
+    The videos of ```ids```, each one must be attached to a post of ```user```
+    or be uploaded by them and not attached yet, all checked in one query
+    """
+    if not ids:
+        return PostVideo.objects.none()
+    videos = PostVideo.objects.filter(
+        Q(user=user, post__isnull=True) | Q(post__user=user), id__in=ids
+    )
+    if videos.count() != len(ids):
+        raise ValidationError({"videos": _("You can only attach your own videos.")})
+    return videos
+
+
+def _store(file) -> str:
+    field = PostPicture._meta.get_field("image")
+    name = field.generate_filename(None, file.name)
+    return field.storage.save(name, file, max_length=field.max_length)
+
+
+@contextmanager
+def stored_pictures(files):
+    """
+    Write ```files``` to the storage concurrently and yield their names,
+    they are deleted again if the block raises
+    """
+    files = list(files)
+    if not files:
+        yield []
+        return
+    with ThreadPoolExecutor(max_workers=min(len(files), PICTURE_UPLOAD_WORKERS)) as pool:
+        futures = [pool.submit(_store, file) for file in files]
+    names = [future.result() for future in futures if future.exception() is None]
+    storage = PostPicture._meta.get_field("image").storage
+    try:
+        for future in futures:
+            # raises the error of a failed write
+            future.result()
+        yield names
+    except Exception:
+        for name in names:
+            storage.delete(name)
+        raise
+
+
+def attach(post: Post, picture_names, videos):
+    """
+    Add the stored pictures with one INSERT and link ```videos``` with one
+    UPDATE, touching ```post``` and the posts the videos are moved from. To
+    be called in the transaction saving ```post```
+    """
+    pictures = PostPicture.objects.bulk_create(
+        [PostPicture(post=post, image=name) for name in picture_names]
+    )
+    touched = {post.pk} if pictures else set()
+    if videos:
+        # the posts the videos are taken from render differently as well
+        touched.update(
+            videos.exclude(post=None).values_list("post_id", flat=True).distinct().order_by()
+        )
+        if videos.update(post=post):
+            touched.add(post.pk)
+    if touched:
+        Post.objects.filter(pk__in=touched).touch()
+    for picture in pictures:
+        # bulk_create sends no post_save, which schedules the variants
+        images.schedule(
+            PostPicture, picture.pk, "image", "image_variants", picture_variants_ready
+        )
+    return pictures
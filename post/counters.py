@@ -0,0 +1,217 @@
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import Count, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+
+from .models import Post, PostComment, PostCounterShard
+
+# when set, like and share increments of posts are spread over this many
+# shard rows per post and folded into the post by ```flush_counter_shards```
+POST_COUNTER_SHARDS = getattr(settings, "POST_COUNTER_SHARDS", 0)
+SHARDED_COUNTERS = ("likes_count", "shares_count")
+# seconds between the flushes started by sharded increments, 0 leaves the
+# flushing to the ```flush_post_counters``` command
+POST_COUNTER_FLUSH_INTERVAL = getattr(settings, "POST_COUNTER_FLUSH_INTERVAL", 60)
+FLUSH_LOCK_KEY = "post:counters:flush"
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="post-counters")
+    return _executor
+
+
+def bump(model, pk, **deltas):
+    """
+    Atomically add ```deltas``` to the counter columns of a single row,
+    e.g. ```bump(Post, 1, likes_count=1)```. Counters never go below zero.
+    """
+    if pk is None or not deltas:
+        return
+    bump_many(model, [pk], **deltas)
+
+
+def bump_many(model, pks, **deltas):
+    """
+    Same as ```bump``` but for several rows in one UPDATE.
+    """
+    pks = [pk for pk in pks if pk is not None]
+    if not pks or not deltas:
+        return
+    if model is Post and POST_COUNTER_SHARDS:
+        sharded = {
+            field: deltas.pop(field) for field in SHARDED_COUNTERS if field in deltas
+        }
+        _bump_shard(pks, sharded)
+        if not deltas:
+            return
+    _add(model.objects.filter(pk__in=pks), deltas)
+
+
+def _add(queryset, deltas):
+    queryset.update(
+        **{
+            field: Greatest(F(field) + Value(delta), Value(0))
+            for field, delta in deltas.items()
+        }
+    )
+
+
+def _bump_shard(pks, deltas):
+    """ add ```deltas``` to one random shard of each post of ```pks``` """
+    if not deltas:
+        return
+    shard = random.randrange(POST_COUNTER_SHARDS)
+    PostCounterShard.objects.bulk_create(
+        [PostCounterShard(post_id=pk, shard=shard) for pk in pks],
+        ignore_conflicts=True,
+    )
+    PostCounterShard.objects.filter(post_id__in=pks, shard=shard).update(
+        **{field: F(field) + Value(delta) for field, delta in deltas.items()}
+    )
+    transaction.on_commit(schedule_flush)
+
+
+def pending_counts(pks, field: str) -> dict:
+    """ increments of ```field``` not yet folded into the posts of ```pks``` """
+    return dict(
+        PostCounterShard.objects.filter(post_id__in=pks)
+        .values("post_id")
+        .annotate(total=Sum(field))
+        .values_list("post_id", "total")
+    )
+
+
+def add_pending(posts):
+    """
+    Add the increments still sitting in the shards to the counters of the
+    loaded ```posts```, in memory and in one query. Posts already topped up
+    are skipped, so it is safe to call again on the same instances.
+    """
+    if not POST_COUNTER_SHARDS:
+        return
+    posts = {
+        id(post): post for post in posts if not getattr(post, "_pending_added", False)
+    }.values()
+    if not posts:
+        return
+    rows = (
+        PostCounterShard.objects.filter(post_id__in={post.pk for post in posts})
+        .exclude(likes_count=0, shares_count=0)
+        .order_by()
+        .values("post_id")
+        .annotate(**{field: Sum(field) for field in SHARDED_COUNTERS})
+    )
+    totals = {row.pop("post_id"): row for row in rows}
+    for post in posts:
+        for field, delta in totals.get(post.pk, {}).items():
+            setattr(post, field, max(getattr(post, field) + delta, 0))
+        post._pending_added = True
+
+
+def flush_counter_shards() -> int:
+    """
+    Fold the pending shard increments into the post counters and zero the
+    shards, returns the number of posts updated. Shards are locked while
+    they are read, so increments landing meanwhile wait for the next flush.
+    """
+    with transaction.atomic():
+        shards = list(
+            PostCounterShard.objects.select_for_update()
+            .exclude(likes_count=0, shares_count=0)
+            .values_list("id", "post_id", *SHARDED_COUNTERS)
+        )
+        if not shards:
+            return 0
+        totals = {}
+        for _, post_id, *values in shards:
+            current = totals.get(post_id, (0,) * len(SHARDED_COUNTERS))
+            totals[post_id] = tuple(map(sum, zip(current, values)))
+        by_deltas = {}
+        for post_id, values in totals.items():
+            by_deltas.setdefault(values, []).append(post_id)
+        for values, post_ids in by_deltas.items():
+            _add(
+                Post.objects.filter(pk__in=post_ids),
+                dict(zip(SHARDED_COUNTERS, values)),
+            )
+        PostCounterShard.objects.filter(id__in=[row[0] for row in shards]).update(
+            **{field: 0 for field in SHARDED_COUNTERS}
+        )
+    return len(totals)
+
+
+def _flush_in_worker():
+    try:
+        flush_counter_shards()
+    except Exception:
+        logger.exception("could not flush the post counter shards")
+    finally:
+        connections.close_all()
+
+
+def schedule_flush():
+    """
+    Flush the shards in the worker pool, at most once per
+    ```POST_COUNTER_FLUSH_INTERVAL``` across processes sharing the cache.
+    """
+    if POST_COUNTER_FLUSH_INTERVAL <= 0:
+        return
+    if cache.add(FLUSH_LOCK_KEY, 1, timeout=POST_COUNTER_FLUSH_INTERVAL):
+        executor().submit(_flush_in_worker)
+
+
+def count_of(queryset, field: str):
+    """
+    A correlated ```COUNT(*)``` subquery of ```queryset``` rows pointing at
+    the outer row through ```field```.
+    """
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("*"))
+            .values("total")[:1]
+        ),
+        Value(0),
+    )
+
+
+def rebuild_post_counters(queryset=None):
+    """
+    Recompute the denormalized counters of ```queryset``` posts in one UPDATE.
+    """
+    queryset = Post.objects.all() if queryset is None else queryset
+    likes = Post.likes.through.objects.all()
+    # the rebuilt counters include whatever the shards were holding
+    PostCounterShard.objects.filter(post__in=queryset.values("pk")).update(
+        **{field: 0 for field in SHARDED_COUNTERS}
+    )
+    return queryset.order_by().update(
+        likes_count=count_of(likes, Post.likes.field.m2m_field_name()),
+        comment_count=count_of(PostComment.objects.all(), "post"),
+        shares_count=count_of(Post.objects.all(), "shared_from"),
+    )
+
+
+def rebuild_comment_counters(queryset=None):
+    """
+    Recompute the denormalized counters of ```queryset``` comments in one UPDATE.
+    """
+    queryset = PostComment.objects.all() if queryset is None else queryset
+    likes = PostComment.likes.through.objects.all()
+    return queryset.order_by().update(
+        likes_count=count_of(likes, PostComment.likes.field.m2m_field_name()),
+        replies_count=count_of(PostComment.objects.all(), "parent"),
+    )
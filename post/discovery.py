@@ -0,0 +1,141 @@
+import heapq
+import secrets
+from base64 import b64decode, b64encode
+from urllib import parse
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+from .models import Post, PostVideo
+
+VIDEO_POOL_CACHE_KEY = "post:video-pool"
+VIDEO_POOL_SIZE = getattr(settings, "VIDEO_POOL_SIZE", 5000)
+VIDEO_POOL_TTL = getattr(settings, "VIDEO_POOL_TTL", 300)
+
+_MASK = (1 << 64) - 1
+
+
+def video_posts():
+    """ posts of type ```VideoPost``` having at least one video attached """
+    return Post.objects.filter(
+        Exists(PostVideo.objects.filter(post=OuterRef("pk"))),
+        post_type=Post.PostType.post_video,
+    )
+
+
+def refresh_video_pool() -> list[int]:
+    """
+    Rebuild the candidate pool, the ids of the ```VIDEO_POOL_SIZE``` most
+    recent video posts, and cache it for ```VIDEO_POOL_TTL``` seconds.
+    """
+    pool = list(
+        video_posts()
+        .order_by("-date_created", "-id")
+        .values_list("id", flat=True)[:VIDEO_POOL_SIZE]
+    )
+    cache.set(VIDEO_POOL_CACHE_KEY, pool, VIDEO_POOL_TTL)
+    return pool
+
+
+def video_pool() -> list[int]:
+    pool = cache.get(VIDEO_POOL_CACHE_KEY)
+    if pool is None:
+        pool = refresh_video_pool()
+    return pool
+
+
+def shuffle_key(seed: int, pk: int) -> int:
+    """
+    Position of ```pk``` in the permutation of ```seed``` (a splitmix64 hash).
+
+    Posts keep their relative order when the pool is refreshed, so a
+    session pages through the same sequence without repeats.
+    """
+    z = (seed ^ (pk * 0x9E3779B97F4A7C15)) & _MASK
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & _MASK
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & _MASK
+    return z ^ (z >> 31)
+
+
+class VideoDiscoveryPagination(BasePagination):
+    """
+    Pages through the video pool in a random order seeded per session.
+
+    The first request picks a ```seed```, the ```next``` link carries it along
+    with the position reached, so a session never sees the same video twice
+    and every page costs the same whatever the size of the video table.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    page_size_query_param = "page_size"
+    max_page_size = 500
+    cursor_query_param = "cursor"
+    invalid_cursor_message = _("Invalid cursor")
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.base_url = request.build_absolute_uri()
+        limit = self.get_page_size(request)
+        self.seed, after = self.decode_cursor(request)
+
+        keyed = (
+            (shuffle_key(self.seed, pk), pk)
+            for pk in video_pool()
+        )
+        if after is not None:
+            keyed = (item for item in keyed if item > after)
+        window = heapq.nsmallest(limit + 1, keyed)
+        self.has_next = len(window) > limit
+        window = window[:limit]
+        self.last = window[-1] if window else None
+
+        ids = [pk for _, pk in window]
+        posts = {post.pk: post for post in queryset.filter(id__in=ids)}
+        return [posts[pk] for pk in ids if pk in posts]
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+            if size > 0:
+                return min(size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            seed = request.query_params.get("seed")
+            try:
+                return int(seed) & _MASK, None
+            except (TypeError, ValueError):
+                return secrets.randbits(63), None
+        try:
+            querystring = b64decode(encoded.encode("ascii")).decode("ascii")
+            tokens = parse.parse_qs(querystring)
+            return int(tokens["s"][0]), (int(tokens["k"][0]), int(tokens["i"][0]))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_next_link(self):
+        if not self.has_next or self.last is None:
+            return None
+        key, pk = self.last
+        tokens = parse.urlencode({"s": self.seed, "k": key, "i": pk})
+        encoded = b64encode(tokens.encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "seed": str(self.seed),
+                "next": self.get_next_link(),
+                "results": data,
+            }
+        )
@@ -0,0 +1,147 @@
+from django.db import IntegrityError, connections, router, transaction
+from django.db.models.constants import OnConflict
+
+from . import counters
+from .models import Post, PostComment
+
+# what ```type``` of like operation targets which model
+LIKE_TARGETS = {
+    "post": Post,
+    "comment": PostComment,
+}
+MAX_LIKE_OPERATIONS = 500
+
+
+def _likes_sql(model, connection, liked: bool, count: int) -> str:
+    """
+    One statement liking (an insert-or-ignore of the rows of ```model```
+    that exist) or unliking ```count``` rows, returning the ids it changed
+    """
+    qn = connection.ops.quote_name
+    field = model._meta.get_field("likes")
+    table = qn(field.remote_field.through._meta.db_table)
+    target, user = qn(field.m2m_column_name()), qn(field.m2m_reverse_name())
+    placeholders = ", ".join(["%s"] * count)
+    if not liked:
+        return (
+            f"DELETE FROM {table} WHERE {user} = %s AND {target} IN ({placeholders}) "
+            f"RETURNING {target}"
+        )
+    pk = qn(model._meta.pk.column)
+    return " ".join(
+        (
+            connection.ops.insert_statement(on_conflict=OnConflict.IGNORE),
+            f"{table} ({user}, {target})",
+            f"SELECT %s, {pk} FROM {qn(model._meta.db_table)} WHERE {pk} IN ({placeholders})",
+            connection.ops.on_conflict_suffix_sql([], OnConflict.IGNORE, [], []),
+            f"RETURNING {target}",
+        )
+    )
+
+
+def _write_one_by_one(model, user, pks, liked: bool, using: str) -> list:
+    """ ```_write``` for databases that cannot return the rows written """
+    field = model._meta.get_field("likes")
+    through = field.remote_field.through
+    target, owner = field.m2m_field_name(), field.m2m_reverse_field_name()
+    changed = []
+    if not liked:
+        for pk in pks:
+            rows = through.objects.using(using).filter(**{owner: user, target: pk})
+            if rows.delete()[0]:
+                changed.append(pk)
+        return changed
+    for pk in model.objects.using(using).filter(pk__in=pks).values_list("pk", flat=True):
+        try:
+            with transaction.atomic(using=using):
+                through.objects.using(using).create(**{owner: user, f"{target}_id": pk})
+        except IntegrityError:
+            continue
+        changed.append(pk)
+    return changed
+
+
+def _write(model, user, pks, liked: bool) -> list:
+    """ the ids of ```pks``` whose like row was really inserted or deleted """
+    using = router.db_for_write(model.likes.through)
+    connection = connections[using]
+    if not connection.features.can_return_rows_from_bulk_insert:
+        return _write_one_by_one(model, user, pks, liked, using)
+    with connection.cursor() as cursor:
+        cursor.execute(_likes_sql(model, connection, liked, len(pks)), [user.pk, *pks])
+        return [row[0] for row in cursor.fetchall()]
+
+
+def set_liked(model, user, pks, liked: bool):
+    """
+    Like or unlike the ```pks``` rows of ```model``` for ```user```, with a
+    single insert-or-ignore or delete on the ```likes``` table.
+
+    Rows already in the requested state are left alone, so replaying an
+    operation, or two of them racing, is harmless. ```likes_count``` moves
+    by the rows the statement really changed. Rows that do not exist are
+    skipped.
+    """
+    pks = sorted(set(pks))
+    if not pks:
+        return
+    changed = _write(model, user, pks, liked)
+    counters.bump_many(model, changed, likes_count=1 if liked else -1)
+
+
+def like_counts(model, pks) -> dict:
+    counts = dict(
+        model.objects.filter(pk__in=pks).order_by().values_list("pk", "likes_count")
+    )
+    if model is Post and counters.POST_COUNTER_SHARDS:
+        for pk, pending in counters.pending_counts(list(counts), "likes_count").items():
+            counts[pk] = max(counts[pk] + pending, 0)
+    return counts
+
+
+def toggle(model, user, pk, liked: bool):
+    """
+    Like or unlike a single row, returns ```{"id", "liked", "likes_count"}```
+    or ```None``` if the row does not exist.
+    """
+    with transaction.atomic():
+        set_liked(model, user, [pk], liked)
+        counts = like_counts(model, [pk])
+    if pk not in counts:
+        return None
+    return {"id": pk, "liked": liked, "likes_count": counts[pk]}
+
+
+def apply_operations(user, operations):
+    """
+    Apply a batch of ```{"type", "id", "liked"}``` operations in one
+    transaction, with one insert and one delete per target type.
+
+    Operations are applied in order, so the last one on a row wins, and
+    operations on rows that do not exist (anymore) are dropped.
+    """
+    wanted = {}
+    for operation in operations:
+        wanted[(operation["type"], operation["id"])] = operation["liked"]
+
+    results = []
+    with transaction.atomic():
+        for kind, model in LIKE_TARGETS.items():
+            pks = {pk for target, pk in wanted if target == kind}
+            if not pks:
+                continue
+            for liked in (True, False):
+                set_liked(
+                    model, user, [pk for pk in pks if wanted[(kind, pk)] is liked], liked
+                )
+            counts = like_counts(model, pks)
+            results += [
+                {
+                    "type": kind,
+                    "id": pk,
+                    "liked": wanted[(kind, pk)],
+                    "likes_count": counts[pk],
+                }
+                for pk in sorted(counts)
+            ]
+    return results
@@ -0,0 +1,86 @@
+import threading
+import time
+from unittest import mock
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, close_old_connections, connection, transaction
+
+from accounts.models import CustomUser
+from post import counters, likes
+from post.models import Post, PostCounterShard
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure like throughput on a single hot post with concurrent "
+        "workers, with direct counter updates and with sharded counters. "
+        "Every like is a new user liking the post through likes.set_liked, "
+        "the like row and the counter update included. "
+        "Writes to the database, run it against a scratch database; "
+        "SQLite serializes every writer so use PostgreSQL for real numbers."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=8)
+        parser.add_argument("--likes", type=int, default=500, help="likes per worker")
+        parser.add_argument("--shards", type=int, default=16)
+
+    def handle(self, *args, **options):
+        prefix = "benchmark-counters-"
+        CustomUser.objects.bulk_create(
+            [
+                CustomUser(username=f"{prefix}{i}", phone_number=f"{prefix}{i}")
+                for i in range(options["workers"] * options["likes"])
+            ],
+            ignore_conflicts=True,
+        )
+        users = list(CustomUser.objects.filter(username__startswith=prefix).order_by("pk"))
+        post = Post.objects.create(user=users[0], text="hot post")
+        try:
+            for label, shards in (("direct", 0), (f"{options['shards']} shards", options["shards"])):
+                with mock.patch.object(counters, "POST_COUNTER_SHARDS", shards):
+                    elapsed, errors = self.run_workers(post.pk, users, options)
+                    counters.flush_counter_shards()
+                total = options["workers"] * options["likes"] - errors
+                post.refresh_from_db()
+                self.stdout.write(
+                    f"{label:>12}: {total / elapsed:10.0f} likes/s "
+                    f"({total} in {elapsed:.2f}s, {errors} failed, counter {post.likes_count})"
+                )
+                Post.likes.through.objects.filter(post=post).delete()
+                Post.objects.filter(pk=post.pk).update(likes_count=0)
+        finally:
+            PostCounterShard.objects.filter(post=post).delete()
+            post.delete()
+            CustomUser.objects.filter(username__startswith=prefix).delete()
+
+    def run_workers(self, post_id, users, options):
+        errors = []
+        start = threading.Barrier(options["workers"] + 1)
+
+        def worker(likers):
+            failed = 0
+            start.wait()
+            for user in likers:
+                try:
+                    # what a like request writes, see likes.toggle
+                    with transaction.atomic():
+                        likes.set_liked(Post, user, [post_id], True)
+                except OperationalError:
+                    failed += 1
+            errors.append(failed)
+            connection.close()
+
+        size = options["likes"]
+        threads = [
+            threading.Thread(target=worker, args=(users[i * size : (i + 1) * size],))
+            for i in range(options["workers"])
+        ]
+        for thread in threads:
+            thread.start()
+        start.wait()
+        began = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        close_old_connections()
+        return time.perf_counter() - began, sum(errors)
@@ -0,0 +1,76 @@
+import io
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework import parsers, renderers
+from rest_framework.test import APIRequestFactory
+
+from accounts.models import CustomUser, Profile
+from config import parsers as fast_parsers
+from config import renderers as fast_renderers
+from post.models import Post, PostPicture, PostVideo
+from post.serializers import PostSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare DRF's stock JSON renderer and parser with the ones of "
+        "config.renderers / config.parsers on a page of posts. The posts are "
+        "created in a transaction that is rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--posts", type=int, default=120)
+        parser.add_argument("--rounds", type=int, default=200)
+
+    def handle(self, *args, **options):
+        if fast_renderers.orjson is None:
+            self.stdout.write("orjson is not installed, both sides use the standard library")
+        with transaction.atomic():
+            data = self.page(options["posts"])
+            transaction.set_rollback(True)
+
+        stock, fast = renderers.JSONRenderer(), fast_renderers.JSONRenderer()
+        body = stock.render(data)
+        self.stdout.write(f"{options['posts']} posts, {len(body) / 1024:.0f} KiB of JSON")
+        rows = (
+            ("render", lambda: stock.render(data), lambda: fast.render(data)),
+            (
+                "parse",
+                lambda: parsers.JSONParser().parse(io.BytesIO(body)),
+                lambda: fast_parsers.JSONParser().parse(io.BytesIO(body)),
+            ),
+        )
+        for label, stock_run, fast_run in rows:
+            stock_time = self.measure(stock_run, options["rounds"])
+            fast_time = self.measure(fast_run, options["rounds"])
+            self.stdout.write(
+                f"{label:>7}: stdlib {stock_time * 1000:8.3f} ms, "
+                f"fast {fast_time * 1000:8.3f} ms ({stock_time / fast_time:.1f}x)"
+            )
+
+    def page(self, size):
+        user, _ = CustomUser.objects.get_or_create(
+            username="benchmark-rendering", defaults={"phone_number": "benchmark-rendering"}
+        )
+        Profile.objects.get_or_create(user=user, defaults={"about": "benchmark"})
+        for i in range(size):
+            post = Post.objects.create(user=user, text=f"benchmark post {i} ✓ " * 8)
+            PostPicture.objects.create(post=post, image=f"post_pictures/{i}.jpg")
+            PostVideo.objects.create(
+                post=post, user=user, video=f"post_videos/{i}.mp4", duration=Decimal("12.50")
+            )
+        request = APIRequestFactory().get("/post/v1/posts/")
+        request.user = user
+        posts = Post.objects.for_rendering().filter(user=user).order_by("-date_created", "-id")
+        return PostSerializer(posts[:size], many=True, context={"request": request}).data
+
+    def measure(self, run, rounds) -> float:
+        """ mean seconds per call """
+        run()
+        began = time.perf_counter()
+        for _ in range(rounds):
+            run()
+        return (time.perf_counter() - began) / rounds
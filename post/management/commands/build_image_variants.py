@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from config import images
+
+
+class Command(BaseCommand):
+    help = (
+        "Build the resized variants of every stored post, profile, group and "
+        "community picture that has none or whose image changed since."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force", action="store_true", help="rebuild up to date variants too"
+        )
+
+    def handle(self, *args, **options):
+        for model, field, variants_field, on_ready in images.REGISTRY:
+            built = 0
+            rows = (
+                model.objects.exclude(**{field: ""})
+                .exclude(**{f"{field}__isnull": True})
+                .values_list("pk", field, variants_field)
+            )
+            for pk, name, info in rows.iterator():
+                if not options["force"] and (info or {}).get("source") == name:
+                    continue
+                try:
+                    images.build(model, pk, field, variants_field, on_ready)
+                    built += 1
+                except (OSError, ValueError) as error:
+                    self.stderr.write(f"{model._meta.label} {pk}: {error}")
+            self.stdout.write(
+                self.style.SUCCESS(f"{model._meta.label}.{field}: {built} built")
+            )
@@ -0,0 +1,52 @@
+import os
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+
+from config.storage import ContentAddressedStorage
+
+
+class Command(BaseCommand):
+    help = (
+        "Move the media files stored before content-addressed storage was "
+        "enabled into blobs, replacing duplicates with links to a single copy."
+    )
+
+    def handle(self, *args, **options):
+        default_storage._setup()
+        storage = default_storage._wrapped
+        if not isinstance(storage, ContentAddressedStorage):
+            raise CommandError("DEFAULT_FILE_STORAGE is not a ContentAddressedStorage")
+
+        root = storage.location
+        linked = duplicates = saved = 0
+        for directory, subdirectories, names in os.walk(root):
+            if directory == root:
+                subdirectories[:] = [
+                    name for name in subdirectories
+                    if name not in (storage.blob_dir, "video_uploads")
+                ]
+            for filename in names:
+                path = os.path.join(directory, filename)
+                stat = os.stat(path)
+                if stat.st_nlink > 1:
+                    continue
+                name = os.path.relpath(path, root).replace(os.sep, "/")
+                blob_path = storage.path(storage._blob_of(name))
+                os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+                if not os.path.exists(blob_path):
+                    os.link(path, blob_path)
+                    linked += 1
+                    continue
+                staged = f"{path}.dedupe"
+                os.link(blob_path, staged)
+                os.replace(staged, path)
+                duplicates += 1
+                saved += stat.st_size
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{linked} files moved to blobs, {duplicates} duplicates "
+                f"replaced, {saved} bytes freed"
+            )
+        )
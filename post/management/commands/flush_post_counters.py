@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from post.counters import flush_counter_shards
+
+
+class Command(BaseCommand):
+    help = (
+        "Fold the pending like and share increments of the counter shards "
+        "into the post counters (see POST_COUNTER_SHARDS)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--every",
+            type=float,
+            default=0,
+            help="keep running and flush every EVERY seconds",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            flushed = flush_counter_shards()
+            self.stdout.write(self.style.SUCCESS(f"{flushed} posts flushed"))
+            if options["every"] <= 0:
+                return
+            time.sleep(options["every"])
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from config import ffmpeg
+from post import video_metadata
+from post.models import PostVideo
+
+
+class Command(BaseCommand):
+    help = (
+        "Read the duration, resolution and codec of the post videos that have "
+        "not been probed yet, and grab a poster frame for those without thumbnail. "
+        "Videos whose probe fails are tried again on the next run."
+    )
+
+    def handle(self, *args, **options):
+        if not ffmpeg.binaries(video_metadata.FFPROBE_BINARY)[0]:
+            raise CommandError("ffprobe is not installed")
+        futures = [
+            video_metadata.schedule(video)
+            for video in PostVideo.objects.filter(probed_at__isnull=True).iterator()
+        ]
+        futures = [future for future in futures if future is not None]
+        # waits for the results to be stored as well
+        video_metadata.executor().shutdown(wait=True)
+
+        failed = sum(future.exception() is not None for future in futures)
+        streamless = sum(
+            future.exception() is None and not future.result().get("codec")
+            for future in futures
+        )
+        probed = len(futures) - failed
+        self.stdout.write(
+            self.style.SUCCESS(f"{probed} videos probed, {streamless} without a video stream")
+        )
+        if failed:
+            self.stdout.write(self.style.ERROR(f"{failed} videos could not be probed"))
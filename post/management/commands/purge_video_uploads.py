@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from post.uploads import purge_expired
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete the resumable video uploads not finalized in time and their "
+        "part files (see VIDEO_UPLOAD_EXPIRY)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--every",
+            type=float,
+            default=0,
+            help="keep running and purge every EVERY seconds",
+        )
+
+    def handle(self, *args, **options):
+        while True:
+            purged = purge_expired()
+            self.stdout.write(self.style.SUCCESS(f"{purged} uploads purged"))
+            if options["every"] <= 0:
+                return
+            time.sleep(options["every"])
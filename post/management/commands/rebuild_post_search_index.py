@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from django.db import connections, DEFAULT_DB_ALIAS
+
+from post import search
+
+
+class Command(BaseCommand):
+    help = (
+        "Create the full-text index of post text if it is missing and "
+        "re-index every post."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        connection = connections[options["database"]]
+        if not search.install(connection, rebuild=True):
+            self.stderr.write(
+                f"no full-text index for {connection.vendor}, search uses LIKE"
+            )
+            return
+        self.stdout.write(self.style.SUCCESS("post search index rebuilt"))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import UserFollowship
+from post import timeline
+
+
+class Command(BaseCommand):
+    help = (
+        "Fill the materialized home timelines from existing posts and "
+        "follows, e.g. after the timeline table was first created."
+    )
+
+    def handle(self, *args, **options):
+        authors = (
+            timeline.timeline_posts()
+            .values_list("user_id", flat=True)
+            .order_by()
+            .distinct()
+        )
+        for author_id in authors.iterator():
+            timeline.backfill(author_id, author_id)
+
+        follows = UserFollowship.objects.filter(
+            deleted=False, user__isnull=False, follower__isnull=False
+        ).values_list("follower_id", "user_id")
+        total = 0
+        for follower_id, author_id in follows.iterator():
+            timeline.backfill(follower_id, author_id)
+            total += 1
+        self.stdout.write(self.style.SUCCESS(f"{total} follows replayed"))
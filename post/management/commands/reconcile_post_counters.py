@@ -0,0 +1,42 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+
+from post.counters import rebuild_comment_counters, rebuild_post_counters
+from post.models import Post, PostComment
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the denormalized like, comment, reply and share counters "
+        "of posts and comments from the underlying rows."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=5000,
+            help="number of rows updated per transaction",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = max(options["batch_size"], 1)
+        for model, rebuild in (
+            (Post, rebuild_post_counters),
+            (PostComment, rebuild_comment_counters),
+        ):
+            last_id = model.objects.aggregate(last=Max("id"))["last"] or 0
+            updated = 0
+            for start in range(0, last_id + 1, batch_size):
+                with transaction.atomic():
+                    updated += rebuild(
+                        model.objects.filter(
+                            id__gte=start, id__lt=start + batch_size
+                        )
+                    )
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{model._meta.verbose_name}: {updated} rows reconciled"
+                )
+            )
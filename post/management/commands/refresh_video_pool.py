@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from post.discovery import refresh_video_pool
+
+
+class Command(BaseCommand):
+    help = (
+        "Rebuild the candidate pool of the random video feed, run it "
+        "periodically to keep the pool warm when CACHES is a shared backend."
+    )
+
+    def handle(self, *args, **options):
+        pool = refresh_video_pool()
+        self.stdout.write(self.style.SUCCESS(f"{len(pool)} videos in the pool"))
@@ -0,0 +1,68 @@
+# Generated by Django 4.2 on 2026-10-18 04:12
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def _count_of(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("pk")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("*"))
+            .values("total")[:1]
+        ),
+        Value(0),
+    )
+
+
+def backfill_counters(apps, schema_editor):
+    Post = apps.get_model("post", "Post")
+    PostComment = apps.get_model("post", "PostComment")
+    Post.objects.update(
+        likes_count=_count_of(Post.likes.through.objects.all(), "post"),
+        comment_count=_count_of(PostComment.objects.all(), "post"),
+        shares_count=_count_of(Post.objects.all(), "shared_from"),
+    )
+    PostComment.objects.update(
+        likes_count=_count_of(PostComment.likes.through.objects.all(), "postcomment"),
+        replies_count=_count_of(PostComment.objects.all(), "parent"),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0002_post_announcement_post_group_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='shares_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='postcomment',
+            name='likes_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='postcomment',
+            name='replies_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
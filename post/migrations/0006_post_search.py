@@ -0,0 +1,80 @@
+# Generated by Django 4.2 on 2026-10-18 05:40
+
+from django.db import migrations
+
+# The statements are copied here on purpose, later changes to post.search
+# must not change what this migration does.
+
+SQLITE_FORWARDS = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS post_post_fts USING fts5(
+        text, content='post_post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS post_post_fts_insert AFTER INSERT ON post_post BEGIN
+        INSERT INTO post_post_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS post_post_fts_delete AFTER DELETE ON post_post BEGIN
+        INSERT INTO post_post_fts(post_post_fts, rowid, text) VALUES ('delete', old.id, old.text);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS post_post_fts_update AFTER UPDATE OF text ON post_post BEGIN
+        INSERT INTO post_post_fts(post_post_fts, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO post_post_fts(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    "INSERT INTO post_post_fts(post_post_fts) VALUES ('rebuild')",
+]
+
+SQLITE_BACKWARDS = [
+    "DROP TRIGGER IF EXISTS post_post_fts_insert",
+    "DROP TRIGGER IF EXISTS post_post_fts_delete",
+    "DROP TRIGGER IF EXISTS post_post_fts_update",
+    "DROP TABLE IF EXISTS post_post_fts",
+]
+
+POSTGRESQL_FORWARDS = [
+    """
+    ALTER TABLE post_post ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('simple', coalesce(text, ''))) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS post_post_search_idx ON post_post USING GIN (search_vector)",
+]
+
+POSTGRESQL_BACKWARDS = [
+    "DROP INDEX IF EXISTS post_post_search_idx",
+    "ALTER TABLE post_post DROP COLUMN IF EXISTS search_vector",
+]
+
+
+class RunSQLOn(migrations.RunSQL):
+    """ ```RunSQL``` only applied on databases of ```vendor``` """
+
+    def __init__(self, vendor, *args, **kwargs):
+        self.vendor = vendor
+        super().__init__(*args, **kwargs)
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == self.vendor:
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0005_post_updated_at'),
+    ]
+
+    operations = [
+        RunSQLOn("sqlite", SQLITE_FORWARDS, SQLITE_BACKWARDS),
+        RunSQLOn("postgresql", POSTGRESQL_FORWARDS, POSTGRESQL_BACKWARDS),
+    ]
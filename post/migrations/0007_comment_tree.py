@@ -0,0 +1,55 @@
+# Generated by Django 4.2 on 2026-10-18 04:23
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def backfill_paths(apps, schema_editor):
+    """ parents are older than their replies, so one pass in id order places every comment """
+    PostComment = apps.get_model("post", "PostComment")
+    placed, batch = {}, []
+    for comment in PostComment.objects.order_by("id").only("id", "parent_id").iterator():
+        step = f"{comment.pk:012d}/"
+        parent = placed.get(comment.parent_id)
+        if parent is None:
+            comment.thread_id, comment.path, comment.depth = comment.pk, step, 0
+        else:
+            comment.thread_id = parent[0]
+            comment.path = parent[1] + step
+            comment.depth = parent[2] + 1
+        placed[comment.pk] = (comment.thread_id, comment.path, comment.depth)
+        batch.append(comment)
+        if len(batch) >= 1000:
+            PostComment.objects.bulk_update(batch, ["thread", "path", "depth"])
+            batch = []
+    PostComment.objects.bulk_update(batch, ["thread", "path", "depth"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0006_post_search'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postcomment',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='postcomment',
+            name='path',
+            field=models.CharField(blank=True, default='', max_length=1024),
+        ),
+        migrations.AddField(
+            model_name='postcomment',
+            name='thread',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='thread_comments', to='post.postcomment'),
+        ),
+        migrations.AddIndex(
+            model_name='postcomment',
+            index=models.Index(fields=['thread', 'path'], name='comment_thread_path_idx'),
+        ),
+        migrations.RunPython(backfill_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 4.2 on 2026-10-18 04:25
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('post', '0007_comment_tree'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MutedCommenter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('muted', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comment_muted_by', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='muted_commenters', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='HiddenComment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_created', models.DateTimeField(auto_now_add=True)),
+                ('comment', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hides', to='post.postcomment')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='comment_hides', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='postcomment',
+            name='hidden_from',
+            field=models.ManyToManyField(blank=True, related_name='hidden_post_comments', through='post.HiddenComment', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='mutedcommenter',
+            constraint=models.UniqueConstraint(fields=('user', 'muted'), name='unique_muted_commenter'),
+        ),
+        migrations.AddConstraint(
+            model_name='hiddencomment',
+            constraint=models.UniqueConstraint(fields=('user', 'comment'), name='unique_hidden_comment'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2 on 2026-10-18 04:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0008_comment_visibility'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PostCounterShard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('shard', models.PositiveSmallIntegerField()),
+                ('likes_count', models.IntegerField(default=0)),
+                ('shares_count', models.IntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='counter_shards', to='post.post')),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='postcountershard',
+            constraint=models.UniqueConstraint(fields=('post', 'shard'), name='unique_post_counter_shard'),
+        ),
+    ]
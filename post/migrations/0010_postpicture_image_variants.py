@@ -0,0 +1,18 @@
+# Generated by Django 4.2 on 2026-10-18 04:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0009_post_counter_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postpicture',
+            name='image_variants',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
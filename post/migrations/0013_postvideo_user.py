@@ -0,0 +1,31 @@
+# Generated by Django 4.2 on 2026-10-18 04:35
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_uploaders(apps, schema_editor):
+    Post = apps.get_model("post", "Post")
+    PostVideo = apps.get_model("post", "PostVideo")
+    PostVideo.objects.filter(post__isnull=False).update(
+        user=Subquery(Post.objects.filter(pk=OuterRef("post")).values("user")[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('post', '0012_video_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postvideo',
+            name='user',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='post_videos', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.RunPython(backfill_uploaders, migrations.RunPython.noop),
+    ]
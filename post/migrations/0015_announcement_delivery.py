@@ -0,0 +1,38 @@
+# Generated by Django 4.2 on 2026-10-18 04:39
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('post', '0014_post_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnnouncementDelivery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_created', models.DateTimeField()),
+                ('read', models.BooleanField(default=False)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='announcement_inbox', to=settings.AUTH_USER_MODEL)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='announcement_deliveries', to='post.post')),
+            ],
+            options={
+                'verbose_name_plural': 'announcement deliveries',
+                'ordering': ('-date_created', '-post'),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='announcementdelivery',
+            index=models.Index(fields=['owner', 'read', '-date_created', '-post'], name='announcement_inbox_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='announcementdelivery',
+            constraint=models.UniqueConstraint(fields=('owner', 'post'), name='unique_announcement_delivery'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 4.2 on 2026-10-18 05:00
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def backfill_probed(apps, schema_editor):
+    # videos with a codec have been probed, the others are probed again
+    PostVideo = apps.get_model("post", "PostVideo")
+    PostVideo.objects.exclude(codec="").update(probed_at=F("date_created"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('post', '0015_announcement_delivery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='postvideo',
+            name='probed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_probed, migrations.RunPython.noop),
+    ]
@@ -1,4 +1,8 @@
+import uuid
+
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from accounts.models import CustomUser 
 from django.contrib.auth import get_user_model
 from community.models import Group, Announcement
@@ -6,6 +10,31 @@ from community.models import Group, Announcement
 
 User = get_user_model()
 
+# levels of ```shared_from``` rendered in full, deeper ones are ```{"id": ...}``` stubs
+SHARED_FROM_DEPTH = getattr(settings, "SHARED_FROM_DEPTH", 2)
+
+
+class PostQuerySet(models.QuerySet):
+    # media rendered by ```PostSerializer```, prefetched by its list
+    # serializer for the posts it could not find in the render cache
+    RENDER_PREFETCH = (
+        "pictures",
+        "videos",
+    )
+
+    def for_rendering(self):
+        """
+        Join everything ```PostSerializer``` renders from a single row:
+        the author card and one level of the shared post.
+        """
+        return self.select_related(
+            "user__profile",
+            "shared_from__user__profile",
+        )
+
+    def touch(self):
+        """ mark posts as changed, e.g. when their media changed """
+        return self.update(updated_at=timezone.now())
 
 
 class Post(models.Model):
@@ -41,25 +70,85 @@ class Post(models.Model):
     is_group_post = models.BooleanField(default=False)
     is_announcement_post = models.BooleanField(default=False)
 
+    # denormalized counters, kept in sync by post.signals and rebuilt
+    # with the ``reconcile_post_counters`` management command
+    likes_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
+    shares_count = models.PositiveIntegerField(default=0)
+
     date_created = models.DateTimeField(auto_now_add=True)
+    # bumped on edits and media changes, versions the render cache
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self) -> str:
         return str(self.text)
 
-    def likes_count(self):
-        return self.likes.count()
-
-    def comment_count(self):
-        return self.comments.count()
-
-    def shares_count(self):
-        return self.shared_by.all().count()
-    
     def user_account(self):
         return self.user
 
     class Meta:
         ordering = ("-date_created",)
+        # listings are keyset paged on ```(-date_created, -id)```, optionally
+        # filtered on one of the leading columns
+        indexes = [
+            models.Index(fields=("-date_created", "-id"), name="post_date_idx"),
+            models.Index(fields=("user", "-date_created", "-id"), name="post_user_date_idx"),
+            models.Index(fields=("group", "-date_created", "-id"), name="post_group_date_idx"),
+            models.Index(
+                fields=("announcement", "-date_created", "-id"),
+                name="post_announcement_date_idx",
+            ),
+            models.Index(
+                fields=("post_type", "-date_created", "-id"), name="post_type_date_idx"
+            ),
+        ]
+
+
+def shared_chain(post: Post, depth: int) -> list[Post]:
+    """
+    The posts ```post``` was shared from, nearest first, at most ```depth```
+    of them and only as far as they are already loaded.
+    """
+    field = Post._meta.get_field("shared_from")
+    chain = []
+    while len(chain) < depth and post.shared_from_id and field.is_cached(post):
+        post = post.shared_from
+        if post is None:
+            break
+        chain.append(post)
+    return chain
+
+
+def load_shared_from(posts, depth: int) -> list[Post]:
+    """
+    Load up to ```depth``` levels of ```shared_from``` for all of ```posts```,
+    with one query per missing level, returns the posts loaded.
+    """
+    field = Post._meta.get_field("shared_from")
+    loaded = []
+    level = list(posts)
+    for _ in range(depth):
+        missing = {
+            post.shared_from_id
+            for post in level
+            if post.shared_from_id and not field.is_cached(post)
+        }
+        if missing:
+            found = Post.objects.for_rendering().in_bulk(missing)
+            for post in level:
+                if post.shared_from_id in missing:
+                    field.set_cached_value(post, found.get(post.shared_from_id))
+        level = [
+            post.shared_from
+            for post in level
+            if post.shared_from_id and post.shared_from is not None
+        ]
+        if not level:
+            break
+        loaded += level
+    return loaded
 
 
 
@@ -72,6 +161,8 @@ class PostPicture(models.Model):
         Post, on_delete=models.CASCADE, related_name="pictures"
     )
     image = models.ImageField(upload_to="post_pictures/")
+    # resized copies of ```image```, see config.images
+    image_variants = models.JSONField(default=dict, blank=True)
 
     date_created = models.DateTimeField(auto_now_add=True)
 
@@ -88,6 +179,14 @@ class PostVideo(models.Model):
         null=True,
         blank=True,
     )
+    # the uploader, videos are uploaded before the post they are attached to
+    user = models.ForeignKey(
+        User,
+        related_name="post_videos",
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+    )
     video = models.FileField(upload_to="post_videos/")
     thumbnail = models.FileField(
         upload_to="post_video_thumbnails", null=True, blank=True
@@ -95,8 +194,83 @@ class PostVideo(models.Model):
     duration = models.DecimalField(
         max_digits=10, decimal_places=2, null=True, blank=True
     )
+    # read from the file by post.video_metadata
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    codec = models.CharField(max_length=32, blank=True)
+    # when the metadata was read, a file without a video stream keeps no codec
+    probed_at = models.DateTimeField(null=True, blank=True)
+    date_created = models.DateTimeField(auto_now_add=True)
+
+
+class VideoUpload(models.Model):
+    """
+    A resumable upload of a ```PostVideo```, sent in chunks of ```chunk_size```
+    bytes, see post.uploads
+    """
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="video_uploads"
+    )
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    chunk_size = models.PositiveIntegerField()
+    # bytes received so far, chunks are accepted in order
+    offset = models.PositiveBigIntegerField(default=0)
     date_created = models.DateTimeField(auto_now_add=True)
 
+    def __str__(self) -> str:
+        return str(self.filename)
+
+
+class PostCounterShard(models.Model):
+    """
+    Pending increments of the like and share counters of a post, spread
+    over ```POST_COUNTER_SHARDS``` rows so concurrent likes of a hot post
+    don't all wait on the lock of the post row. Folded into the post by
+    ```post.counters.flush_counter_shards```.
+    """
+
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="counter_shards"
+    )
+    shard = models.PositiveSmallIntegerField()
+    likes_count = models.IntegerField(default=0)
+    shares_count = models.IntegerField(default=0)
+
+    def __str__(self) -> str:
+        return f"{self.post_id}:{self.shard}"
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=("post", "shard"), name="unique_post_counter_shard"
+            ),
+        ]
+
+
+class PostCommentQuerySet(models.QuerySet):
+    def visible_to(self, user, include_hidden=False, include_muted=False):
+        """
+        Comments ```user``` may see: their own ones, and the others unless
+        they hid the comment or muted its author. Both checks are ```NOT
+        EXISTS``` probes on a unique index, no join fans the rows out.
+
+        ```include_hidden``` / ```include_muted``` keep the comments hidden
+        or muted by ```user```, to find the ones to show again.
+        """
+        others = models.Q()
+        if not include_hidden:
+            hidden = HiddenComment.objects.filter(user=user, comment=models.OuterRef("pk"))
+            others &= ~models.Exists(hidden)
+        if not include_muted:
+            muted = MutedCommenter.objects.filter(user=user, muted=models.OuterRef("user"))
+            others &= ~models.Exists(muted)
+        if not others:
+            return self
+        return self.filter(models.Q(user=user) | others)
+
 
 class PostComment(models.Model):
     """
@@ -125,14 +299,183 @@ class PostComment(models.Model):
     likes = models.ManyToManyField(
         User, blank=True, related_name="post_comment_likes"
     )
+    hidden_from = models.ManyToManyField(
+        User,
+        blank=True,
+        through="HiddenComment",
+        related_name="hidden_post_comments",
+    )
+
+    likes_count = models.PositiveIntegerField(default=0)
+    replies_count = models.PositiveIntegerField(default=0)
+
+    # materialized path of the comment in its thread, the zero padded ids
+    # of its ancestors and itself, so a whole thread reads in path order
+    thread = models.ForeignKey(
+        "self",
+        related_name="thread_comments",
+        blank=True,
+        null=True,
+        on_delete=models.CASCADE,
+    )
+    path = models.CharField(max_length=1024, blank=True, default="")
+    depth = models.PositiveSmallIntegerField(default=0)
 
     date_created = models.DateTimeField(auto_now_add=True)
 
+    PATH_STEP = 12
+
+    objects = PostCommentQuerySet.as_manager()
+
     def __str__(self) -> str:
         return str(self.comment)
 
-    def likes_count(self):
-        return self.likes.count()
+    def user_account(self):
+        return self.user
+
+    def set_tree_position(self, parent=None):
+        """ place the comment under ```parent```, it must have been saved """
+        step = f"{self.pk:0{self.PATH_STEP}d}/"
+        if parent is None:
+            self.thread_id, self.path, self.depth = self.pk, step, 0
+        else:
+            self.thread_id = parent.thread_id or parent.pk
+            self.path = parent.path + step
+            self.depth = parent.depth + 1
 
     class Meta:
         ordering = ("-date_created",)
+        indexes = [
+            models.Index(fields=("thread", "path"), name="comment_thread_path_idx"),
+        ]
+
+
+class HiddenComment(models.Model):
+    """
+    A comment ```user``` hid, it is left out of their comment listings
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="comment_hides"
+    )
+    comment = models.ForeignKey(
+        PostComment, on_delete=models.CASCADE, related_name="hides"
+    )
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return str(self.comment)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=("user", "comment"), name="unique_hidden_comment"
+            ),
+        ]
+
+
+class MutedCommenter(models.Model):
+    """
+    An author ```user``` muted, none of their comments are listed to ```user```
+    """
+
+    user = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="muted_commenters"
+    )
+    muted = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="comment_muted_by"
+    )
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return str(self.muted)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=("user", "muted"), name="unique_muted_commenter"
+            ),
+        ]
+
+
+class TimelineEntry(models.Model):
+    """
+    A post materialized in the home timeline of ```owner```, written when
+    the post is created (fan-out-on-write)
+    """
+
+    owner = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="timeline"
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    # copy of ```post.date_created```, the timeline is paged on it
+    date_created = models.DateTimeField()
+
+    def __str__(self) -> str:
+        return str(self.post)
+
+    class Meta:
+        ordering = ("-date_created", "-post")
+        constraints = [
+            models.UniqueConstraint(
+                fields=("owner", "post"), name="unique_timeline_entry"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=("owner", "-date_created", "-post"),
+                name="timeline_owner_date_idx",
+            ),
+        ]
+
+
+class FanoutOnReadAuthor(models.Model):
+    """
+    Authors with too many followers to copy their posts into every timeline,
+    their posts are merged into their followers' feeds at read time instead
+    """
+
+    user = models.OneToOneField(
+        User, on_delete=models.CASCADE, related_name="fanout_on_read"
+    )
+    date_created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        return str(self.user)
+
+
+class AnnouncementDelivery(models.Model):
+    """
+    An announcement post in the inbox of ```owner```, a member of one of the
+    groups of the community, written when the post is created
+    """
+
+    owner = models.ForeignKey(
+        User, on_delete=models.CASCADE, related_name="announcement_inbox"
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="announcement_deliveries"
+    )
+    # copy of ```post.date_created```, the inbox is paged on it
+    date_created = models.DateTimeField()
+    read = models.BooleanField(default=False)
+
+    def __str__(self) -> str:
+        return str(self.post)
+
+    class Meta:
+        ordering = ("-date_created", "-post")
+        verbose_name_plural = "announcement deliveries"
+        constraints = [
+            models.UniqueConstraint(
+                fields=("owner", "post"), name="unique_announcement_delivery"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=("owner", "read", "-date_created", "-post"),
+                name="announcement_inbox_idx",
+            ),
+        ]
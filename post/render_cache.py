@@ -0,0 +1,189 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ObjectDoesNotExist
+from django.db.models import prefetch_related_objects
+
+from config import fieldsets
+
+from . import counters
+from .models import Post, PostQuerySet, load_shared_from, shared_chain
+from .viewer import PostViewerState
+
+POST_RENDER_CACHE = getattr(settings, "POST_RENDER_CACHE", "default")
+POST_RENDER_CACHE_TIMEOUT = getattr(settings, "POST_RENDER_CACHE_TIMEOUT", 60 * 60)
+
+# fields computed per request on top of the cached payload
+VIEWER_FIELDS = ("liked", "shared", "following_user")
+LIVE_FIELDS = ("likes_count", "comment_count", "shares_count")
+
+HITS_KEY = "post:render:hits"
+MISSES_KEY = "post:render:misses"
+
+
+def _cache():
+    return caches[POST_RENDER_CACHE]
+
+
+def _author_card(user) -> tuple:
+    """ everything of the author rendered by ```UserInfoSerializer``` """
+    try:
+        picture = user.profile.profile_picture.name
+        variants = user.profile.profile_picture_variants.get("source")
+    except ObjectDoesNotExist:
+        picture = variants = None
+    return (
+        user.pk,
+        user.first_name,
+        user.last_name,
+        user.username,
+        user.phone_number,
+        user.email,
+        picture,
+        variants,
+    )
+
+
+def _post_version(post: Post) -> tuple:
+    return (post.pk, post.updated_at.isoformat(), post.shared_from_id, _author_card(post.user))
+
+
+def cache_key(post: Post, origin: str, depth: int, fields: str = "") -> str:
+    """
+    The key of a post's payload, changes with the post, its media (through
+    ```updated_at```), its author's card and the same for each of the
+    ```depth``` shared posts rendered with it. ```origin``` is part of it
+    as media urls are absolute, ```fields``` is the requested fieldset.
+    """
+    parts = [origin, fields, _post_version(post)]
+    parts += [_post_version(shared) for shared in shared_chain(post, depth)]
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f"post:render:{post.pk}:{digest}"
+
+
+def _levels(payload: dict, post: Post, depth: int):
+    """ ```(payload, post)``` of the post and of each shared post rendered in full """
+    yield payload, post
+    for shared in shared_chain(post, depth):
+        payload = payload.get("shared_from")
+        if not payload:
+            return
+        yield payload, shared
+
+
+def _strip(payload: dict, post: Post, depth: int) -> dict:
+    for level, _ in _levels(payload, post, depth):
+        for field in VIEWER_FIELDS:
+            if field in level:
+                level[field] = None
+    return payload
+
+
+def _overlay(payload: dict, post: Post, serializer, depth: int) -> dict:
+    for level, shared in _levels(payload, post, depth):
+        # only the fields rendered, ```?fields=``` may leave some out
+        for field in LIVE_FIELDS:
+            if field in level:
+                level[field] = getattr(shared, field)
+        for field in VIEWER_FIELDS:
+            if field in level:
+                level[field] = serializer.viewer_has(field, shared)
+    return payload
+
+
+def add_pending(posts: list[Post], depth: int):
+    """ top the live counters of ```posts``` and their shared posts up with the shards """
+    counters.add_pending(
+        [*posts, *(shared for post in posts for shared in shared_chain(post, depth))]
+    )
+
+
+def versions(posts: list[Post], serializer):
+    """
+    What the payloads ```serializer``` would render for ```posts``` are made
+    of: their cache keys, live counters and viewer flags. Returns
+    ```(versions, viewer_state)```, the state is to be handed to the
+    serializer in ```context["viewer_state"]```.
+    """
+    request = serializer.context["request"]
+    depth = serializer.shared_depth()
+    load_shared_from(posts, depth)
+    add_pending(posts, depth)
+    viewer_state = PostViewerState(
+        getattr(request, "user", None), posts, flags=serializer.viewer_flags()
+    )
+    origin = request.build_absolute_uri("/")
+    fields = fieldsets.signature(request)
+    return [
+        (
+            cache_key(post, origin, depth, fields),
+            [
+                (
+                    [getattr(level, field) for field in LIVE_FIELDS],
+                    [viewer_state.has(field, level) for field in VIEWER_FIELDS],
+                )
+                for level in (post, *shared_chain(post, depth))
+            ],
+        )
+        for post in posts
+    ], viewer_state
+
+
+def _count(key: str, amount: int):
+    if not amount:
+        return
+    cache = _cache()
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        cache.incr(key, amount)
+
+
+def stats() -> dict:
+    values = _cache().get_many((HITS_KEY, MISSES_KEY))
+    return {
+        "hits": values.get(HITS_KEY, 0),
+        "misses": values.get(MISSES_KEY, 0),
+    }
+
+
+def render(serializer, posts: list[Post], depth: int) -> list[dict]:
+    """
+    Render ```posts``` with ```serializer```, reading the viewer-independent
+    part of every payload from the cache in one ```get_many``` and
+    rendering (and prefetching media for) the missing ones only.
+
+    The ```depth``` levels of shared posts must be loaded beforehand.
+    """
+    add_pending(posts, depth)
+    request = serializer.context.get("request")
+    origin = request.build_absolute_uri("/") if request is not None else ""
+    fields = fieldsets.signature(request)
+    cache = _cache()
+
+    keys = {post.pk: cache_key(post, origin, depth, fields) for post in posts}
+    found = cache.get_many(keys.values())
+    missing = [post for post in posts if keys[post.pk] not in found]
+    if missing:
+        # media left out with ```?fields=``` is not loaded
+        lookups = serializer.requested_in_chain(PostQuerySet.RENDER_PREFETCH)
+        if lookups:
+            prefetch_related_objects(
+                missing + [shared for post in missing for shared in shared_chain(post, depth)],
+                *[lookup for lookup in PostQuerySet.RENDER_PREFETCH if lookup in lookups],
+            )
+        fresh = {
+            keys[post.pk]: _strip(dict(serializer.to_representation(post)), post, depth)
+            for post in missing
+        }
+        cache.set_many(fresh, POST_RENDER_CACHE_TIMEOUT)
+        found.update(fresh)
+    _count(HITS_KEY, len(posts) - len(missing))
+    _count(MISSES_KEY, len(missing))
+
+    return [
+        _overlay(dict(found[keys[post.pk]]), post, serializer, depth)
+        for post in posts
+    ]
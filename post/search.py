@@ -0,0 +1,157 @@
+import re
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import BooleanField, FloatField, Value
+from django.db.models.expressions import RawSQL
+from rest_framework import filters
+
+# text search configuration used on PostgreSQL
+POST_SEARCH_CONFIG = getattr(settings, "POST_SEARCH_CONFIG", "simple")
+
+FTS_TABLE = "post_post_fts"
+
+SQLITE_SCHEMA = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        text, content='post_post', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON post_post BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON post_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF text ON post_post BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text);
+    END
+    """,
+)
+
+POSTGRESQL_SCHEMA = (
+    f"""
+    ALTER TABLE post_post ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (to_tsvector('{POST_SEARCH_CONFIG}', coalesce(text, ''))) STORED
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS post_post_search_idx ON post_post USING GIN (search_vector)
+    """,
+)
+
+
+def install(conn=None, rebuild=False):
+    """
+    Create the full-text index of post text and what keeps it in sync:
+    FTS5 with triggers on SQLite, a generated ```tsvector``` column with a
+    GIN index on PostgreSQL. Safe to run again, ```rebuild``` re-indexes
+    every post (only needed on SQLite).
+    """
+    conn = conn or connection
+    if conn.vendor == "sqlite":
+        statements = SQLITE_SCHEMA
+        if rebuild:
+            statements += (f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",)
+    elif conn.vendor == "postgresql":
+        statements = POSTGRESQL_SCHEMA
+    else:
+        return False
+    with conn.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+    return True
+
+
+def uninstall(conn=None):
+    conn = conn or connection
+    with conn.cursor() as cursor:
+        if conn.vendor == "sqlite":
+            for suffix in ("insert", "delete", "update"):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {FTS_TABLE}_{suffix}")
+            cursor.execute(f"DROP TABLE IF EXISTS {FTS_TABLE}")
+        elif conn.vendor == "postgresql":
+            cursor.execute("DROP INDEX IF EXISTS post_post_search_idx")
+            cursor.execute("ALTER TABLE post_post DROP COLUMN IF EXISTS search_vector")
+
+
+def _words(terms: str) -> list[str]:
+    return re.findall(r"\w+", terms or "")
+
+
+def search(queryset, terms: str, rank: bool = True):
+    """
+    Filter ```queryset``` to the posts matching every word of ```terms```,
+    the last word as a prefix, and with ```rank``` annotate their
+    ```search_rank``` (higher is better). Falls back to ```icontains``` on
+    other databases.
+    """
+    words = _words(terms)
+    if not words:
+        queryset = queryset.none()
+        if rank:
+            queryset = queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+        return queryset
+
+    vendor = connections[queryset.db].vendor
+    table = queryset.model._meta.db_table
+    if vendor == "sqlite":
+        query = " ".join(f'"{word}"' for word in words) + "*"
+        queryset = queryset.filter(
+            id__in=RawSQL(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (query,)
+            )
+        )
+        if not rank:
+            return queryset
+        return queryset.annotate(
+            search_rank=RawSQL(
+                f"SELECT -bm25({FTS_TABLE}) FROM {FTS_TABLE} "
+                f'WHERE {FTS_TABLE} MATCH %s AND rowid = "{table}"."id"',
+                (query,),
+                output_field=FloatField(),
+            )
+        )
+    if vendor == "postgresql":
+        query = " & ".join(words) + ":*"
+        queryset = queryset.filter(
+            RawSQL(
+                f'"{table}"."search_vector" @@ to_tsquery(%s::regconfig, %s)',
+                (POST_SEARCH_CONFIG, query),
+                output_field=BooleanField(),
+            )
+        )
+        if not rank:
+            return queryset
+        return queryset.annotate(
+            search_rank=RawSQL(
+                f'ts_rank("{table}"."search_vector", to_tsquery(%s::regconfig, %s))',
+                (POST_SEARCH_CONFIG, query),
+                output_field=FloatField(),
+            )
+        )
+
+    for word in words:
+        queryset = queryset.filter(text__icontains=word)
+    if not rank:
+        return queryset
+    return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+class PostSearchFilter(filters.SearchFilter):
+    """
+    ```?search=``` on the full-text index instead of ```LIKE '%term%'```,
+    the list keeps its own order so no rank is computed
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        terms = self.get_search_terms(request)
+        if not terms:
+            return queryset
+        return search(queryset, " ".join(terms), rank=False)
@@ -2,25 +2,104 @@ from rest_framework import serializers
 from django.http.request import HttpRequest
 from django.utils.translation import gettext_lazy as _
 from .models import (
+    load_shared_from,
+    SHARED_FROM_DEPTH,
     Post,
     PostComment, 
     PostVideo, 
-    PostPicture
+    PostPicture,
+    VideoUpload,
 )
 
 from django.db.models.query import QuerySet
+from django.db.models.manager import BaseManager
 from accounts.serializers import UserInfoSerializer
+from config import fieldsets
+from config.fieldsets import SparseFieldsetsMixin
+from config.images import ImageVariantsField
+from .viewer import PostViewerState, PostCommentViewerState
+from . import render_cache, uploads
+from .likes import LIKE_TARGETS, MAX_LIKE_OPERATIONS
 
-class PostPictureSerializer(serializers.ModelSerializer):
+
+class ViewerStateListSerializer(serializers.ListSerializer):
+    """
+    Resolves the per-viewer state (liked, shared, ...) of the whole page
+    up front, so every row reads it from memory instead of querying.
+    """
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, BaseManager) else data)
+        self.child.resolve_viewer_state(items)
+        return super().to_representation(items)
+
+
+class PostListSerializer(ViewerStateListSerializer):
+    """
+    Serves the viewer-independent part of each post from the render cache,
+    with the per-viewer state and the counters merged on top.
+    """
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, BaseManager) else data)
+        depth = self.child.shared_depth()
+        load_shared_from(items, depth)
+        self.child.resolve_viewer_state(items)
+        return render_cache.render(self.child, items, depth)
+
+
+class ViewerStateMixin:
+    """
+    Serializers listing objects with per-viewer flags, set ```viewer_state_class```
+    and ```Meta.list_serializer_class = ViewerStateListSerializer```.
+    """
+
+    viewer_state_class = None
+    viewer_state = None
+
+    @property
+    def viewer(self):
+        request: HttpRequest = self.context.get("request")
+        return getattr(request, "user", None)
+
+    def resolve_viewer_state(self, instances: list):
+        """
+        Use the state the view already resolved (```context["viewer_state"]```)
+        when it covers ```instances```, or resolve it for them.
+        """
+        state = self.context.get("viewer_state")
+        if not isinstance(state, self.viewer_state_class) or not all(
+            state.covers(instance) for instance in instances
+        ):
+            state = self.viewer_state_class(
+                self.viewer, instances, flags=self.viewer_flags()
+            )
+        self.viewer_state = state
+
+    def viewer_flags(self) -> set:
+        """ the flags rendered, the others are not looked up """
+        return {name for name in self.viewer_state_class.flags if name in self.fields}
+
+    def viewer_has(self, flag: str, instance) -> bool:
+        if self.viewer_state is None or not self.viewer_state.covers(instance):
+            # serialized on its own, e.g. a detail view
+            self.resolve_viewer_state([instance])
+        return self.viewer_state.has(flag, instance)
+
+
+class PostPictureSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     """
     A serializer that fetches Posts related images
     """
 
+    image_variants = ImageVariantsField()
+
     class Meta:
         model = PostPicture
         fields = (
             "id",
             "image",
+            "image_variants",
             "post",
         )
 
@@ -32,7 +111,7 @@ class DeletePostPictureSerializer(serializers.ModelSerializer):
 
 
 
-class PostVideoSerializer(serializers.ModelSerializer):
+class PostVideoSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     class Meta:
         model = PostVideo
         fields = (
@@ -41,13 +120,21 @@ class PostVideoSerializer(serializers.ModelSerializer):
             "video",
             "thumbnail",
             "duration",
+            "width",
+            "height",
+            "codec",
             "date_created",
         )
 
 
 class PostVideoCreateSerializer(serializers.ModelSerializer):
+    """
+    ```thumbnail``` and ```duration``` are optional, they are read from the
+    video once it is stored when ffmpeg is installed on the server
+    """
+
     video = serializers.FileField()
-    thumbnail = serializers.FileField()
+    thumbnail = serializers.FileField(required=False)
 
     class Meta:
         model = PostVideo
@@ -60,15 +147,69 @@ class DeletePostVideoSerializer(serializers.ModelSerializer):
         fields = ("id",)
 
 
-class PostSerializer(serializers.ModelSerializer):
+class VideoUploadSerializer(serializers.ModelSerializer):
+    """
+    A resumable video upload, ```offset``` is the number of bytes received
+    """
+
+    size = serializers.IntegerField(min_value=1)
+    next_chunk = serializers.SerializerMethodField()
+    expires_at = serializers.SerializerMethodField()
+
+    def get_next_chunk(self, instance: VideoUpload):
+        if instance.offset >= instance.size:
+            return None
+        return instance.offset // instance.chunk_size
+
+    def get_expires_at(self, instance: VideoUpload):
+        return uploads.expires_at(instance)
+
+    class Meta:
+        model = VideoUpload
+        fields = (
+            "id",
+            "filename",
+            "size",
+            "chunk_size",
+            "offset",
+            "next_chunk",
+            "date_created",
+            "expires_at",
+        )
+        read_only_fields = ("chunk_size", "offset")
+
+
+class VideoUploadFinalizeSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = PostVideo
+        fields = ("post", "duration")
+        extra_kwargs = {"post": {"required": False}}
+
+    def validate_post(self, post: Post):
+        request: HttpRequest = self.context.get("request")
+        if post is not None and post.user_id != request.user.id:
+            raise serializers.ValidationError(_("You can only add videos to your posts"))
+        return post
+
+
+class PostSerializer(SparseFieldsetsMixin, ViewerStateMixin, serializers.ModelSerializer):
     """
     A serializer the fetches posts
     """
 
+    viewer_state_class = PostViewerState
+
+    # level of the rendered posts in a ```shared_from``` chain
+    shared_level = 0
+
     pictures = PostPictureSerializer(many=True, read_only=True)
 
     liked = serializers.SerializerMethodField()
 
+    shared = serializers.SerializerMethodField()
+
+    following_user = serializers.SerializerMethodField()
+
     user_account = UserInfoSerializer() 
 
     shared_from = serializers.SerializerMethodField(read_only=True)
@@ -76,34 +217,72 @@ class PostSerializer(serializers.ModelSerializer):
     videos = PostVideoSerializer(many=True, read_only=True)
 
     def get_shared_from(self, instance: Post):
+        if not instance.shared_from_id:
+            return None
+        if self.shared_level >= SHARED_FROM_DEPTH:
+            return {"id": instance.shared_from_id}
         if not instance.shared_from:
             return None
-        return PostSerializer(
+        serializer = PostSerializer(
             instance=instance.shared_from,
             context=self.context,
-        ).data
+        )
+        serializer.fieldset_path = self.get_fieldset_path() + ("shared_from",)
+        serializer.shared_level = self.shared_level + 1
+        serializer.viewer_state = self.viewer_state
+        return serializer.data
+
+    def shared_depth(self) -> int:
+        """ levels of ```shared_from``` rendered in full with the requested fields """
+        request = self.context.get("request")
+        path, depth = self.get_fieldset_path(), self.shared_level
+        while depth < SHARED_FROM_DEPTH and fieldsets.selected(request, "shared_from", path):
+            path += ("shared_from",)
+            depth += 1
+        return depth - self.shared_level
+
+    def requested_in_chain(self, names) -> set:
+        """ the fields of ```names``` rendered on the post or on one of its shared posts """
+        request = self.context.get("request")
+        path, found = self.get_fieldset_path(), set()
+        for _ in range(self.shared_depth() + 1):
+            found.update(name for name in names if fieldsets.selected(request, name, path))
+            path += ("shared_from",)
+        return found
+
+    def viewer_flags(self) -> set:
+        return self.requested_in_chain(self.viewer_state_class.flags)
 
     def get_liked(self, instance: Post):
         """
-        check weather the current user liked this particular comment
+        check weather the current user liked this particular post
         """
-        request: HttpRequest = self.context.get("request")
-        if request.user.is_authenticated:
-            return instance.likes.filter(
-                id=request.user.id,
-            ).exists()
+        return self.viewer_has("liked", instance)
 
-        return False
+    def get_shared(self, instance: Post):
+        """
+        check weather the current user shared this particular post
+        """
+        return self.viewer_has("shared", instance)
+
+    def get_following_user(self, instance: Post):
+        """
+        check weather the current user follows the author of this post
+        """
+        return self.viewer_has("following_user", instance)
 
 
     class Meta:
         model = Post
+        list_serializer_class = PostListSerializer
         fields = (
             "id",
             "text",
             "user",
             "user_account",
             "liked",
+            "shared",
+            "following_user",
             "likes_count",
             "comment_count",
             "pictures",
@@ -119,7 +298,10 @@ class PostSerializer(serializers.ModelSerializer):
             "user_account",
             "date_created",
             "pictures",
-            "videos"
+            "videos",
+            "likes_count",
+            "comment_count",
+            "shares_count",
         )
 
     def validate(self, attrs):
@@ -165,33 +347,28 @@ class PostCreateSerializer(serializers.ModelSerializer):
         return PostVideo.objects.filter(id__in=videos)
 
 
-class PostCommentSerializer(serializers.ModelSerializer):
+class PostCommentSerializer(SparseFieldsetsMixin, ViewerStateMixin, serializers.ModelSerializer):
     """
     A serializer for Post comments
     """
 
+    viewer_state_class = PostCommentViewerState
+
     liked = serializers.SerializerMethodField()
 
     user_account = UserInfoSerializer(read_only=True)
 
-    replies_count = serializers.SerializerMethodField()
-
 
     def get_liked(self, instance: PostComment):
         """
         check weather the current user liked this particular comment
         """
-        request: HttpRequest = self.context.get("request")
-        if request.user.is_authenticated:
-            return instance.likes.filter(id=request.user.id).exists()
-        return False
-
-    def get_replies_count(self, instance: PostComment):
-        return instance.sub_comments.count()
+        return self.viewer_has("liked", instance)
 
 
     class Meta:
         model = PostComment
+        list_serializer_class = ViewerStateListSerializer
         fields = (
             "id",
             "post",
@@ -199,6 +376,8 @@ class PostCommentSerializer(serializers.ModelSerializer):
             "user_account",
             "comment",
             "parent",
+            "thread",
+            "depth",
             "date_created",
             "liked",
             "likes_count",
@@ -210,6 +389,9 @@ class PostCommentSerializer(serializers.ModelSerializer):
             "user",
             "is_edited",
             "likes_count",
+            "replies_count",
+            "thread",
+            "depth",
             "date_created",
             "user_account",
         )
@@ -220,6 +402,40 @@ class PostCommentSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError(
                 _("Comment must have a Post object")
             )
+        parent = attrs.get("parent")
+        if parent is not None:
+            if parent.post_id != post.pk:
+                raise serializers.ValidationError(
+                    _("A reply must be made on the post of its parent comment")
+                )
+            max_length = PostComment._meta.get_field("path").max_length
+            if len(parent.path) + PostComment.PATH_STEP + 1 > max_length:
+                raise serializers.ValidationError(_("The thread is too deep"))
         attrs = super().validate(attrs)
         return attrs
 
+
+
+class LikeOperationSerializer(serializers.Serializer):
+    """
+    A single like (```liked: true```) or unlike (```liked: false```)
+    """
+
+    type = serializers.ChoiceField(choices=tuple(LIKE_TARGETS))
+    id = serializers.IntegerField()
+    liked = serializers.BooleanField()
+
+
+class BulkLikeSerializer(serializers.Serializer):
+    operations = LikeOperationSerializer(many=True, max_length=MAX_LIKE_OPERATIONS)
+
+
+class LikeStateSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    liked = serializers.BooleanField()
+    likes_count = serializers.IntegerField()
+
+
+class AnnouncementReadSerializer(serializers.Serializer):
+    # all unread announcements when left out
+    posts = serializers.ListField(child=serializers.IntegerField(), required=False)
@@ -0,0 +1,136 @@
+from collections import Counter
+from functools import partial
+
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.db import transaction
+from django.dispatch import receiver
+
+from accounts.models import UserFollowship
+from config import images
+
+from . import announcements, timeline, video_metadata
+from .counters import bump, bump_many
+from .models import Post, PostComment, PostPicture, PostVideo
+
+
+@receiver(post_save, sender=Post)
+def post_created(sender, instance: Post, created: bool, **kwargs):
+    """ a share is a post with ```shared_from``` set """
+    if not created:
+        return
+    if instance.shared_from_id:
+        bump(Post, instance.shared_from_id, shares_count=1)
+    timeline.fan_out(instance)
+    announcements.deliver(instance)
+
+
+@receiver(post_save, sender=PostPicture)
+@receiver(post_delete, sender=PostPicture)
+@receiver(post_save, sender=PostVideo)
+@receiver(post_delete, sender=PostVideo)
+def media_changed(sender, instance, **kwargs):
+    """ a post's media is part of its cached payload """
+    if instance.post_id:
+        Post.objects.filter(pk=instance.post_id).touch()
+
+
+@receiver(post_save, sender=PostVideo)
+def video_created(sender, instance: PostVideo, created: bool, raw=False, **kwargs):
+    """ read the duration, resolution and codec of new videos in the background """
+    if created and not raw:
+        transaction.on_commit(partial(video_metadata.schedule, instance))
+
+
+def picture_variants_ready(picture: PostPicture):
+    Post.objects.filter(pk=picture.post_id).touch()
+
+
+images.register(
+    PostPicture, "image", "image_variants", on_ready=picture_variants_ready
+)
+
+
+@receiver(post_save, sender=UserFollowship)
+def followship_saved(sender, instance: UserFollowship, **kwargs):
+    """ following fills the home timeline with the author's posts, unfollowing empties it """
+    if not instance.user_id or not instance.follower_id:
+        return
+    if instance.deleted:
+        timeline.unfollow(instance.follower_id, instance.user_id)
+    else:
+        timeline.backfill(instance.follower_id, instance.user_id)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance: Post, **kwargs):
+    if instance.shared_from_id:
+        bump(Post, instance.shared_from_id, shares_count=-1)
+
+
+@receiver(post_save, sender=PostComment)
+def comment_created(sender, instance: PostComment, created: bool, **kwargs):
+    if not created:
+        return
+    bump(Post, instance.post_id, comment_count=1)
+    bump(PostComment, instance.parent_id, replies_count=1)
+    instance.set_tree_position(instance.parent)
+    PostComment.objects.filter(pk=instance.pk).update(
+        thread=instance.thread_id, path=instance.path, depth=instance.depth
+    )
+
+
+@receiver(post_delete, sender=PostComment)
+def comment_deleted(sender, instance: PostComment, **kwargs):
+    bump(Post, instance.post_id, comment_count=-1)
+    bump(PostComment, instance.parent_id, replies_count=-1)
+
+
+def _likes_changed(owner, sender, instance, action, reverse, pk_set, **kwargs):
+    """
+    Keep ```likes_count``` in step with the ```likes``` relation of ```owner```.
+
+    ```pk_set``` only holds rows that were really inserted on ```post_add```,
+    but on removal it holds whatever the caller passed, so the rows that
+    actually exist are looked up before they are removed.
+    """
+    if action == "post_add":
+        if not pk_set:
+            return
+        if reverse:
+            bump_many(owner, pk_set, likes_count=1)
+        else:
+            bump(owner, instance.pk, likes_count=len(pk_set))
+
+    elif action in ("pre_remove", "pre_clear"):
+        source = owner.likes.field.m2m_field_name()
+        target = owner.likes.field.m2m_reverse_field_name()
+        if reverse:
+            rows = sender.objects.filter(**{target: instance.pk})
+            if pk_set is not None:
+                rows = rows.filter(**{f"{source}__in": pk_set})
+        else:
+            rows = sender.objects.filter(**{source: instance.pk})
+            if pk_set is not None:
+                rows = rows.filter(**{f"{target}__in": pk_set})
+        instance._pending_unlikes = Counter(
+            rows.values_list(f"{source}_id", flat=True)
+        )
+
+    elif action in ("post_remove", "post_clear"):
+        pending: Counter = getattr(instance, "_pending_unlikes", None) or Counter()
+        instance._pending_unlikes = None
+        by_total = {}
+        for pk, total in pending.items():
+            by_total.setdefault(total, []).append(pk)
+        for total, pks in by_total.items():
+            bump_many(owner, pks, likes_count=-total)
+
+
+@receiver(m2m_changed, sender=Post.likes.through)
+def post_likes_changed(sender, **kwargs):
+    _likes_changed(Post, sender, **kwargs)
+
+
+@receiver(m2m_changed, sender=PostComment.likes.through)
+def comment_likes_changed(sender, **kwargs):
+    _likes_changed(PostComment, sender, **kwargs)
@@ -1,3 +1,1208 @@
-from django.test import TestCase
+import hashlib
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import Future
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import CustomUser, Profile, UserFollowship
+from community.models import Announcement, Community, Group
+from config import ffmpeg, images
+from . import announcements, counters, render_cache, timeline, uploads, video_metadata
+from .models import (
+    AnnouncementDelivery,
+    HiddenComment,
+    MutedCommenter,
+    Post,
+    PostComment,
+    PostPicture,
+    PostVideo,
+    VideoUpload,
+)
+
+
+class PostQueryCountTest(TestCase):
+    """
+    Rendering posts must cost a fixed number of queries, whatever the page size.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = []
+        for i in range(3):
+            user = CustomUser.objects.create(
+                username=f"user{i}", phone_number=f"02000000{i:02d}"
+            )
+            Profile.objects.create(user=user, about="")
+            cls.users.append(user)
+
+        cls.original = Post.objects.create(user=cls.users[1], text="original")
+        PostPicture.objects.create(post=cls.original, image="post_pictures/a.jpg")
+        for i in range(119):
+            post = Post.objects.create(
+                user=cls.users[i % 3],
+                text=f"post {i}",
+                shared_from=cls.original if i % 4 == 0 else None,
+            )
+            PostPicture.objects.create(post=post, image="post_pictures/b.jpg")
+            PostVideo.objects.create(post=post, video="post_videos/c.mp4")
+            if i % 5 == 0:
+                post.likes.add(cls.users[0])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+
+    def test_list_page_query_count(self):
+        # posts, pictures and videos of the posts and their shared posts,
+        # and the viewer's likes, shares and followed authors
+        with self.assertNumQueries(6):
+            response = self.client.get(reverse("post:posts-list"))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["results"]), 120)
+
+    def test_cached_page_skips_media_queries(self):
+        first = self.client.get(reverse("post:posts-list")).json()
+        # posts and the viewer's state, media comes from the render cache
+        with self.assertNumQueries(4):
+            second = self.client.get(reverse("post:posts-list")).json()
+        self.assertEqual(first, second)
+        self.assertEqual(render_cache.stats(), {"hits": 120, "misses": 120})
+
+    def test_cached_payload_follows_changes(self):
+        post = Post.objects.exclude(shared_from=None).first()
+        self.client.get(reverse("post:posts-list"))
+        self.original.text = "edited"
+        self.original.save()
+        post.likes.add(self.users[0])
+        payload = next(
+            row
+            for row in self.client.get(reverse("post:posts-list")).json()["results"]
+            if row["id"] == post.pk
+        )
+        self.assertTrue(payload["liked"])
+        self.assertEqual(payload["likes_count"], 1)
+        self.assertEqual(payload["shared_from"]["text"], "edited")
+
+    def test_retrieve_query_count(self):
+        post = Post.objects.filter(shared_from__isnull=False).first()
+        with self.assertNumQueries(8):
+            response = self.client.get(reverse("post:posts-detail", args=[post.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()["shared_from"]["id"], self.original.pk)
+
+    def test_share_chains_are_bounded(self):
+        reshares = []
+        for i in range(5):
+            reshares.append(
+                Post.objects.create(
+                    user=self.users[2],
+                    text=f"reshare {i}",
+                    shared_from=reshares[-1] if reshares else self.original,
+                )
+            )
+        cache.clear()
+        # the page query joins one level of shared posts, one more query
+        # loads the second level and the rest is stubbed
+        with self.assertNumQueries(7):
+            results = self.client.get(reverse("post:posts-list")).json()["results"]
+        shared = results[0]["shared_from"]
+        self.assertEqual(shared["text"], "reshare 3")
+        self.assertEqual(shared["shared_from"]["text"], "reshare 2")
+        self.assertEqual(shared["shared_from"]["shared_from"], {"id": reshares[1].pk})
+
+
+class ViewerFlagsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.viewer, cls.followed, cls.stranger = [
+            CustomUser.objects.create(username=name, phone_number=f"020000000{i}")
+            for i, name in enumerate(("viewer", "followed", "stranger"))
+        ]
+        for user in (cls.viewer, cls.followed, cls.stranger):
+            Profile.objects.create(user=user, about="")
+        UserFollowship.objects.create(user=cls.followed, follower=cls.viewer)
+        cls.expected = {}
+        for i in range(12):
+            post = Post.objects.create(
+                user=cls.followed if i % 2 else cls.stranger, text=f"post {i}"
+            )
+            if i % 3 == 0:
+                post.likes.add(cls.viewer)
+            cls.expected[post.pk] = {
+                "liked": i % 3 == 0,
+                "shared": False,
+                "following_user": bool(i % 2),
+            }
+        for pk in list(cls.expected)[::4]:
+            share = Post.objects.create(user=cls.viewer, text="", shared_from_id=pk)
+            cls.expected[pk]["shared"] = True
+            cls.expected[share.pk] = {"liked": False, "shared": False, "following_user": False}
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.viewer)
+
+    def flags(self, page_size):
+        # the page, pictures, videos and one query for each flag
+        with self.assertNumQueries(6):
+            results = self.client.get(
+                reverse("post:posts-list"), {"page_size": page_size}
+            ).json()["results"]
+        self.assertEqual(len(results), page_size)
+        return {
+            row["id"]: {flag: row[flag] for flag in ("liked", "shared", "following_user")}
+            for row in results
+        }
+
+    def test_flags_of_a_page(self):
+        small, large = self.flags(3), self.flags(15)
+        self.assertEqual(large, self.expected)
+        self.assertEqual(small, {pk: large[pk] for pk in small})
+
+
+class PostKeysetPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username="user", phone_number="0200000000")
+        Profile.objects.create(user=cls.user, about="")
+        for i in range(25):
+            Post.objects.create(user=cls.user, text=f"post {i}")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_scroll_is_stable_under_inserts(self):
+        url = reverse("post:posts-list") + "?page_size=10"
+        first = self.client.get(url).json()
+        self.assertNotIn("count", first)
+        Post.objects.create(user=self.user, text="inserted while scrolling")
+
+        seen = [post["id"] for post in first["results"]]
+        next_url = first["next"]
+        while next_url:
+            page = self.client.get(next_url).json()
+            seen += [post["id"] for post in page["results"]]
+            next_url = page["next"]
+
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+
+        previous = self.client.get(page["previous"]).json()
+        self.assertEqual([post["id"] for post in previous["results"]], seen[10:20])
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("post:posts-list") + "?cursor=garbage")
+        self.assertEqual(response.status_code, 404)
+
+
+class RandomVideoFeedTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username="user", phone_number="0200000000")
+        Profile.objects.create(user=cls.user, about="")
+        for i in range(30):
+            post = Post.objects.create(
+                user=cls.user, text=f"video {i}", post_type=Post.PostType.post_video
+            )
+            PostVideo.objects.create(post=post, video="post_videos/a.mp4")
+        Post.objects.create(user=cls.user, text="no video", post_type=Post.PostType.post_video)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def scroll(self, url):
+        seen = []
+        while url:
+            page = self.client.get(url).json()
+            seen += [post["id"] for post in page["results"]]
+            url = page["next"]
+        return seen, page["seed"]
+
+    def test_session_pages_without_repeats(self):
+        seen, seed = self.scroll(reverse("post:posts-video") + "?page_size=7")
+        self.assertEqual(len(seen), 30)
+        self.assertEqual(len(set(seen)), 30)
+
+        replay, _ = self.scroll(reverse("post:posts-video") + f"?page_size=7&seed={seed}")
+        self.assertEqual(replay, seen)
+
+
+class HomeFeedTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader, cls.friend, cls.star, cls.stranger = [
+            CustomUser.objects.create(username=name, phone_number=f"020000000{i}")
+            for i, name in enumerate(("reader", "friend", "star", "stranger"))
+        ]
+        for user in (cls.reader, cls.friend, cls.star, cls.stranger):
+            Profile.objects.create(user=user, about="")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def feed_ids(self):
+        return [post["id"] for post in self.client.get(reverse("post:feed")).json()["results"]]
+
+    def create(self, user, text):
+        # the fan-out runs inline instead of in the worker pool
+        with mock.patch("post.timeline.executor") as executor, \
+                self.captureOnCommitCallbacks(execute=True):
+            executor.return_value.submit.side_effect = (
+                lambda run, *args: timeline.fan_out_to_followers(*args)
+            )
+            return Post.objects.create(user=user, text=text)
+
+    def test_feed_merges_fanned_out_and_pulled_authors(self):
+        UserFollowship.objects.create(user=self.friend, follower=self.reader)
+        UserFollowship.objects.create(user=self.star, follower=self.reader)
+        with mock.patch("post.timeline.FEED_FANOUT_LIMIT", 0):
+            star_post = self.create(self.star, "star")
+        friend_post = self.create(self.friend, "friend")
+        own_post = self.create(self.reader, "mine")
+        self.create(self.stranger, "stranger")
+
+        self.assertFalse(star_post.timeline_entries.filter(owner=self.reader).exists())
+        self.assertEqual(self.feed_ids(), [own_post.pk, friend_post.pk, star_post.pk])
+
+    def test_followers_are_served_after_commit(self):
+        UserFollowship.objects.create(user=self.friend, follower=self.reader)
+        with mock.patch("post.timeline.executor") as executor:
+            with self.captureOnCommitCallbacks() as callbacks:
+                post = Post.objects.create(user=self.friend, text="friend")
+            # the author's own timeline is written with the post
+            self.assertTrue(post.timeline_entries.filter(owner=self.friend).exists())
+            self.assertFalse(post.timeline_entries.filter(owner=self.reader).exists())
+            executor.return_value.submit.assert_not_called()
+            callbacks[0]()
+        run, *args = executor.return_value.submit.call_args.args
+        self.assertIs(run, timeline._fan_out_in_worker)
+        # the followers are read with one query
+        with self.assertNumQueries(3):
+            timeline.fan_out_to_followers(*args)
+        self.assertTrue(post.timeline_entries.filter(owner=self.reader).exists())
+
+    def test_follow_backfills_and_unfollow_clears(self):
+        post = Post.objects.create(user=self.friend, text="before follow")
+        followship = UserFollowship.objects.create(user=self.friend, follower=self.reader)
+        self.assertEqual(self.feed_ids(), [post.pk])
+
+        followship.deleted = True
+        followship.save()
+        self.assertEqual(self.feed_ids(), [])
+
+
+class PostSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username="user", phone_number="0200000000")
+        Profile.objects.create(user=cls.user, about="")
+        cls.once = Post.objects.create(user=cls.user, text="good vibes only")
+        cls.twice = Post.objects.create(user=cls.user, text="vibes, vibes and more vibes")
+        Post.objects.create(user=cls.user, text="nothing to see here")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, terms):
+        response = self.client.get(reverse("post:posts-search"), {"q": terms})
+        return [post["id"] for post in response.json()["results"]]
+
+    def test_ranked_prefix_search(self):
+        self.assertEqual(self.search("vib"), [self.twice.pk, self.once.pk])
+        self.assertEqual(self.search("good vib"), [self.once.pk])
+        self.assertEqual(self.search(""), [])
+
+    def test_index_follows_edits_and_deletes(self):
+        self.once.text = "bad mood"
+        self.once.save()
+        self.assertEqual(self.search("vibes"), [self.twice.pk])
+        self.assertEqual(self.search("mood"), [self.once.pk])
+        self.twice.delete()
+        self.assertEqual(self.search("vibes"), [])
+
+    def test_search_pages_on_rank(self):
+        url, ids = reverse("post:posts-search") + "?q=vib&page_size=1", []
+        with CaptureQueriesContext(connection) as queries:
+            while url:
+                page = self.client.get(url).json()
+                ids += [post["id"] for post in page["results"]]
+                url = page["next"]
+        self.assertEqual(ids, [self.twice.pk, self.once.pk])
+        self.assertFalse(
+            [query for query in queries.captured_queries if "COUNT(" in query["sql"]]
+        )
+
+    def test_list_search_filter(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse("post:posts-list"), {"search": "good"})
+        self.assertEqual([post["id"] for post in response.json()["results"]], [self.once.pk])
+        # listed by date, the rank is not computed
+        self.assertNotIn("bm25", " ".join(query["sql"] for query in queries.captured_queries))
+
+
+class CommentThreadTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(
+            username="user", phone_number="0200000000", is_superuser=True
+        )
+        Profile.objects.create(user=cls.user, about="")
+        cls.post = Post.objects.create(user=cls.user, text="post")
+        cls.root = PostComment.objects.create(post=cls.post, user=cls.user, comment="root")
+        first = PostComment.objects.create(
+            post=cls.post, user=cls.user, comment="first", parent=cls.root
+        )
+        PostComment.objects.create(post=cls.post, user=cls.user, comment="nested", parent=first)
+        PostComment.objects.create(
+            post=cls.post, user=cls.user, comment="second", parent=cls.root
+        )
+        PostComment.objects.create(post=cls.post, user=cls.user, comment="other root")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_thread_loads_in_path_order(self):
+        url = reverse("post:posts-comments-thread", args=[self.root.pk])
+        with self.assertNumQueries(3):
+            results = self.client.get(url).json()["results"]
+        self.assertEqual(
+            [(row["comment"], row["depth"]) for row in results],
+            [("root", 0), ("first", 1), ("nested", 2), ("second", 1)],
+        )
+        self.assertEqual(results[0]["replies_count"], 2)
+
+        results = self.client.get(url, {"max_depth": 1}).json()["results"]
+        self.assertEqual([row["comment"] for row in results], ["root", "first", "second"])
+
+    def test_thread_pages(self):
+        url = reverse("post:posts-comments-thread", args=[self.root.pk])
+        first = self.client.get(url, {"page_size": 2}).json()
+        second = self.client.get(first["next"]).json()
+        self.assertEqual(
+            [row["comment"] for row in first["results"] + second["results"]],
+            ["root", "first", "nested", "second"],
+        )
+
+
+class CommentVisibilityTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader, cls.author, cls.troll = [
+            CustomUser.objects.create(username=name, phone_number=f"020000000{i}")
+            for i, name in enumerate(("reader", "author", "troll"))
+        ]
+        for user in (cls.reader, cls.author, cls.troll):
+            Profile.objects.create(user=user, about="")
+        post = Post.objects.create(user=cls.author, text="post")
+        cls.own = PostComment.objects.create(post=post, user=cls.reader, comment="mine")
+        cls.kept = PostComment.objects.create(post=post, user=cls.author, comment="kept")
+        cls.hidden = PostComment.objects.create(post=post, user=cls.author, comment="hidden")
+        cls.trolling = PostComment.objects.create(post=post, user=cls.troll, comment="troll")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.reader)
+
+    def listed(self):
+        response = self.client.get(reverse("post:posts-comments-list"))
+        return {row["id"] for row in response.json()["results"]}
+
+    def test_hide_and_mute(self):
+        self.assertEqual(
+            self.listed(), {self.own.pk, self.kept.pk, self.hidden.pk, self.trolling.pk}
+        )
+        self.client.post(reverse("post:posts-comments-hide", args=[self.hidden.pk]))
+        self.client.post(reverse("post:posts-comments-hide", args=[self.hidden.pk]))
+        self.client.post(reverse("post:posts-comments-hide", args=[self.own.pk]))
+        self.client.post(reverse("post:posts-comments-mute-author", args=[self.trolling.pk]))
+        self.assertEqual(self.listed(), {self.own.pk, self.kept.pk})
+        self.assertEqual(HiddenComment.objects.filter(comment=self.hidden).count(), 1)
+
+        self.client.post(reverse("post:posts-comments-unhide", args=[self.hidden.pk]))
+        self.client.post(reverse("post:posts-comments-unmute-author", args=[self.trolling.pk]))
+        self.assertEqual(
+            self.listed(), {self.own.pk, self.kept.pk, self.hidden.pk, self.trolling.pk}
+        )
+
+    def test_comments_out_of_sight_cannot_be_acted_on(self):
+        self.client.post(reverse("post:posts-comments-hide", args=[self.hidden.pk]))
+        self.client.post(reverse("post:posts-comments-mute-author", args=[self.trolling.pk]))
+        self.assertEqual(
+            self.client.post(
+                reverse("post:posts-comments-mute-author", args=[self.hidden.pk])
+            ).status_code,
+            404,
+        )
+        self.assertEqual(
+            self.client.post(
+                reverse("post:posts-comments-hide", args=[self.trolling.pk])
+            ).status_code,
+            404,
+        )
+        self.assertFalse(MutedCommenter.objects.filter(muted=self.author).exists())
+
+    def test_visibility_is_an_anti_join(self):
+        sql = str(PostComment.objects.visible_to(self.reader).query).upper()
+        self.assertIn("NOT EXISTS", sql)
+        self.assertNotIn("DISTINCT", sql)
+
+
+class CounterSignalTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            CustomUser.objects.create(username=f"user{i}", phone_number=f"02000000{i:02d}")
+            for i in range(2)
+        ]
+        cls.post = Post.objects.create(user=cls.users[0], text="post")
+
+    def counts(self, instance, *fields):
+        instance.refresh_from_db(fields=fields)
+        return tuple(getattr(instance, field) for field in fields)
+
+    def test_comments_and_replies(self):
+        comment = PostComment.objects.create(post=self.post, user=self.users[1], comment="hi")
+        reply = PostComment.objects.create(
+            post=self.post, user=self.users[0], comment="hello", parent=comment
+        )
+        self.assertEqual(self.counts(self.post, "comment_count"), (2,))
+        self.assertEqual(self.counts(comment, "replies_count"), (1,))
+
+        reply.delete()
+        self.assertEqual(self.counts(self.post, "comment_count"), (1,))
+        self.assertEqual(self.counts(comment, "replies_count"), (0,))
+        comment.delete()
+        self.assertEqual(self.counts(self.post, "comment_count"), (0,))
+
+    def test_shares(self):
+        share = Post.objects.create(user=self.users[1], text="", shared_from=self.post)
+        self.assertEqual(self.counts(self.post, "shares_count"), (1,))
+        share.delete()
+        self.assertEqual(self.counts(self.post, "shares_count"), (0,))
+
+    def test_likes_from_either_side(self):
+        self.post.likes.add(*self.users)
+        self.assertEqual(self.counts(self.post, "likes_count"), (2,))
+        self.users[0].post_like.remove(self.post)
+        self.assertEqual(self.counts(self.post, "likes_count"), (1,))
+        self.post.likes.clear()
+        self.assertEqual(self.counts(self.post, "likes_count"), (0,))
+
+    def test_counters_never_go_below_zero(self):
+        comment = PostComment.objects.create(post=self.post, user=self.users[1], comment="hi")
+        share = Post.objects.create(user=self.users[1], text="", shared_from=self.post)
+        Post.objects.filter(pk=self.post.pk).update(comment_count=0, shares_count=0)
+        comment.delete()
+        share.delete()
+        self.assertEqual(self.counts(self.post, "comment_count", "shares_count"), (0, 0))
+
+    def test_reconcile_rebuilds_drifted_counters(self):
+        comment = PostComment.objects.create(post=self.post, user=self.users[1], comment="hi")
+        PostComment.objects.create(
+            post=self.post, user=self.users[0], comment="hello", parent=comment
+        )
+        Post.objects.create(user=self.users[1], text="", shared_from=self.post)
+        self.post.likes.add(self.users[1])
+        comment.likes.add(self.users[0])
+        Post.objects.filter(pk=self.post.pk).update(
+            likes_count=7, comment_count=0, shares_count=3
+        )
+        PostComment.objects.filter(pk=comment.pk).update(likes_count=0, replies_count=5)
+
+        call_command("reconcile_post_counters", batch_size=1, stdout=StringIO())
+        self.assertEqual(
+            self.counts(self.post, "likes_count", "comment_count", "shares_count"), (1, 2, 1)
+        )
+        self.assertEqual(self.counts(comment, "likes_count", "replies_count"), (1, 1))
+
+
+class LikeTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username="user", phone_number="0200000000")
+        Profile.objects.create(user=cls.user, about="")
+        cls.post = Post.objects.create(user=cls.user, text="post")
+        cls.other = Post.objects.create(user=cls.user, text="other")
+        cls.comment = PostComment.objects.create(post=cls.post, user=cls.user, comment="hi")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_like_is_idempotent(self):
+        url = reverse("post:posts-like", args=[self.post.pk])
+        self.client.post(url)
+        response = self.client.post(url)
+        self.assertEqual(response.json(), {"id": self.post.pk, "liked": True, "likes_count": 1})
+
+        url = reverse("post:posts-unlike", args=[self.post.pk])
+        self.client.post(url)
+        self.assertEqual(self.client.post(url).json()["likes_count"], 0)
+        missing = reverse("post:posts-comments-like", args=[self.comment.pk + 100])
+        self.assertEqual(self.client.post(missing).status_code, 404)
+        self.assertFalse(PostComment.likes.through.objects.exists())
+
+    def test_like_is_one_write(self):
+        url = reverse("post:posts-like", args=[self.post.pk])
+        # the insert-or-ignore, the counter and reading it back, in a
+        # transaction (a savepoint in tests)
+        with self.assertNumQueries(5):
+            self.client.post(url)
+        # nothing inserted, the counter is left alone
+        with self.assertNumQueries(4):
+            response = self.client.post(url)
+        self.assertEqual(response.json()["likes_count"], 1)
+
+    def test_get_is_a_deprecated_alias(self):
+        response = self.client.get(reverse("post:posts-comments-like", args=[self.comment.pk]))
+        self.assertEqual(response.json()["liked"], True)
+        self.assertEqual(response["Deprecation"], "true")
+        response = self.client.post(reverse("post:posts-comments-unlike", args=[self.comment.pk]))
+        self.assertFalse(response.has_header("Deprecation"))
+
+    def test_databases_without_returning(self):
+        with mock.patch.object(
+            type(connection.features),
+            "can_return_rows_from_bulk_insert",
+            new_callable=mock.PropertyMock,
+            return_value=False,
+        ):
+            self.test_like_is_idempotent()
+
+    def test_bulk_operations(self):
+        self.other.likes.add(self.user)
+        operations = [
+            {"type": "post", "id": self.post.pk, "liked": True},
+            {"type": "post", "id": self.other.pk, "liked": False},
+            {"type": "comment", "id": self.comment.pk, "liked": False},
+            {"type": "comment", "id": self.comment.pk, "liked": True},
+            {"type": "post", "id": self.post.pk + 100, "liked": True},
+        ]
+        response = self.client.post(
+            reverse("post:likes"), {"operations": operations}, format="json"
+        )
+        self.assertEqual(
+            response.json()["results"],
+            [
+                {"type": "post", "id": self.post.pk, "liked": True, "likes_count": 1},
+                {"type": "post", "id": self.other.pk, "liked": False, "likes_count": 0},
+                {"type": "comment", "id": self.comment.pk, "liked": True, "likes_count": 1},
+            ],
+        )
+
+
+class ShardedCounterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [
+            CustomUser.objects.create(username=f"user{i}", phone_number=f"02000000{i:02d}")
+            for i in range(5)
+        ]
+        for user in cls.users:
+            Profile.objects.create(user=user, about="")
+        cls.post = Post.objects.create(user=cls.users[0], text="hot")
+
+    @mock.patch("post.counters.POST_COUNTER_SHARDS", 3)
+    def test_likes_go_to_shards_until_flushed(self):
+        self.post.likes.add(*self.users)
+        self.post.likes.remove(self.users[0])
+        Post.objects.create(user=self.users[1], text="share", shared_from=self.post)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.shares_count), (0, 0))
+
+        client = APIClient()
+        client.force_authenticate(self.users[0])
+        response = client.post(reverse("post:posts-like", args=[self.post.pk]))
+        self.assertEqual(response.json()["likes_count"], 5)
+
+        self.assertEqual(counters.flush_counter_shards(), 1)
+        self.assertEqual(counters.flush_counter_shards(), 0)
+        self.post.refresh_from_db()
+        self.assertEqual((self.post.likes_count, self.post.shares_count), (5, 1))
+
+    @mock.patch("post.counters.POST_COUNTER_SHARDS", 3)
+    def test_pages_show_likes_still_in_shards(self):
+        share = Post.objects.create(user=self.users[1], text="share", shared_from=self.post)
+        client = APIClient()
+        client.force_authenticate(self.users[2])
+        client.post(reverse("post:posts-like", args=[self.post.pk]))
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.likes_count, 0)
+
+        rows = {
+            row["id"]: row for row in client.get(reverse("post:posts-list")).json()["results"]
+        }
+        self.assertEqual(
+            (rows[self.post.pk]["likes_count"], rows[self.post.pk]["shares_count"]), (1, 1)
+        )
+        self.assertEqual(rows[share.pk]["shared_from"]["likes_count"], 1)
+        detail = client.get(reverse("post:posts-detail", args=[self.post.pk])).json()
+        self.assertEqual(detail["likes_count"], 1)
+
+    @mock.patch("post.counters.POST_COUNTER_SHARDS", 3)
+    def test_flush_is_scheduled_once_per_interval(self):
+        cache.delete(counters.FLUSH_LOCK_KEY)
+        self.addCleanup(cache.delete, counters.FLUSH_LOCK_KEY)
+        with mock.patch("post.counters.executor") as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.post.likes.add(self.users[1])
+            with self.captureOnCommitCallbacks(execute=True):
+                self.post.likes.add(self.users[2])
+        executor.return_value.submit.assert_called_once_with(counters._flush_in_worker)
+
+
+class ImageVariantsTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        self.settings = override_settings(MEDIA_ROOT=self.media)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        self.user = CustomUser.objects.create(username="user", phone_number="0200000000")
+        Profile.objects.create(user=self.user, about="")
+
+    def upload(self):
+        buffer = BytesIO()
+        exif = Image.Exif()
+        exif[0x010F] = "camera"
+        Image.new("RGB", (2000, 1000), "red").save(buffer, "JPEG", exif=exif)
+        return SimpleUploadedFile("photo.jpg", buffer.getvalue(), "image/jpeg")
+
+    def test_variants_are_built_after_commit(self):
+        post = Post.objects.create(user=self.user, text="pictures")
+        with mock.patch("config.images.executor") as executor:
+            with self.captureOnCommitCallbacks(execute=True):
+                picture = PostPicture.objects.create(post=post, image=self.upload())
+        executor.return_value.submit.assert_called_once()
+
+        images.build(PostPicture, picture.pk, "image", "image_variants")
+        picture.refresh_from_db()
+        info = picture.image_variants
+        self.assertEqual((info["width"], info["height"]), (2000, 1000))
+        self.assertEqual(
+            {name: (v["width"], v["height"]) for name, v in info["variants"].items()},
+            {"thumbnail": (160, 80), "feed": (720, 360), "full": (1600, 800)},
+        )
+        with Image.open(f"{self.media}/{info['variants']['feed']['jpeg']}") as feed:
+            self.assertFalse(feed.getexif())
+        with Image.open(f"{self.media}/{info['variants']['thumbnail']['webp']}") as thumb:
+            self.assertEqual(thumb.format, "WEBP")
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        payload = client.get(reverse("post:posts-detail", args=[post.pk])).json()
+        variants = payload["pictures"][0]["image_variants"]
+        self.assertTrue(variants["thumbnail"]["webp"].endswith("photo_thumbnail.webp"))
+
+    def variant_files(self, info):
+        return [
+            f"{self.media}/{entry[extension]}"
+            for entry in info["variants"].values()
+            for extension in ("webp", "jpeg")
+        ]
+
+    def test_variants_go_with_their_image(self):
+        post = Post.objects.create(user=self.user, text="pictures")
+        with mock.patch("config.images.executor"):
+            picture = PostPicture.objects.create(post=post, image=self.upload())
+        images.build(PostPicture, picture.pk, "image", "image_variants")
+        picture.refresh_from_db()
+        first = self.variant_files(picture.image_variants)
+        self.assertTrue(all(os.path.exists(path) for path in first))
+
+        # replaced: the new variants are built, the old ones deleted
+        picture.image = self.upload()
+        with mock.patch("config.images.executor"):
+            picture.save()
+        images.build(PostPicture, picture.pk, "image", "image_variants")
+        picture.refresh_from_db()
+        second = self.variant_files(picture.image_variants)
+        self.assertFalse(any(os.path.exists(path) for path in first))
+        self.assertTrue(all(os.path.exists(path) for path in second))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            picture.delete()
+        self.assertFalse(any(os.path.exists(path) for path in second))
+
+
+@mock.patch("post.uploads.VIDEO_UPLOAD_CHUNK_SIZE", 4)
+class VideoUploadTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        self.settings = override_settings(MEDIA_ROOT=self.media)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        self.user = CustomUser.objects.create(username="user", phone_number="0200000000")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def put_chunk(self, upload, index, data, checksum=None):
+        return self.client.put(
+            reverse("post:post-video-uploads-chunk", args=[upload["id"], index]),
+            data,
+            content_type="application/octet-stream",
+            HTTP_X_CHECKSUM_SHA256=checksum or hashlib.sha256(data).hexdigest(),
+        )
+
+    def test_resumable_upload(self):
+        content = b"0123456789"
+        upload = self.client.post(
+            reverse("post:post-video-uploads-list"),
+            {"filename": "clip.mp4", "size": len(content)},
+            format="json",
+        ).json()
+        self.assertEqual(upload["chunk_size"], 4)
+
+        self.assertEqual(self.put_chunk(upload, 0, content[:4]).json()["offset"], 4)
+        self.assertEqual(self.put_chunk(upload, 0, content[:4]).json()["offset"], 4)
+        self.assertEqual(self.put_chunk(upload, 2, content[8:]).status_code, 409)
+        self.assertEqual(self.put_chunk(upload, 1, content[4:8], "0" * 64).status_code, 400)
+
+        detail = reverse("post:post-video-uploads-detail", args=[upload["id"]])
+        self.assertEqual(self.client.get(detail).json()["next_chunk"], 1)
+        finalize = reverse("post:post-video-uploads-finalize", args=[upload["id"]])
+        self.assertEqual(self.client.post(finalize).status_code, 409)
+
+        self.put_chunk(upload, 1, content[4:8])
+        self.put_chunk(upload, 2, content[8:])
+        post = Post.objects.create(user=self.user, text="video")
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(finalize, {"post": post.pk}, format="json")
+        self.assertEqual(response.status_code, 201)
+        video = PostVideo.objects.get(pk=response.json()["id"])
+        self.assertEqual(video.post, post)
+        with video.video.open("rb") as stored:
+            self.assertEqual(stored.read(), content)
+        self.assertEqual(self.client.get(detail).status_code, 404)
+        self.assertEqual(os.listdir(os.path.join(self.media, "video_uploads")), [])
+
+    def start(self, content):
+        upload = self.client.post(
+            reverse("post:post-video-uploads-list"),
+            {"filename": "clip.mp4", "size": len(content)},
+            format="json",
+        ).json()
+        size = upload["chunk_size"]
+        for index in range(0, len(content), size):
+            self.put_chunk(upload, index // size, content[index:index + size])
+        return upload
+
+    def test_finalize_links_the_part_file(self):
+        upload = self.start(b"0123456789")
+        part = os.stat(os.path.join(self.media, "video_uploads", f"{upload['id']}.part"))
+        finalize = reverse("post:post-video-uploads-finalize", args=[upload["id"]])
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(finalize)
+        video = PostVideo.objects.get(pk=response.json()["id"])
+        self.assertEqual(os.stat(video.video.path).st_ino, part.st_ino)
+
+    def test_expired_uploads_are_purged(self):
+        expired = self.start(b"0123456789")
+        VideoUpload.objects.filter(pk=expired["id"]).update(
+            date_created=timezone.now() - timedelta(seconds=uploads.VIDEO_UPLOAD_EXPIRY + 1)
+        )
+        detail = reverse("post:post-video-uploads-detail", args=[expired["id"]])
+        self.assertEqual(self.client.get(detail).status_code, 404)
+        parts = os.path.join(self.media, "video_uploads")
+        stale = time.time() - uploads.VIDEO_UPLOAD_EXPIRY - 1
+        os.utime(os.path.join(parts, f"{expired['id']}.part"), (stale, stale))
+        with open(os.path.join(parts, "orphan.part"), "wb"):
+            pass
+        os.utime(os.path.join(parts, "orphan.part"), (stale, stale))
+        going = self.start(b"01234")
+
+        call_command("purge_video_uploads", stdout=StringIO())
+        self.assertEqual(
+            [str(pk) for pk in VideoUpload.objects.values_list("pk", flat=True)], [going["id"]]
+        )
+        self.assertEqual(os.listdir(parts), [f"{going['id']}.part"])
+
+
+class VideoMetadataTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        self.settings = override_settings(MEDIA_ROOT=self.media)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        user = CustomUser.objects.create(username="user", phone_number="0200000000")
+        self.post = Post.objects.create(user=user, text="video")
+        self.video = PostVideo.objects.create(
+            post=self.post, video=SimpleUploadedFile("clip.mp4", b"video")
+        )
+
+    def test_skipped_without_ffprobe(self):
+        with mock.patch("config.ffmpeg.shutil.which", return_value=None):
+            self.assertFalse(video_metadata.schedule(self.video))
+
+    def test_probe_results_are_stored(self):
+        probed = mock.Mock(
+            stdout=b'{"streams": [{"codec_name": "h264", "width": 1280, "height": 720}],'
+            b' "format": {"duration": "12.345"}}'
+        )
+        with mock.patch("config.ffmpeg.subprocess.run", return_value=probed) as run:
+            info = ffmpeg.analyse(self.video.video.path, "ffprobe")
+        self.assertEqual(run.call_args.args[0][0], "ffprobe")
+        info["poster"] = b"jpeg"
+
+        video_metadata.store(self.video.pk, info)
+        self.video.refresh_from_db()
+        self.assertEqual(
+            (self.video.width, self.video.height, self.video.codec, str(self.video.duration)),
+            (1280, 720, "h264", "12.35"),
+        )
+        self.assertEqual(self.video.thumbnail.read(), b"jpeg")
+        self.assertIsNotNone(self.video.probed_at)
+
+    def test_probe_videos_reports_finished_probes(self):
+        results = [{"codec": "h264"}, {"codec": ""}, RuntimeError("unreadable")]
+        streamless = PostVideo.objects.create(video=SimpleUploadedFile("audio.mp4", b"audio"))
+        broken = PostVideo.objects.create(video=SimpleUploadedFile("broken.mp4", b"?"))
+        futures = []
+        for result in results:
+            future = Future()
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+            futures.append(future)
+
+        def schedule(video):
+            future = futures.pop(0)
+            if future.exception() is None:
+                video_metadata.store(video.pk, future.result())
+            return future
+
+        out = StringIO()
+        with mock.patch("config.ffmpeg.shutil.which", return_value="/usr/bin/ffprobe"), \
+                mock.patch.object(video_metadata, "schedule", side_effect=schedule), \
+                mock.patch.object(video_metadata, "executor"):
+            call_command("probe_videos", stdout=out, stderr=StringIO())
+        self.assertIn("2 videos probed, 1 without a video stream", out.getvalue())
+        self.assertIn("1 videos could not be probed", out.getvalue())
+
+        # only the failed probe is tried again
+        self.assertEqual(list(PostVideo.objects.filter(probed_at__isnull=True)), [broken])
+        streamless.refresh_from_db()
+        self.assertEqual(streamless.codec, "")
+
+
+class PostAttachmentsTest(TestCase):
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+        self.settings = override_settings(MEDIA_ROOT=self.media)
+        self.settings.enable()
+        self.addCleanup(self.settings.disable)
+        self.user, self.other = [
+            CustomUser.objects.create(username=name, phone_number=f"020000000{i}")
+            for i, name in enumerate(("user", "other"))
+        ]
+        Profile.objects.create(user=self.user, about="")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.mine = PostVideo.objects.create(user=self.user, video="post_videos/mine.mp4")
+        self.theirs = PostVideo.objects.create(user=self.other, video="post_videos/theirs.mp4")
+
+    def pictures(self, count):
+        return [
+            SimpleUploadedFile(f"picture{i}.jpg", b"picture %d" % i, "image/jpeg")
+            for i in range(count)
+        ]
+
+    def create(self, videos):
+        return self.client.post(
+            reverse("post:posts-list"),
+            {
+                "text": "album",
+                "post_type": Post.PostType.visual_post,
+                "pictures": self.pictures(3),
+                "videos": videos,
+            },
+            format="multipart",
+        )
+
+    def test_pictures_and_videos_are_attached_together(self):
+        response = self.create([self.mine.pk])
+        self.assertEqual(response.status_code, 201)
+        post = Post.objects.get(pk=response.json()["id"])
+        self.assertEqual(post.pictures.count(), 3)
+        self.assertEqual(list(post.videos.all()), [self.mine])
+
+    def test_videos_of_others_are_refused(self):
+        response = self.create([self.mine.pk, self.theirs.pk])
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Post.objects.exists())
+        self.assertFalse(os.path.exists(os.path.join(self.media, "post_pictures")))
+
+    def test_moving_a_video_touches_the_post_it_leaves(self):
+        old = Post.objects.create(user=self.user, text="old", post_type=Post.PostType.post_video)
+        PostVideo.objects.filter(pk=self.mine.pk).update(post=old)
+        Post.objects.filter(pk=old.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        updated_at = Post.objects.get(pk=old.pk).updated_at
+
+        self.assertEqual(self.create([self.mine.pk]).status_code, 201)
+        old.refresh_from_db()
+        self.assertGreater(old.updated_at, updated_at)
+        self.assertFalse(old.videos.exists())
+
+
+class PostListingIndexTest(TestCase):
+    """
+    The listing queries must walk an index in the page order, no full scan
+    and no sort of the whole table.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = CustomUser.objects.create(username="user", phone_number="0200000000")
+        Profile.objects.create(user=cls.user, about="")
+        cls.group = Group.objects.create(name="group", admin=cls.user)
+        for i in range(30):
+            Post.objects.create(user=cls.user, group=cls.group, text=f"post {i}")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def plan_of_page_query(self, params):
+        with CaptureQueriesContext(connection) as queries:
+            first = self.client.get(reverse("post:posts-list"), {"page_size": 10, **params})
+            self.client.get(first.json()["next"])
+        sql = next(
+            query["sql"]
+            for query in reversed(queries.captured_queries)
+            if query["sql"].startswith("SELECT") and 'FROM "post_post"' in query["sql"]
+            and "ORDER BY" in query["sql"]
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+            return " ".join(str(row[-1]) for row in cursor.fetchall())
+
+    @skipUnlessDBFeature("supports_explaining_query_execution")
+    def test_listings_use_the_composite_indexes(self):
+        if connection.vendor != "sqlite":
+            self.skipTest("plans are checked on SQLite")
+        for params, index in (
+            ({}, "post_date_idx"),
+            ({"user": self.user.pk}, "post_user_date_idx"),
+            ({"group": self.group.pk}, "post_group_date_idx"),
+            ({"post_type": Post.PostType.text_post}, "post_type_date_idx"),
+        ):
+            plan = self.plan_of_page_query(params)
+            self.assertIn(f"USING INDEX {index}", plan)
+            self.assertNotIn("TEMP B-TREE", plan)
+
+    def test_date_range_filter(self):
+        posts = list(Post.objects.order_by("date_created", "id"))
+        response = self.client.get(
+            reverse("post:posts-list"),
+            {
+                "since": posts[10].date_created.isoformat(),
+                "until": posts[20].date_created.isoformat(),
+                "page_size": 100,
+            },
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            {post["id"] for post in response.json()["results"]},
+            {post.pk for post in posts if posts[10].date_created <= post.date_created < posts[20].date_created},
+        )
+
+
+class AnnouncementInboxTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = []
+        for i in range(4):
+            user = CustomUser.objects.create(username=f"user{i}", phone_number=f"02000000{i:02d}")
+            Profile.objects.create(user=user, about="")
+            cls.users.append(user)
+        first = Group.objects.create(name="first", admin=cls.users[0])
+        first.members.add(cls.users[0], cls.users[1], cls.users[2])
+        second = Group.objects.create(name="second", admin=cls.users[0])
+        second.members.add(cls.users[1], cls.users[2])
+        community = Community.objects.create(name="community", admin=cls.users[0])
+        community.groups.add(first, second)
+        cls.announcement = Announcement.objects.create(name="Announcements", community=community)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[1])
+
+    def announce(self, text):
+        return Post.objects.create(user=self.users[0], announcement=self.announcement, text=text)
+
+    def test_members_of_every_group_get_it_once(self):
+        post = self.announce("hello")
+        self.assertEqual(
+            sorted(AnnouncementDelivery.objects.filter(post=post).values_list("owner_id", flat=True)),
+            [self.users[1].pk, self.users[2].pk],
+        )
+
+    def test_delivery_is_batched(self):
+        with mock.patch.object(announcements, "ANNOUNCEMENT_BATCH_SIZE", 1):
+            # the post, the member query, then one INSERT per member
+            with self.assertNumQueries(4):
+                self.announce("hello")
+
+    def test_unread_and_mark_read(self):
+        posts = [self.announce(f"news {i}") for i in range(3)]
+        url = reverse("post:unread-announcements")
+        response = self.client.get(url, {"page_size": 2}).json()
+        self.assertEqual([post["id"] for post in response["results"]], [posts[2].pk, posts[1].pk])
+        self.assertEqual(
+            [post["id"] for post in self.client.get(response["next"]).json()["results"]],
+            [posts[0].pk],
+        )
+
+        self.assertEqual(self.client.post(url, {"posts": [posts[2].pk]}, format="json").status_code, 204)
+        unread = self.client.get(url).json()["results"]
+        self.assertEqual([post["id"] for post in unread], [posts[1].pk, posts[0].pk])
+
+        self.client.post(url, {}, format="json")
+        self.assertEqual(self.client.get(url).json()["results"], [])
+        # other members keep theirs
+        self.assertEqual(announcements.unread(self.users[2]).count(), 3)
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = []
+        for i in range(2):
+            user = CustomUser.objects.create(username=f"user{i}", phone_number=f"02000000{i:02d}")
+            Profile.objects.create(user=user, about="")
+            cls.users.append(user)
+        cls.posts = [Post.objects.create(user=cls.users[1], text=f"post {i}") for i in range(5)]
+        for post in cls.posts:
+            PostPicture.objects.create(post=post, image="post_pictures/a.jpg")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+        self.url = reverse("post:posts-list")
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_unchanged_page_is_not_sent_again(self):
+        first = self.client.get(self.url)
+        self.assertIn("private", first["Cache-Control"])
+        self.assertNotIn("no-store", first["Cache-Control"])
+        # the page and the viewer state, nothing is rendered
+        with self.assertNumQueries(4):
+            second = self.revalidate(self.url, first["ETag"])
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.content, b"")
+        self.assertEqual(second["ETag"], first["ETag"])
+
+    def test_posts_are_json_only(self):
+        response = self.client.get(self.url, HTTP_ACCEPT="text/html,*/*;q=0.8")
+        self.assertEqual(response["Content-Type"], "application/json; charset=utf-8")
+
+    def test_changes_give_a_new_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        changes = (
+            lambda: self.posts[0].likes.add(self.users[0]),
+            lambda: UserFollowship.objects.create(user=self.users[1], follower=self.users[0]),
+            lambda: Post.objects.filter(pk=self.posts[1].pk).touch(),
+            lambda: Profile.objects.filter(user=self.users[1]).update(about="", profile_picture="a.jpg"),
+        )
+        for change in changes:
+            change()
+            response = self.revalidate(self.url, etag)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response["ETag"], etag)
+            etag = response["ETag"]
+
+    def test_detail_and_viewers(self):
+        url = reverse("post:posts-detail", args=[self.posts[0].pk])
+        etag = self.client.get(url)["ETag"]
+        self.assertEqual(self.revalidate(url, etag).status_code, 304)
+        self.client.force_authenticate(self.users[1])
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    def test_writes_are_not_cached(self):
+        response = self.client.post(reverse("post:likes"), {"operations": []}, format="json")
+        self.assertIn("no-store", response["Cache-Control"])
+
+
+class SparseFieldsetsTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = []
+        for i in range(2):
+            user = CustomUser.objects.create(username=f"user{i}", phone_number=f"02000000{i:02d}")
+            Profile.objects.create(user=user, about="")
+            cls.users.append(user)
+        cls.original = Post.objects.create(user=cls.users[1], text="original")
+        for i in range(10):
+            post = Post.objects.create(
+                user=cls.users[i % 2], text=f"post {i}", shared_from=cls.original if i % 2 else None
+            )
+            PostPicture.objects.create(post=post, image="post_pictures/a.jpg")
+        cls.original.likes.add(cls.users[0])
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.users[0])
+        self.url = reverse("post:posts-list")
+
+    def test_only_ids_and_text(self):
+        # the page query alone, no media, viewer state or shared posts
+        with self.assertNumQueries(1):
+            results = self.client.get(self.url, {"fields": "id,text"}).json()["results"]
+        self.assertEqual(len(results), 11)
+        self.assertEqual({tuple(post) for post in results}, {("id", "text")})
+
+    def test_nested_fields(self):
+        # the page, the viewer's likes
+        with self.assertNumQueries(2):
+            results = self.client.get(
+                self.url, {"fields": "id,user_account.username,shared_from.liked"}
+            ).json()["results"]
+        shared = next(post for post in results if post["shared_from"])
+        self.assertEqual(shared["user_account"], {"username": "user1"})
+        self.assertEqual(shared["shared_from"], {"liked": True})
+
+    def test_render_cache_keeps_fieldsets_apart(self):
+        full = self.client.get(self.url).json()["results"]
+        sparse = self.client.get(self.url, {"fields": "id,likes_count"}).json()["results"]
+        self.assertEqual(sparse, [{"id": post["id"], "likes_count": post["likes_count"]} for post in full])
+        self.assertEqual(self.client.get(self.url).json()["results"], full)
+
+    def test_detail(self):
+        response = self.client.get(
+            reverse("post:posts-detail", args=[self.original.pk]), {"fields": "id,liked,pictures.id"}
+        )
+        self.assertEqual(response.json(), {"id": self.original.pk, "liked": True, "pictures": []})
@@ -0,0 +1,176 @@
+import heapq
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Q
+
+from accounts.models import UserFollowship
+from config.pagination import KeysetPagination
+
+from .models import FanoutOnReadAuthor, Post, TimelineEntry
+
+logger = logging.getLogger(__name__)
+
+# authors with more followers than this are served with fan-out-on-read
+FEED_FANOUT_LIMIT = getattr(settings, "FEED_FANOUT_LIMIT", 10000)
+# posts copied into a timeline when its owner follows someone
+FEED_BACKFILL_SIZE = getattr(settings, "FEED_BACKFILL_SIZE", 100)
+FEED_BATCH_SIZE = 1000
+# threads copying new posts into the timelines of followers
+FEED_FANOUT_WORKERS = getattr(settings, "FEED_FANOUT_WORKERS", 2)
+
+_executor = None
+
+
+def executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=FEED_FANOUT_WORKERS, thread_name_prefix="timeline-fan-out"
+        )
+    return _executor
+
+
+def timeline_posts():
+    """ posts that belong in home timelines, group and announcement posts have their own feeds """
+    return Post.objects.filter(group__isnull=True, announcement__isnull=True)
+
+
+def _write_entries(post_rows, owner_ids):
+    """ insert ```(post_id, date_created)``` rows into the timelines of ```owner_ids``` """
+    owner_ids = iter(owner_ids)
+    while batch := list(islice(owner_ids, FEED_BATCH_SIZE)):
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(owner_id=owner_id, post_id=post_id, date_created=date)
+                for owner_id in batch
+                for post_id, date in post_rows
+            ],
+            ignore_conflicts=True,
+        )
+
+
+def is_fanout_on_read(author_id) -> bool:
+    return FanoutOnReadAuthor.objects.filter(user_id=author_id).exists()
+
+
+def fan_out(post: Post):
+    """
+    Copy a new post into the timeline of its author right away, and into
+    the ones of their followers in the worker pool once the current
+    transaction commits.
+    """
+    if post.group_id or post.announcement_id:
+        return
+    rows = [(post.pk, post.date_created)]
+    _write_entries(rows, [post.user_id])
+    transaction.on_commit(
+        lambda: executor().submit(_fan_out_in_worker, post.user_id, rows)
+    )
+
+
+def fan_out_to_followers(author_id, rows):
+    """
+    Copy ```rows``` into the timelines of the followers of ```author_id```.
+
+    Authors crossing ```FEED_FANOUT_LIMIT``` followers switch to
+    fan-out-on-read for good, their posts only land in their own timeline.
+    """
+    if is_fanout_on_read(author_id):
+        return
+    # one more than the limit tells whether it is crossed
+    follower_ids = list(
+        UserFollowship.objects.filter(
+            user_id=author_id, deleted=False, follower__isnull=False
+        )
+        .exclude(follower_id=author_id)
+        .order_by()
+        .values_list("follower_id", flat=True)[: FEED_FANOUT_LIMIT + 1]
+    )
+    if len(follower_ids) > FEED_FANOUT_LIMIT:
+        FanoutOnReadAuthor.objects.get_or_create(user_id=author_id)
+        return
+    _write_entries(rows, follower_ids)
+
+
+def _fan_out_in_worker(author_id, rows):
+    try:
+        fan_out_to_followers(author_id, rows)
+    except Exception:
+        logger.exception("could not fan out the posts %r", [pk for pk, _ in rows])
+    finally:
+        connections.close_all()
+
+
+def backfill(follower_id, author_id):
+    """ copy the latest posts of a newly followed author into the follower's timeline """
+    if follower_id != author_id and is_fanout_on_read(author_id):
+        return
+    rows = list(
+        timeline_posts()
+        .filter(user_id=author_id)
+        .order_by("-date_created", "-id")
+        .values_list("id", "date_created")[:FEED_BACKFILL_SIZE]
+    )
+    _write_entries(rows, [follower_id])
+
+
+def unfollow(follower_id, author_id):
+    TimelineEntry.objects.filter(owner_id=follower_id, post__user_id=author_id).delete()
+
+
+class TimelinePagination(KeysetPagination):
+    """
+    Pages the home timeline of a user on ```(date_created, id)```.
+
+    The materialized entries and the posts of followed fan-out-on-read
+    authors are each read with an index range scan from the cursor, then
+    merged, so every page costs the same whatever the size of the timeline.
+    """
+
+    def paginate_timeline(self, user, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.limit = self.get_page_size(request)
+        self.key, self.id_field = "date_created", "id"
+        self.key_field = Post._meta.get_field("date_created")
+        cursor = self.decode_cursor(request)
+
+        entries = TimelineEntry.objects.filter(owner=user).order_by(
+            "-date_created", "-post_id"
+        )
+        if cursor is not None:
+            entries = entries.filter(
+                Q(date_created__lt=cursor["key"])
+                | Q(date_created=cursor["key"], post_id__lt=cursor["id"])
+            )
+        sources = [entries.values_list("date_created", "post_id")[: self.limit + 1]]
+
+        pulled_authors = FanoutOnReadAuthor.objects.filter(
+            user__followers__follower=user, user__followers__deleted=False
+        ).values("user_id")
+        pulled = timeline_posts().filter(user_id__in=pulled_authors).order_by(
+            "-date_created", "-id"
+        )
+        if cursor is not None:
+            pulled = pulled.filter(
+                Q(date_created__lt=cursor["key"])
+                | Q(date_created=cursor["key"], id__lt=cursor["id"])
+            )
+        sources.append(pulled.values_list("date_created", "id")[: self.limit + 1])
+
+        keys, seen = [], set()
+        for date, post_id in heapq.merge(*map(list, sources), reverse=True):
+            if post_id not in seen:
+                seen.add(post_id)
+                keys.append(post_id)
+        self.has_next = len(keys) > self.limit
+        self.has_previous = False
+        keys = keys[: self.limit]
+
+        posts = {post.pk: post for post in queryset.filter(id__in=keys)}
+        self.page = [posts[pk] for pk in keys if pk in posts]
+        return self.page
@@ -0,0 +1,176 @@
+import hashlib
+import os
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import PostVideo, VideoUpload
+
+VIDEO_UPLOAD_CHUNK_SIZE = getattr(settings, "VIDEO_UPLOAD_CHUNK_SIZE", 5 * 1024 * 1024)
+VIDEO_UPLOAD_MAX_SIZE = getattr(settings, "VIDEO_UPLOAD_MAX_SIZE", 2 * 1024 ** 3)
+# seconds an upload has to be finalized in, then it is gone with its bytes
+VIDEO_UPLOAD_EXPIRY = getattr(settings, "VIDEO_UPLOAD_EXPIRY", 24 * 60 * 60)
+# block size used to stream a chunk from the request to disk
+STREAM_BLOCK_SIZE = 64 * 1024
+
+
+class UploadConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _("The upload is not at this offset.")
+    default_code = "upload_conflict"
+
+
+class PartFile(File):
+    """
+    The assembled part file, storages move or link a file with a
+    ```temporary_file_path()``` into place instead of copying its bytes.
+    """
+
+    def temporary_file_path(self) -> str:
+        return self.file.name
+
+
+def part_directory() -> str:
+    return os.path.join(settings.MEDIA_ROOT, "video_uploads")
+
+
+def part_path(upload: VideoUpload) -> str:
+    """ where the bytes received so far are kept until the upload is finalized """
+    return os.path.join(part_directory(), f"{upload.pk}.part")
+
+
+def expires_at(upload: VideoUpload):
+    return upload.date_created + timedelta(seconds=VIDEO_UPLOAD_EXPIRY)
+
+
+def _cutoff():
+    return timezone.now() - timedelta(seconds=VIDEO_UPLOAD_EXPIRY)
+
+
+def active(queryset):
+    """ the uploads of ```queryset``` not expired yet """
+    return queryset.filter(date_created__gte=_cutoff())
+
+
+def start(user, filename: str, size: int) -> VideoUpload:
+    if size > VIDEO_UPLOAD_MAX_SIZE:
+        raise ValidationError({"size": _("The video is too large.")})
+    return VideoUpload.objects.create(
+        user=user, filename=filename, size=size, chunk_size=VIDEO_UPLOAD_CHUNK_SIZE
+    )
+
+
+def chunk_count(upload: VideoUpload) -> int:
+    return -(-upload.size // upload.chunk_size)
+
+
+def write_chunk(upload: VideoUpload, index: int, stream, length: int, checksum: str) -> int:
+    """
+    Stream chunk ```index``` (```length``` bytes of ```stream```) into the
+    part file and return the new offset.
+
+    The chunk must be the next one expected, a chunk received already is
+    acknowledged without being written again so a retry after a lost
+    response is harmless. ```checksum``` is the hex SHA-256 of the chunk,
+    on a mismatch nothing is kept and the client sends the chunk again.
+    """
+    begin = index * upload.chunk_size
+    if begin < upload.offset:
+        return upload.offset
+    if begin > upload.offset or index >= chunk_count(upload):
+        raise UploadConflict()
+    expected = min(upload.chunk_size, upload.size - begin)
+    if length != expected:
+        raise ValidationError(
+            _("Chunk %(index)s must be %(expected)s bytes long.")
+            % {"index": index, "expected": expected}
+        )
+    if stream is None:
+        raise ValidationError(_("The chunk is empty."))
+
+    path = part_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    digest = hashlib.sha256()
+    with open(path, "r+b" if os.path.exists(path) else "wb") as part:
+        part.seek(begin)
+        remaining = length
+        while remaining:
+            block = stream.read(min(STREAM_BLOCK_SIZE, remaining))
+            if not block:
+                break
+            digest.update(block)
+            part.write(block)
+            remaining -= len(block)
+        part.truncate(begin + length - remaining)
+        if remaining or digest.hexdigest() != (checksum or "").lower():
+            part.truncate(begin)
+            raise ValidationError(_("The chunk does not match its checksum."))
+
+    # a concurrent request may have written the same chunk meanwhile
+    moved = VideoUpload.objects.filter(pk=upload.pk, offset=begin).update(
+        offset=begin + length
+    )
+    if not moved:
+        raise UploadConflict()
+    upload.offset = begin + length
+    return upload.offset
+
+
+def finalize(upload: VideoUpload, **fields) -> PostVideo:
+    """ store the assembled file as a ```PostVideo``` with ```fields``` and end the upload """
+    if upload.offset != upload.size:
+        raise UploadConflict(_("The upload is not complete."))
+    path = part_path(upload)
+    with transaction.atomic():
+        video = PostVideo(**fields)
+        with open(path, "rb") as part:
+            video.video.save(os.path.basename(upload.filename), PartFile(part), save=False)
+        video.save()
+        upload.delete()
+    # the storage moved or linked the part file, what is left of it goes
+    transaction.on_commit(lambda: discard(path))
+    return video
+
+
+def abort(upload: VideoUpload):
+    path = part_path(upload)
+    upload.delete()
+    discard(path)
+
+
+def discard(path: str):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def purge_expired() -> int:
+    """
+    Delete the expired uploads and every part file untouched for as long,
+    those of expired uploads and those left behind. Returns the number of
+    uploads deleted.
+    """
+    deleted, _ = VideoUpload.objects.filter(date_created__lt=_cutoff()).delete()
+    # a part file is written after its upload was created, so one older
+    # than the expiry is never the part of an upload still going
+    stale = time.time() - VIDEO_UPLOAD_EXPIRY
+    try:
+        names = os.listdir(part_directory())
+    except FileNotFoundError:
+        names = []
+    for name in names:
+        path = os.path.join(part_directory(), name)
+        try:
+            if os.stat(path).st_mtime < stale:
+                discard(path)
+        except FileNotFoundError:
+            pass
+    return deleted
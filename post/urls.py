@@ -10,7 +10,15 @@ router.register("posts", views.PostViewSet, basename="posts")
 router.register("posts-pics", views.PostPictureViewSet, basename="post-pics")
 router.register("post-comments", views.PostCommentViewSet, basename="posts-comments")
 router.register("post-video", views.PostVideoViewset, basename="post-video")
+router.register("post-video-uploads", views.VideoUploadViewSet, basename="post-video-uploads")
 
 urlpatterns = [
     path("", include(router.urls)),
+    path("feed/", views.FeedView.as_view(), name="feed"),
+    path("likes/", views.LikesView.as_view(), name="likes"),
+    path(
+        "announcements/unread/",
+        views.UnreadAnnouncementsView.as_view(),
+        name="unread-announcements",
+    ),
 ]
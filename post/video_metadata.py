@@ -0,0 +1,85 @@
+import logging
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from decimal import Decimal
+from functools import partial
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections
+from django.utils import timezone
+
+from config import ffmpeg
+
+from .models import Post, PostVideo
+
+logger = logging.getLogger(__name__)
+
+# worker processes running ffprobe / ffmpeg
+VIDEO_PROBE_WORKERS = getattr(settings, "VIDEO_PROBE_WORKERS", 2)
+FFPROBE_BINARY = getattr(settings, "FFPROBE_BINARY", "ffprobe")
+FFMPEG_BINARY = getattr(settings, "FFMPEG_BINARY", "ffmpeg")
+
+_executor = None
+
+
+def executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=VIDEO_PROBE_WORKERS)
+    return _executor
+
+
+def store(pk, info: dict):
+    """
+    Save what ```config.ffmpeg.analyse``` found about a video. The poster
+    frame only becomes the thumbnail when the uploader did not send one.
+    """
+    video = PostVideo.objects.filter(pk=pk).first()
+    if video is None:
+        return
+    fields = {
+        "width": info.get("width"),
+        "height": info.get("height"),
+        "codec": info.get("codec") or "",
+        "probed_at": timezone.now(),
+    }
+    if info.get("duration") is not None:
+        fields["duration"] = Decimal(f"{info['duration']:.2f}")
+    if info.get("poster") and not video.thumbnail:
+        stem = os.path.splitext(os.path.basename(video.video.name))[0]
+        video.thumbnail.save(f"{stem}.jpg", ContentFile(info["poster"]), save=False)
+        fields["thumbnail"] = video.thumbnail.name
+    PostVideo.objects.filter(pk=pk).update(**fields)
+    if video.post_id:
+        Post.objects.filter(pk=video.post_id).touch()
+
+
+def _analysed(pk, future):
+    try:
+        store(pk, future.result())
+    except Exception:
+        logger.exception("could not read the metadata of video %s", pk)
+    finally:
+        connections.close_all()
+
+
+def schedule(video: PostVideo) -> Future | None:
+    """
+    Read the duration, resolution and codec of ```video``` and grab a poster
+    frame in the worker processes, returns the future of the probe. Does
+    nothing, and returns ```None```, without ffprobe or when the storage has
+    no local paths.
+    """
+    probe_binary, ffmpeg_binary = ffmpeg.binaries(FFPROBE_BINARY, FFMPEG_BINARY)
+    if not probe_binary or not video.video:
+        return None
+    try:
+        path = video.video.path
+    except NotImplementedError:
+        return None
+    future = executor().submit(
+        ffmpeg.analyse, path, probe_binary, ffmpeg_binary, not video.thumbnail
+    )
+    future.add_done_callback(partial(_analysed, video.pk))
+    return future
@@ -0,0 +1,93 @@
+from abc import ABC, abstractmethod
+
+from accounts.models import UserFollowship
+
+from .models import SHARED_FROM_DEPTH, Post, PostComment, shared_chain
+
+
+class ViewerState(ABC):
+    """
+    Per-viewer flags (```liked```, ```shared```, ...) of a page of objects.
+
+    Every flag is resolved for the whole page with a single query, rows then
+    read them from memory through ```has```.
+    """
+
+    # names of the flags ```resolve``` looks up
+    flags = ()
+
+    def __init__(self, user, instances, flags=None):
+        instances = self.expand(list(instances))
+        self.ids = {instance.pk for instance in instances}
+        # only the flags rendered are looked up, all of them by default
+        self.wanted = set(self.flags if flags is None else flags)
+        self.values: dict[str, set] = {}
+        if user is not None and user.is_authenticated and self.ids and self.wanted:
+            self.values = self.resolve(user, instances)
+
+    def wants(self, flag: str) -> bool:
+        return flag in self.wanted
+
+    def expand(self, instances: list) -> list:
+        """ objects rendered along with the page that share its state """
+        return instances
+
+    @abstractmethod
+    def resolve(self, user, instances) -> dict[str, set]:
+        """ the ids of ```instances``` each wanted flag holds for, by flag """
+
+    def covers(self, instance) -> bool:
+        return instance.pk in self.ids
+
+    def has(self, flag: str, instance) -> bool:
+        return instance.pk in self.values.get(flag, ())
+
+
+class PostViewerState(ViewerState):
+    flags = ("liked", "shared", "following_user")
+
+    def expand(self, instances: list[Post]):
+        return instances + [
+            shared
+            for post in instances
+            for shared in shared_chain(post, SHARED_FROM_DEPTH)
+        ]
+
+    def resolve(self, user, instances: list[Post]):
+        values = {}
+        if self.wants("liked"):
+            values["liked"] = set(
+                Post.likes.through.objects.filter(
+                    customuser_id=user.pk, post_id__in=self.ids
+                ).values_list("post_id", flat=True)
+            )
+        if self.wants("shared"):
+            values["shared"] = set(
+                Post.objects.filter(
+                    user_id=user.pk, shared_from_id__in=self.ids
+                ).order_by().values_list("shared_from_id", flat=True)
+            )
+        if self.wants("following_user"):
+            followed_authors = set(
+                UserFollowship.objects.filter(
+                    follower_id=user.pk,
+                    user_id__in={post.user_id for post in instances},
+                    deleted=False,
+                ).order_by().values_list("user_id", flat=True)
+            )
+            values["following_user"] = {
+                post.pk for post in instances if post.user_id in followed_authors
+            }
+        return values
+
+
+class PostCommentViewerState(ViewerState):
+    flags = ("liked",)
+
+    def resolve(self, user, instances: list[PostComment]):
+        liked = set(
+            PostComment.likes.through.objects.filter(
+                customuser_id=user.pk, postcomment_id__in=self.ids
+            ).values_list("postcomment_id", flat=True)
+        )
+        return {"liked": liked}
@@ -1,10 +1,14 @@
 from rest_framework.viewsets import ModelViewSet
+from rest_framework.generics import GenericAPIView
 
 from .models import (
     PostComment,
     PostPicture,
     Post, 
     PostVideo, 
+    HiddenComment,
+    MutedCommenter,
+    VideoUpload,
 )
 from django.http.request import HttpRequest
 from .serializers import (
@@ -16,9 +20,16 @@ from .serializers import (
     PostVideoSerializer,
     PostVideoCreateSerializer,
     DeletePostVideoSerializer, 
+    BulkLikeSerializer,
+    LikeStateSerializer,
+    VideoUploadSerializer,
+    VideoUploadFinalizeSerializer,
+    AnnouncementReadSerializer,
 )
 from django.db.models.query import QuerySet
-from rest_framework.parsers import MultiPartParser, FormParser, JSONParser
+from rest_framework.parsers import MultiPartParser, FormParser
+from config.parsers import JSONParser
+from config.renderers import JSONRenderer
 from rest_framework.permissions import (
     IsAuthenticatedOrReadOnly,
     IsAuthenticated,
@@ -26,8 +37,18 @@ from rest_framework.permissions import (
 from rest_framework.decorators import action
 from django.shortcuts import get_object_or_404
 from rest_framework.response import Response
-from django.db.models import Q
-from rest_framework import filters, renderers
+from rest_framework import filters
+from config.conditional import ConditionalGetMixin
+from config.pagination import KeysetPagination
+from .discovery import VideoDiscoveryPagination
+from .timeline import TimelinePagination
+from .search import PostSearchFilter, search
+from . import announcements, attachments, likes, render_cache, uploads
+from django.db import transaction
+from rest_framework import mixins
+from rest_framework.viewsets import GenericViewSet
+from drf_spectacular.utils import extend_schema
+from rest_framework.exceptions import NotFound
 from django_filters.rest_framework import DjangoFilterBackend
 from django_filters import rest_framework as djangofilters 
 import logging
@@ -39,11 +60,14 @@ logger = logging.getLogger(__name__)
 class PostFilter(djangofilters.FilterSet):
     """
     This filter section to filter post based on ```year```, ```month``` and or ```day```
-    in which the post was created.
+    in which the post was created, or on a ```since``` / ```until``` date range
+    (```since``` included, ```until``` excluded).
     """
-    year = djangofilters.NumberFilter(field_name="published_at__year")
-    month = djangofilters.NumberFilter(field_name="published_at__month")
-    day = djangofilters.NumberFilter(field_name="published_at__day")
+    year = djangofilters.NumberFilter(field_name="date_created__year")
+    month = djangofilters.NumberFilter(field_name="date_created__month")
+    day = djangofilters.NumberFilter(field_name="date_created__day")
+    since = djangofilters.IsoDateTimeFilter(field_name="date_created", lookup_expr="gte")
+    until = djangofilters.IsoDateTimeFilter(field_name="date_created", lookup_expr="lt")
 
     class Meta:
         model = Post
@@ -56,6 +80,21 @@ class PostFilter(djangofilters.FilterSet):
         )
 
 
+def like_response(model, request: HttpRequest, pk, liked: bool) -> Response:
+    try:
+        pk = int(pk)
+    except ValueError:
+        raise NotFound()
+    state = likes.toggle(model, request.user, pk, liked)
+    if state is None:
+        raise NotFound()
+    response = Response(data=state)
+    if request.method == "GET":
+        # kept for older clients, liking is a POST
+        response["Deprecation"] = "true"
+    return response
+
+
 class PostVideoViewset(ModelViewSet):
     """
     This view stores all videos that associated with a posts.
@@ -81,6 +120,9 @@ class PostVideoViewset(ModelViewSet):
             return PostVideoCreateSerializer
         return super().get_serializer_class()
 
+    def perform_create(self, serializer: PostVideoCreateSerializer):
+        serializer.save(user=self.request.user)
+
     @action(
         detail=False,
         methods=["post"],
@@ -101,7 +143,94 @@ class PostVideoViewset(ModelViewSet):
 
 
 
-class PostViewSet(ModelViewSet):
+class VideoUploadViewSet(
+    mixins.CreateModelMixin,
+    mixins.RetrieveModelMixin,
+    mixins.DestroyModelMixin,
+    GenericViewSet,
+):
+    """
+    ```Resumable video uploads```
+
+    1. ```POST``` the ```filename``` and ```size``` (bytes) of the video to start an upload,
+    it answers the ```id``` and ```chunk_size``` of the upload.
+    2. ```PUT``` the bytes of each chunk, in order, to ```{id}/chunks/{index}/``` with
+    the hex SHA-256 of the chunk in the ```X-Checksum-SHA256``` header. Every
+    chunk is ```chunk_size``` bytes long but the last one.
+    3. After a dropped connection, ```GET``` the upload to know its ```offset```
+    and ```next_chunk``` and carry on from there. An upload not finalized by
+    its ```expires_at``` is deleted.
+    4. ```POST``` to ```{id}/finalize/``` (optionally with the ```post``` and ```duration```)
+    to get the ```PostVideo```.
+    """
+
+    serializer_class = VideoUploadSerializer
+    permission_classes = (IsAuthenticated,)
+    parser_classes = (JSONParser, FormParser, MultiPartParser)
+
+    def get_queryset(self):
+        return uploads.active(VideoUpload.objects.filter(user=self.request.user))
+
+    def perform_create(self, serializer: VideoUploadSerializer):
+        serializer.instance = uploads.start(
+            self.request.user,
+            serializer.validated_data["filename"],
+            serializer.validated_data["size"],
+        )
+
+    def perform_destroy(self, instance: VideoUpload):
+        uploads.abort(instance)
+
+    @extend_schema(
+        request={"application/octet-stream": {"type": "string", "format": "binary"}},
+        responses={"200": VideoUploadSerializer},
+    )
+    @action(
+        methods=["put"],
+        detail=True,
+        url_path=r"chunks/(?P<index>[0-9]+)",
+        url_name="chunk",
+    )
+    def chunk(self, request: HttpRequest, pk, index):
+        """
+        Send chunk ```index``` (counting from 0) as the raw request body
+        """
+        upload = self.get_object()
+        try:
+            length = int(request.META.get("CONTENT_LENGTH") or 0)
+        except ValueError:
+            length = 0
+        uploads.write_chunk(
+            upload,
+            int(index),
+            request.stream,
+            length,
+            request.headers.get("X-Checksum-SHA256"),
+        )
+        return Response(self.get_serializer(upload).data)
+
+    @extend_schema(
+        request=VideoUploadFinalizeSerializer,
+        responses={"201": PostVideoSerializer},
+    )
+    @action(methods=["post"], detail=True, url_path="finalize", url_name="finalize")
+    def finalize(self, request: HttpRequest, pk):
+        """
+        Turn a complete upload into a ```PostVideo```
+        """
+        upload = self.get_object()
+        serializer = VideoUploadFinalizeSerializer(
+            data=request.data, context=self.get_serializer_context()
+        )
+        serializer.is_valid(raise_exception=True)
+        video = uploads.finalize(upload, user=request.user, **serializer.validated_data)
+        return Response(
+            PostVideoSerializer(video, context=self.get_serializer_context()).data,
+            status=201,
+        )
+
+
+class PostViewSet(ConditionalGetMixin, ModelViewSet):
     """
     Post ViewSet
 
@@ -121,45 +250,75 @@ class PostViewSet(ModelViewSet):
 
     To enable multiple pictures uploads, during post and patch requests, use
     ```multipart/form-data``` as ````content-type````
+
+    Posts and pages of posts come with an ```ETag```, send it back in
+    ```If-None-Match``` to get a ```304``` when nothing changed.
     """
 
     queryset = Post.objects.all()
     serializer_class = PostSerializer
     permission_classes = (IsAuthenticated,)
     search_fields = ["text"]
-    filter_backends = (filters.SearchFilter, DjangoFilterBackend)
+    filter_backends = (PostSearchFilter, DjangoFilterBackend)
     filterset_class = PostFilter
-    renderer_classes = [renderers.JSONRenderer]
-
-    def finalize_response(self, request, response, *args, **kwargs):
-        # Set the charset of the response to UTF-8
-        response["Content-Type"] = "application/json; charset=utf-8"
-        return super().finalize_response(request, response, *args, **kwargs)
+    pagination_class = KeysetPagination
+    renderer_classes = [JSONRenderer]
 
     def get_serializer_class(self) -> PostCreateSerializer | PostSerializer:
         if not self.request.method == "GET":
             return PostCreateSerializer
         return super().get_serializer_class()
 
+    def list(self, request: HttpRequest, *args, **kwargs):
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        versions, viewer_state = render_cache.versions(page, self.get_serializer())
+        not_modified = self.not_modified(
+            versions, self.paginator.get_next_link(), self.paginator.get_previous_link()
+        )
+        if not_modified:
+            return not_modified
+        serializer = self.get_serializer(
+            page, many=True, context={**self.get_serializer_context(), "viewer_state": viewer_state}
+        )
+        return self.get_paginated_response(serializer.data)
+
+    def retrieve(self, request: HttpRequest, *args, **kwargs):
+        post = self.get_object()
+        versions, viewer_state = render_cache.versions([post], self.get_serializer())
+        not_modified = self.not_modified(versions)
+        if not_modified:
+            return not_modified
+        serializer = self.get_serializer(
+            post, context={**self.get_serializer_context(), "viewer_state": viewer_state}
+        )
+        return Response(serializer.data)
+
     def get_queryset(self) -> QuerySet[Post]:
-        """ some comments here """
+        """
+        Posts rendered by ```PostSerializer``` are loaded with all of their
+        related rows up front, so a page costs a fixed number of queries.
+        """
         if not self.request.user.is_authenticated:
             return self.queryset.none()
+        if self.action in ("list", "retrieve", "video", "search_posts"):
+            return self.queryset.for_rendering()
         return self.queryset
 
     def perform_create(self, serializer: PostSerializer):
         """
         Creating a Post
+
+        The pictures are written concurrently before the post, its pictures
+        and its videos are saved in one transaction.
         """
         request: HttpRequest = self.request
-        
-        post = serializer.save(user=self.request.user, pictures=[],)
-        for formfile in request.FILES.getlist("pictures"):
-            postpic = PostPicture.objects.create(post=post, image=formfile)
-
-        ids = request.data.get("videos")
-        if ids:
-            PostVideo.objects.filter(id__in=ids).update(post=post)
+        videos = attachments.owned_videos(
+            request.user, attachments.requested_video_ids(request.data)
+        )
+        with attachments.stored_pictures(request.FILES.getlist("pictures")) as names:
+            with transaction.atomic():
+                post = serializer.save(user=self.request.user, pictures=[],)
+                attachments.attach(post, names, videos)
 
 
     def perform_update(self, serializer: PostSerializer):
@@ -168,15 +327,17 @@ class PostViewSet(ModelViewSet):
         """
         request: HttpRequest = self.request
         user = self.get_object().user
-        post = serializer.save(user=user, pictures=[], is_edited=True, )
-        for formfile in request.FILES.getlist("pictures"):
-            PostPicture.objects.create(post=post, image=formfile)
-        ids = request.data.get("videos")
-        if ids:
-            PostVideo.objects.filter(id__in=ids).update(post=post)
+        videos = attachments.owned_videos(
+            request.user, attachments.requested_video_ids(request.data)
+        )
+        with attachments.stored_pictures(request.FILES.getlist("pictures")) as names:
+            with transaction.atomic():
+                post = serializer.save(user=user, pictures=[], is_edited=True, )
+                attachments.attach(post, names, videos)
 
+    @extend_schema(request=None, responses={"200": LikeStateSerializer})
     @action(
-        methods=["get"],
+        methods=["get", "post"],
         detail=True,
         url_path="like",
         url_name="like",
@@ -188,18 +349,15 @@ class PostViewSet(ModelViewSet):
 
         Post the ```id``` is required to to like a post, 
         parse the id of the post to like in the interger field.
+        Liking an already liked post changes nothing, the response is
+        the new state ```{"id", "liked", "likes_count"}```.
+        ```GET``` is deprecated and answered with a ```Deprecation``` header.
         """
-        post = get_object_or_404(Post, pk=pk)
-        post.likes.add(self.request.user)
-        post.save()
-        serializer = PostSerializer(
-            instance=post, context=self.get_serializer_context()
-        )
-        return Response(data=serializer.data)
-    
+        return like_response(Post, request, pk, liked=True)
 
+    @extend_schema(request=None, responses={"200": LikeStateSerializer})
     @action(
-        methods=["get"],
+        methods=["get", "post"],
         detail=True,
         url_path="unlike",
         url_name="unlike",
@@ -211,14 +369,9 @@ class PostViewSet(ModelViewSet):
 
         Post the ```id``` is required to to unlike a post, 
         parse the id of the post to like in the interger field.
+        ```GET``` is deprecated and answered with a ```Deprecation``` header.
         """
-        post = get_object_or_404(Post, pk=pk)
-        post.likes.remove(self.request.user) 
-        post.save()
-        serializer = PostSerializer(
-            instance=post, context=self.get_serializer_context()
-        )
-        return Response(data=serializer.data)
+        return like_response(Post, request, pk, liked=False)
 
     @action(
         methods=["post"],
@@ -244,6 +397,30 @@ class PostViewSet(ModelViewSet):
         )
         return Response(data=serializer.data)
 
+    @action(
+        methods=["get"],
+        detail=False,
+        url_path="search",
+        url_name="search",
+        permission_classes=[IsAuthenticated],
+    )
+    def search_posts(self, request: HttpRequest):
+        """
+        ```Search Posts```
+
+        full-text search on post text, best matches first. parse the words to look for
+        in ```q```, the last word also matches as a prefix (```vib``` finds ```vibe```).
+        follow ```next``` to page through the results.
+        """
+        queryset = search(
+            self.filter_queryset(self.get_queryset()), request.query_params.get("q")
+        )
+        # no COUNT(*) and no OFFSET, later pages seek past the last (rank, id)
+        paginator = KeysetPagination(ordering=("-search_rank", "-id"))
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
     @action(
         methods=["get"],
         detail=False,
@@ -256,19 +433,101 @@ class PostViewSet(ModelViewSet):
         ```Random Video Post```
 
         this endpoint returns random videos from video posts.
-        
+
+        Videos come in a random order picked for the session: follow the ```next```
+        link to keep scrolling without repeats, or parse the returned ```seed```
+        to replay the same order.
         """
-        videos = Post.objects.filter(
-            post_type=Post.PostType.post_video,
-            videos__isnull=False,
-        ).order_by("?").distinct()
-        page = self.paginate_queryset(videos)
-        if page is not None:
-            serializer = self.get_serializer(page, many=True)
-            return self.get_paginated_response(serializer.data)
+        paginator = VideoDiscoveryPagination()
+        page = paginator.paginate_queryset(self.get_queryset(), request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
 
-        serializer = self.get_serializer(videos, many=True)
-        return Response(data=serializer.data)
+
+class FeedView(ConditionalGetMixin, GenericAPIView):
+    """
+    ```Home Feed```
+
+    Posts from the users you are ```following``` and your own posts, newest first.
+    Follow the ```next``` link to keep scrolling. Authentication is required.
+    Pages come with an ```ETag``` for ```If-None-Match```.
+    """
+
+    serializer_class = PostSerializer
+    permission_classes = (IsAuthenticated,)
+    pagination_class = TimelinePagination
+
+    def get(self, request: HttpRequest):
+        page = self.paginator.paginate_timeline(
+            request.user, Post.objects.for_rendering(), request
+        )
+        versions, viewer_state = render_cache.versions(page, self.get_serializer())
+        not_modified = self.not_modified(versions, self.paginator.get_next_link())
+        if not_modified:
+            return not_modified
+        serializer = self.get_serializer(
+            page, many=True, context={**self.get_serializer_context(), "viewer_state": viewer_state}
+        )
+        return self.get_paginated_response(serializer.data)
+
+
+class UnreadAnnouncementsView(GenericAPIView):
+    """
+    ```Unread Announcements```
+
+    New announcement posts of all the communities you are a member of, newest
+    first. Follow the ```next``` link to keep scrolling. POST
+    ```{"posts": [1, 2]}``` marks those announcements read, an empty body
+    marks them all read.
+    """
+
+    serializer_class = PostSerializer
+    permission_classes = (IsAuthenticated,)
+
+    def get(self, request: HttpRequest):
+        paginator = KeysetPagination(ordering=("-date_created", "-post_id"))
+        deliveries = paginator.paginate_queryset(
+            announcements.unread(request.user), request, view=self
+        )
+        posts = Post.objects.for_rendering().in_bulk(
+            [delivery.post_id for delivery in deliveries]
+        )
+        serializer = self.get_serializer(
+            [posts[delivery.post_id] for delivery in deliveries if delivery.post_id in posts],
+            many=True,
+        )
+        return paginator.get_paginated_response(serializer.data)
+
+    @extend_schema(request=AnnouncementReadSerializer, responses={"204": None})
+    def post(self, request: HttpRequest):
+        serializer = AnnouncementReadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        announcements.mark_read(request.user, serializer.validated_data.get("posts"))
+        return Response(status=204)
+
+
+class LikesView(GenericAPIView):
+    """
+    ```Bulk like / unlike```
+
+    Apply many likes and unlikes of posts and comments at once, e.g. when a
+    client syncs after being offline:
+    ```{"operations": [{"type": "post", "id": 1, "liked": true}, ...]}```.
+    They are applied in one transaction, in order, and replaying them is
+    harmless. The response is the new state of every existing target.
+    """
+
+    serializer_class = BulkLikeSerializer
+    permission_classes = (IsAuthenticated,)
+
+    @extend_schema(responses={"200": LikeStateSerializer(many=True)})
+    def post(self, request: HttpRequest):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = likes.apply_operations(
+            request.user, serializer.validated_data["operations"]
+        )
+        return Response(data={"results": results})
 
 
 class PostPictureViewSet(ModelViewSet):
@@ -331,6 +590,7 @@ class PostCommentViewSet(ModelViewSet):
     serializer_class = PostCommentSerializer
     permission_classes = (IsAuthenticated,)
     filterset_class = PostCommentFilter
+    pagination_class = KeysetPagination
     filter_backends = (
         filters.SearchFilter,
         DjangoFilterBackend,
@@ -345,16 +605,13 @@ class PostCommentViewSet(ModelViewSet):
         Get only comments made my the currnt user on a Post
         if the user is not an admin
         """
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().select_related("user__profile")
         if not self.request.user.is_authenticated:
             return queryset.none()
         
         if not self.request.user.is_superuser:
-            queryset = queryset.filter(
-                    Q(user=self.request.user)
-                    | ~Q(hidden_from__id=self.request.user.id)
-                ).distinct()
-            
+            queryset = queryset.visible_to(self.request.user)
+
         return queryset
 
     def perform_create(self, serializer: PostCommentSerializer):
@@ -368,27 +625,126 @@ class PostCommentViewSet(ModelViewSet):
         """
         instance = serializer.save(user=self.request.user, is_edited=True)
 
+    def get_comment(self, pk, **include) -> PostComment:
+        """
+        The comment ```pk``` if the current user may see it, ```include```
+        goes to ```PostCommentQuerySet.visible_to```
+        """
+        queryset = PostComment.objects.all()
+        if not self.request.user.is_superuser:
+            queryset = queryset.visible_to(self.request.user, **include)
+        return get_object_or_404(queryset, pk=pk)
+
     @action(
         methods=["get"],
         detail=True,
+        url_path="thread",
+        url_name="thread",
+        permission_classes=[IsAuthenticated],
+    )
+    def thread(self, request: HttpRequest, pk):
+        """
+        Endpoint to read a comment and all its replies, in thread order
+        (every reply follows its parent) with one query per page,
+        ```?max_depth=``` limits how many levels of replies are returned
+        """
+        comment = self.get_object()
+        queryset = self.get_queryset().filter(
+            thread_id=comment.thread_id, path__startswith=comment.path
+        )
+        max_depth = request.query_params.get("max_depth")
+        if max_depth is not None:
+            try:
+                queryset = queryset.filter(depth__lte=comment.depth + int(max_depth))
+            except ValueError:
+                pass
+        paginator = KeysetPagination(ordering=("path", "id"))
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        serializer = self.get_serializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data)
+
+    @action(
+        methods=["post"],
+        detail=True,
+        url_path="hide",
+        url_name="hide",
+        permission_classes=[IsAuthenticated],
+    )
+    def hide(self, request: HttpRequest, pk):
+        """
+        Endpoint to hide a comment from the current user
+        """
+        post_comment = self.get_comment(pk, include_hidden=True)
+        HiddenComment.objects.get_or_create(user=request.user, comment=post_comment)
+        return Response(data={"hidden": True})
+
+    @action(
+        methods=["post"],
+        detail=True,
+        url_path="unhide",
+        url_name="unhide",
+        permission_classes=[IsAuthenticated],
+    )
+    def unhide(self, request: HttpRequest, pk):
+        """
+        Endpoint to show a hidden comment again
+        """
+        HiddenComment.objects.filter(user=request.user, comment_id=pk).delete()
+        return Response(data={"hidden": False})
+
+    @action(
+        methods=["post"],
+        detail=True,
+        url_path="mute-author",
+        url_name="mute-author",
+        permission_classes=[IsAuthenticated],
+    )
+    def mute_author(self, request: HttpRequest, pk):
+        """
+        Endpoint to hide every comment of the author of this comment
+        from the current user
+        """
+        post_comment = self.get_comment(pk, include_muted=True)
+        if post_comment.user_id != request.user.id:
+            MutedCommenter.objects.get_or_create(
+                user=request.user, muted_id=post_comment.user_id
+            )
+        return Response(data={"muted": True})
+
+    @action(
+        methods=["post"],
+        detail=True,
+        url_path="unmute-author",
+        url_name="unmute-author",
+        permission_classes=[IsAuthenticated],
+    )
+    def unmute_author(self, request: HttpRequest, pk):
+        """
+        Endpoint to list the comments of the author of this comment again
+        """
+        post_comment = self.get_comment(pk, include_muted=True)
+        MutedCommenter.objects.filter(
+            user=request.user, muted_id=post_comment.user_id
+        ).delete()
+        return Response(data={"muted": False})
+
+    @extend_schema(request=None, responses={"200": LikeStateSerializer})
+    @action(
+        methods=["get", "post"],
+        detail=True,
         url_path="like",
         url_name="like",
         permission_classes=[IsAuthenticated],
     )
     def like(self, request: HttpRequest, pk):
         """
-        Endpoint to like post comment
+        Endpoint to like post comment, ```GET``` is deprecated
         """
-        post_comment = get_object_or_404(PostComment, pk=pk)
-        post_comment.likes.add(request.user) 
-        post_comment.refresh_from_db()
-        serializer = PostCommentSerializer(
-            instance=post_comment, context=self.get_serializer_context()
-        )
-        return Response(data=serializer.data)
-    
+        return like_response(PostComment, request, pk, liked=True)
+
+    @extend_schema(request=None, responses={"200": LikeStateSerializer})
     @action(
-        methods=["get"],
+        methods=["get", "post"],
         detail=True,
         url_path="unlike",
         url_name="unlike",
@@ -396,14 +752,6 @@ class PostCommentViewSet(ModelViewSet):
     )
     def unlike(self, request: HttpRequest, pk):
         """
-        Endpoint to unlike post comments
+        Endpoint to unlike post comments, ```GET``` is deprecated
         """
-        post_comment = get_object_or_404(PostComment, pk=pk)
-
-        post_comment.likes.remove(request.user)
-        post_comment.save()  
-        post_comment.refresh_from_db()
-        serializer = PostCommentSerializer(
-            instance=post_comment, context=self.get_serializer_context()
-        )
-        return Response(data=serializer.data)
\ No newline at end of file
+        return like_response(PostComment, request, pk, liked=False)